@@ -0,0 +1,151 @@
+#
+# UNOC - alarm_engine.py
+#
+# Alarm-Engine mit In-Memory-Index der aktiven Alarme, Schlüssel (object_id, description).
+# Schwellwerte werden für viele Objekte auf einmal ausgewertet; alle Raise/Clear-Übergänge
+# landen in einem Batch (ein Flush, set-basiertes UPDATE, ein Commit).
+#
+
+import datetime
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session as DBSessionType
+
+from commands import BULK_CHUNK_SIZE
+from database import Alarm
+
+LOSS_OF_SIGNAL = "Loss of Signal"
+SLA_VIOLATION_RISK = "SLA Violation Risk"
+SLA_UTILIZATION_THRESHOLD = 80
+
+AlarmKey = Tuple[str, str]
+
+
+class AlarmCheck(NamedTuple):
+    """Ergebnis einer Schwellwertprüfung: raised=True hebt den Alarm, False cleart ihn."""
+    object_type: str  # 'device' oder 'link'
+    object_id: str
+    description: str
+    severity: str
+    raised: bool
+
+
+def serialize_alarm(a: Alarm) -> dict:
+    return {"id": a.id, "severity": a.severity, "status": a.status, "timestamp_raised": a.timestamp_raised, "affected_object_type": a.affected_object_type, "affected_object_id": a.affected_object_id, "description": a.description}
+
+
+def signal_checks(signal_results: Dict[str, dict]) -> List[AlarmCheck]:
+    """LOS-Prüfung für Endgeräte aus Einzel- oder Bulk-Budgetergebnissen (NO_PATH bleibt unverändert)."""
+    return [
+        AlarmCheck('device', device_id, LOSS_OF_SIGNAL, "CRITICAL", result["status"] == "LOS")
+        for device_id, result in signal_results.items()
+        if result.get("status") in ("online", "LOS")
+    ]
+
+
+def sla_checks(link_properties: Dict[str, dict]) -> List[AlarmCheck]:
+    """SLA-Prüfung für PtP-Links mit garantierter Bandbreite anhand ihrer Auslastung."""
+    checks = []
+    for link_id, props in link_properties.items():
+        props = props or {}
+        if props.get("link_technology") != "PtP":
+            continue
+        utilization = props.get('utilization_percent', 0)
+        if props.get('guaranteed_bandwidth_gbps', 0) > 0 and utilization > SLA_UTILIZATION_THRESHOLD:
+            checks.append(AlarmCheck('link', link_id, SLA_VIOLATION_RISK, "MAJOR", True))
+        elif utilization <= SLA_UTILIZATION_THRESHOLD:
+            checks.append(AlarmCheck('link', link_id, SLA_VIOLATION_RISK, "MAJOR", False))
+    return checks
+
+
+class AlarmEngine:
+    """
+    Hält die aktiven Alarme serialisiert im Speicher; die Datenbank wird nur bei Übergängen geschrieben.
+    Prüfen, Commit und Nachführen von active laufen unter einem Lock, damit parallele Auswertungen
+    denselben Alarm weder doppelt heben noch doppelt clearen. Das Backend ruft evaluate nur unter
+    STATE_LOCK auf (Reihenfolge STATE_LOCK, Alarm-Lock, Datenbank; beim In-Memory-Store ist die
+    Datenbank ebenfalls STATE_LOCK).
+    """
+
+    def __init__(self):
+        self.active: Dict[AlarmKey, dict] = {}
+        self._lock = threading.RLock()
+
+    def rebuild(self, db_session: DBSessionType):
+        with self._lock:
+            rows = db_session.execute(select(Alarm).where(Alarm.status == 'ACTIVE')).scalars().all()
+            self.active = {(a.affected_object_id, a.description): serialize_alarm(a) for a in rows}
+
+    def active_alarms(self) -> List[dict]:
+        with self._lock:
+            return sorted(self.active.values(), key=lambda a: a["id"])
+
+    def evaluate(self, db_session: DBSessionType, checks: Iterable[AlarmCheck]) -> List[dict]:
+        """
+        Wendet die Prüfergebnisse an und gibt die geänderten Alarme serialisiert zurück.
+        Nur echte Übergänge (neu gehoben bzw. gecleart) erzeugen Datenbankzugriffe.
+        """
+        with self._lock:
+            return self._evaluate(db_session, checks)
+
+    def _evaluate(self, db_session: DBSessionType, checks: Iterable[AlarmCheck]) -> List[dict]:
+        to_raise: Dict[AlarmKey, AlarmCheck] = {}
+        to_clear: Dict[AlarmKey, dict] = {}
+        for check in checks:
+            key = (check.object_id, check.description)
+            if check.raised and key not in self.active:
+                to_raise[key] = check
+                to_clear.pop(key, None)
+            elif not check.raised and key in self.active:
+                to_clear[key] = self.active[key]
+                to_raise.pop(key, None)
+        if not to_raise and not to_clear:
+            return []
+
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        try:
+            new_alarms = [
+                Alarm(severity=c.severity, status="ACTIVE", timestamp_raised=now, affected_object_type=c.object_type, affected_object_id=c.object_id, description=c.description)
+                for c in to_raise.values()
+            ]
+            db_session.add_all(new_alarms)
+            db_session.flush()
+            # Vor dem Commit serialisieren, sonst lädt expire_on_commit jede Zeile einzeln nach
+            raised = [serialize_alarm(alarm) for alarm in new_alarms]
+            cleared_ids = [alarm["id"] for alarm in to_clear.values()]
+            for i in range(0, len(cleared_ids), BULK_CHUNK_SIZE):
+                chunk = cleared_ids[i:i + BULK_CHUNK_SIZE]
+                db_session.execute(update(Alarm).where(Alarm.id.in_(chunk)).values(status="CLEARED", timestamp_cleared=now), execution_options={"synchronize_session": False})
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        changed = []
+        for key, alarm in zip(to_raise, raised):
+            self.active[key] = alarm
+            changed.append(alarm)
+        for key, alarm in to_clear.items():
+            del self.active[key]
+            changed.append({**alarm, "status": "CLEARED"})
+        return changed
+
+    def apply_remote(self, changed: Iterable[dict]):
+        """Übernimmt Alarmübergänge, die ein anderer Worker bereits in der Datenbank verbucht hat."""
+        with self._lock:
+            for alarm in changed:
+                key = (alarm["affected_object_id"], alarm["description"])
+                if alarm["status"] == "CLEARED":
+                    self.active.pop(key, None)
+                else:
+                    self.active[key] = alarm
+
+    def diff(self, other: 'AlarmEngine') -> List[str]:
+        differences = []
+        with self._lock:
+            keys = set(self.active)
+        for key in sorted(keys ^ set(other.active)):
+            differences.append(f"alarms: '{key[1]}' on '{key[0]}' active in only one index")
+        return differences
@@ -8,9 +8,11 @@
 import yaml
 import sys
 import datetime
+import time
 import os
 import json
-from flask import Flask, jsonify, abort, request, g
+import uuid
+from flask import Flask, Response, jsonify, abort, request, g
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from pydantic import ValidationError
@@ -20,15 +22,43 @@ from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session as DBSessionType
 
 # Importiere Datenbank-Module und ORM-Modelle
-from database import SessionLocal, init_db, Device, Link, Ring, Alarm
+from database import SessionLocal, init_db, storage, Device, Link
 
 # Importiere die angepassten Command-Klassen
 from commands import (
     Command,
+    ChangeRecord,
     UpdateLinkStatusCommand,
     UpdateDeviceStatusCommand,
-    CompositeCommand
+    UpdateLinkPropertiesCommand,
+    CompositeCommand,
+    StaleRecordError,
+    apply_records_to_db,
+    apply_status_updates
 )
+from graph_state import build_graph, apply_change_records, diff_graphs, serialize_device, serialize_link, serialize_graph, ActiveLinkView
+from state_delta import DeltaLog
+from optical_budget import (
+    BudgetEngine,
+    budget_changed,
+    fiber_length_km
+)
+from path_index import PathIndex
+from snapshot_loader import bulk_load_snapshot, dump_topology
+from snapshot_format import snapshot_path as find_snapshot, write_snapshot, read_snapshot, open_snapshot_for_loading, COMPACT_EXTENSION, LEGACY_EXTENSION
+from kpi import TopologyKpis
+from alarm_engine import AlarmEngine, signal_checks, sla_checks
+from topology_cache import TopologyCache
+from spatial_index import SpatialGrid, parse_bbox, query_viewport
+from geo_index import GeoIndex
+from history import UndoHistory, DEFAULT_MAX_DEPTH, DEFAULT_MAX_MEMORY_BYTES
+from change_log import ChangeLog, DEFAULT_CHECKPOINT_INTERVAL, record_events, alarm_events
+from emission_scheduler import EmissionScheduler, DEFAULT_WINDOW_MS, DEFAULT_MAX_IN_FLIGHT
+from message_bus import create_bus
+from failure_simulation import FailureModel, simulate, DEFAULT_FIBER_FAILURES_PER_KM_YEAR
+from service_model import ImpactIndex
+from ring_engine import RingEngine
+from traffic_engine import TrafficEngine, DEFAULT_HISTORY_LENGTH as DEFAULT_TRAFFIC_HISTORY_LENGTH
 # Importiere Pydantic-Schemas für Validierung und Serialisierung
 from schemas import (
     Topology,
@@ -36,7 +66,9 @@ from schemas import (
     Link as PydanticLink,
     Ring as PydanticRing,
     UpdateLinkStatusPayload,
+    BulkLinkStatusPayload,
     UpdateDeviceStatusPayload,
+    UpdateLinkPropertiesPayload,
     SUPPORTED_TOPOLOGY_VERSION
 )
 
@@ -46,27 +78,89 @@ app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "super-geheimes-flask-socketi
 CORS(app, resources={r"/*": {"origins": ["*", "null"], "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]}})
 socketio = SocketIO(app, cors_allowed_origins=["http://localhost:8000", "http://127.0.0.1:8000"])
 
-# --- Physikalische Konstanten & Konfiguration ---
-FIBER_LOSS_PER_KM = {
-    '1310nm': 0.35,
-    '1490nm': 0.40,
-    '1270nm': 0.35,
-    '1577nm': 0.25
-}
-CONNECTOR_LOSS_DB = 0.5
-SPLICE_LOSS_DB = 0.1
-MAINTENANCE_MARGIN_DB = 3.0
-
 # --- Konfiguration für Gerätetypen ---
 HEAD_END_TYPES = ['OLT', 'AON Switch']
 END_DEVICE_TYPES = ['ONT', 'Business NT']
 
+# Vergleicht nach jedem Patch den Graphen mit einem frischen Rebuild (teuer, nur zum Debuggen)
+GRAPH_CONSISTENCY_CHECK = os.getenv("GRAPH_CONSISTENCY_CHECK", "0").lower() in ("1", "true", "yes")
+
+# Anzahl der State-Deltas, die für Client-Resyncs vorgehalten werden
+STATE_DELTA_HISTORY = int(os.getenv("STATE_DELTA_HISTORY", "500"))
+
+# Seitengröße für Viewport-Abfragen der Karte (?bbox=...&limit=...)
+VIEWPORT_DEFAULT_LIMIT = 5000
+VIEWPORT_MAX_LIMIT = 50000
+
+# Herkunft der Faserlänge im optischen Budget:
+#   property - nur das gepflegte length_km
+#   fallback - length_km, für Links ohne length_km die aus Geometrie/Koordinaten abgeleitete Länge
+#   derived  - die abgeleitete Länge hat Vorrang vor length_km
+LINK_LENGTH_SOURCE = os.getenv("LINK_LENGTH_SOURCE", "fallback")
+GEO_MAX_RESULTS = 1000
+
+# Undo/Redo-Historie: maximale Tiefe, Speicherbudget der Records und Journal-Datei (leer = kein Journal)
+HISTORY_MAX_DEPTH = int(os.getenv("HISTORY_MAX_DEPTH", str(DEFAULT_MAX_DEPTH)))
+HISTORY_MAX_MEMORY_BYTES = int(os.getenv("HISTORY_MAX_MEMORY_BYTES", str(DEFAULT_MAX_MEMORY_BYTES)))
+HISTORY_JOURNAL = os.getenv("HISTORY_JOURNAL", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history', 'undo_journal.jsonl'))
+
+# Änderungsprotokoll mit Replay (leer = deaktiviert) und Abstand der Checkpoints in Events
+CHANGE_LOG_DIR = os.getenv("CHANGE_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'changelog'))
+CHANGE_LOG_CHECKPOINT_INTERVAL = int(os.getenv("CHANGE_LOG_CHECKPOINT_INTERVAL", str(DEFAULT_CHECKPOINT_INTERVAL)))
+
+# WebSocket-Emissionen: Sammelfenster (0 = sofort senden) und unbestätigte Frames pro Client
+EMIT_COALESCE_WINDOW_MS = int(os.getenv("EMIT_COALESCE_WINDOW_MS", str(DEFAULT_WINDOW_MS)))
+EMIT_MAX_IN_FLIGHT = int(os.getenv("EMIT_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT)))
+
+# Mehrere Worker: Zustandsänderungen gehen über den Message-Bus an alle anderen Worker
+# (memory:// = nur dieser Prozess, redis://host:port/0 = Redis bzw. 'python message_bus.py serve')
+BUS_URL = os.getenv("UNOC_BUS_URL", "memory://")
+BUS_CHANNEL = os.getenv("UNOC_BUS_CHANNEL", "unoc:state")
+WORKER_ID = os.getenv("WORKER_ID") or uuid.uuid4().hex[:12]
+# Monte-Carlo-Ausfallsimulation: Standardanzahl der Trials, Obergrenze pro Anfrage und Prozesse (0 = alle Kerne)
+MONTE_CARLO_TRIALS = int(os.getenv("MONTE_CARLO_TRIALS", "1000"))
+MONTE_CARLO_MAX_TRIALS = int(os.getenv("MONTE_CARLO_MAX_TRIALS", "100000"))
+MONTE_CARLO_WORKERS = int(os.getenv("MONTE_CARLO_WORKERS", "0"))
+# ERPS: nach Behebung aller Ausfälle wieder den RPL blockieren (1) oder den zuletzt reparierten Link (0, Zurückschalten per clear)
+ERPS_REVERTIVE = os.getenv("ERPS_REVERTIVE", "1") not in ("0", "false", "False")
+# Was-wäre-wenn-Analyse: Property der Endgeräte mit der Kundennummer (sonst die Geräte-ID)
+CUSTOMER_ID_PROPERTY = os.getenv("CUSTOMER_ID_PROPERTY", "customer_id")
+# Verkehrssimulation: Tick-Intervall (Echtzeit), Simulationssekunden pro Echtzeitsekunde, Länge des Ringpuffers in Ticks
+TRAFFIC_TICK_S = float(os.getenv("TRAFFIC_TICK_S", "1.0"))
+TRAFFIC_TIME_SCALE = float(os.getenv("TRAFFIC_TIME_SCALE", "60"))
+TRAFFIC_HISTORY_LENGTH = int(os.getenv("TRAFFIC_HISTORY_LENGTH", str(DEFAULT_TRAFFIC_HISTORY_LENGTH)))
+TRAFFIC_AUTOSTART = os.getenv("TRAFFIC_AUTOSTART", "0").lower() in ("1", "true", "yes")
+if storage.name == "memory" and not BUS_URL.startswith("memory://"):
+    print("WARN: Der In-Memory-Store gehört einem einzelnen Prozess; mehrere Worker brauchen STORAGE_BACKEND=sql.")
+
+def _socketio_send(event: str, payload, to: str = None, skip_sid=None):
+    socketio.emit(event, payload, to=to, skip_sid=skip_sid)
+
 # --- In-Memory State ---
 app_state = {
     "graph": nx.DiGraph(),
-    "undo_stack": [],
-    "redo_stack": []
+    "history": UndoHistory(HISTORY_JOURNAL, HISTORY_MAX_DEPTH, HISTORY_MAX_MEMORY_BYTES),
+    "change_log": ChangeLog(CHANGE_LOG_DIR, CHANGE_LOG_CHECKPOINT_INTERVAL),
+    "delta_log": DeltaLog(max_history=STATE_DELTA_HISTORY),
+    "path_index": PathIndex(HEAD_END_TYPES),
+    "impact_index": ImpactIndex(HEAD_END_TYPES, END_DEVICE_TYPES),
+    "ring_engine": RingEngine(revertive=ERPS_REVERTIVE),
+    "traffic": TrafficEngine(HEAD_END_TYPES, END_DEVICE_TYPES, TRAFFIC_HISTORY_LENGTH),
+    "budget": BudgetEngine(END_DEVICE_TYPES, lambda: get_derived_link_lengths(), LINK_LENGTH_SOURCE == 'derived'),
+    "active_view": ActiveLinkView(),
+    "kpis": TopologyKpis(),
+    "alarms": AlarmEngine(),
+    "topology_cache": TopologyCache(),
+    "spatial_index": SpatialGrid(),
+    "geo_index": GeoIndex(),
+    "bus": create_bus(BUS_URL)
 }
+app_state["emitter"] = EmissionScheduler(_socketio_send, app_state["delta_log"].since, EMIT_COALESCE_WINDOW_MS, EMIT_MAX_IN_FLIGHT,
+                                         start_task=socketio.start_background_task, sleep=socketio.sleep)
+
+# Serialisiert lokale Änderungen und Nachrichten anderer Worker (der Bus-Listener läuft in eigenem Thread).
+# Kommt vom Storage: beim In-Memory-Store ist es derselbe Lock wie für die gemeinsame Verbindung.
+STATE_LOCK = storage.state_lock
 
 # --- NEU/ERWEITERT FÜR PHASE 6: Konfiguration des virtuellen Routers & Dienste ---
 VIRTUAL_ROUTER_CONFIG = {
@@ -93,46 +187,103 @@ def get_db():
 def before_request():
     g.db = next(get_db())
 
-@app.after_request
-def after_request(response):
+@app.teardown_request
+def teardown_request(exception=None):
+    # Auch nach unbehandelten Fehlern schließen (der In-Memory-Store hält seine Verbindung exklusiv)
     db = getattr(g, 'db', None)
     if db is not None:
         db.close()
-    return response
 
 # --- Serialisierungs- & Event-Logik ---
 def serialize_topology(db: DBSessionType) -> dict:
-    devices = db.query(Device).all()
-    links = db.query(Link).all()
-    rings = db.query(Ring).all()
-    device_id_map = {d.id: d.device_id_str for d in devices}
-    serialized_devices = [{"id": d.device_id_str, "type": d.type, "status": d.status, "properties": d.properties, "coordinates": d.coordinates} for d in devices]
-    serialized_links = [{"id": l.link_id_str, "source": device_id_map.get(l.source_id), "target": device_id_map.get(l.target_id), "status": l.status, "properties": l.properties} for l in links]
-    serialized_rings = [{"id": r.ring_id_str, "name": r.name, "rpl_link_id": r.rpl_link_id_str, "nodes": [node.device_id_str for node in r.nodes]} for r in rings]
-    return {"devices": serialized_devices, "links": serialized_links, "rings": serialized_rings}
+    """Topologie direkt aus der Datenbank (für Snapshots); Clients bekommen get_serialized_topology()."""
+    return dump_topology(db)
+
+def get_serialized_topology() -> dict:
+    """Serialisierte Topologie aus dem Graphen; pro Zustandsversion nur einmal berechnet."""
+    return app_state["topology_cache"].topology(lambda: serialize_graph(app_state["graph"]))
 
 def add_event(message: str):
     timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
     event_message = f"[{timestamp}] {message}"
+    # Meldungen gehen gesammelt als 'new_events' raus (siehe emission_scheduler.py)
+    app_state["emitter"].event(event_message)
+    publish_to_workers("event", message=event_message)
+
+def emit_latest(event: str, payload):
+    """Statusmeldung an die Clients dieses und aller anderen Worker (nur der letzte Stand zählt)."""
+    app_state["emitter"].latest(event, payload)
+    publish_to_workers("emit", event=event, payload=payload)
+
+# --- Multi-Worker (Message-Bus) ---
+def encode_records(records) -> list:
+    return [[r.kind, r.object_id, r.field, r.old, r.new] for r in records]
+
+def decode_records(rows: list) -> list:
+    return [ChangeRecord(*row) for row in rows]
+
+def publish_to_workers(message_type: str, **payload):
+    """Verteilt eine lokale Zustandsänderung; die anderen Worker ziehen sie in handle_bus_message nach."""
     try:
-        socketio.emit('new_event', event_message)
-    except RuntimeError as e:
-        if "Working outside of request context" in str(e):
-            print(f"WARN: Event '{event_message}' not emitted via WS (no request context during startup).")
-        else:
-            raise e
+        app_state["bus"].publish(BUS_CHANNEL, {"origin": WORKER_ID, "type": message_type, **payload})
+    except (OSError, ConnectionError) as e:
+        print(f"WARN: Nachricht '{message_type}' konnte nicht über den Message-Bus verteilt werden: {e}")
+
+def handle_bus_message(message: dict):
+    """
+    Übernimmt die Änderung eines anderen Workers. Die Datenbank ist dort bereits geschrieben; hier
+    werden nur Graph, Indizes, Caches, Alarme, Historie und Konfiguration nachgezogen und die
+    eigenen WebSocket-Clients benachrichtigt. Eigene Nachrichten werden ignoriert.
+    """
+    if message.get("origin") == WORKER_ID:
+        return
+    message_type = message["type"]
+    with STATE_LOCK:
+        if message_type in ("records", "rebuild"):
+            with SessionLocal() as db:
+                if message_type == "records":
+                    apply_state_changes(db, decode_records(message["records"]), publish=False)
+                else:
+                    build_graph_from_db(db, publish=False)
+        elif message_type == "delta":
+            app_state["alarms"].apply_remote(message["alarms"])
+            emit_state_delta(None, decode_records(message["records"]), message["alarms"], message["resync"], publish=False)
+        elif message_type == "history":
+            history, op = app_state["history"], message["op"]
+            if op == "push":
+                history.push(decode_records(message["records"]), message["label"])
+            elif op == "undo" and history.peek_undo() is not None:
+                history.commit_undo()
+            elif op == "redo" and history.peek_redo() is not None:
+                history.commit_redo()
+            elif op == "clear":
+                history.clear()
+        elif message_type == "config":
+            old_config = dict(VIRTUAL_ROUTER_CONFIG)
+            VIRTUAL_ROUTER_CONFIG.update(message["virtual_router"])
+            VIRTUAL_SIP_PHONE_CONFIG.update(message["sip_phone"])
+            log_changes([{"type": "config", "name": "virtual_router", "old": old_config, "new": dict(VIRTUAL_ROUTER_CONFIG)}])
+        elif message_type == "event":
+            app_state["emitter"].event(message["message"])
+        elif message_type == "emit":
+            app_state["emitter"].latest(message["event"], message["payload"])
+
+app_state["bus"].subscribe(BUS_CHANNEL, handle_bus_message)
 
 # --- Command & Graph-Logik ---
-def execute_command(command: Command):
+def execute_command(command: Command, label: str = None):
     command.execute()
-    app_state["undo_stack"].append(command)
-    app_state["redo_stack"].clear()
-    build_graph_from_db(g.db)
-    emit_full_state_updates(g.db)
+    records = command.get_change_records()
+    # In der Historie landen nur die Records; das Command-Objekt (mit ORM-Instanzen) wird verworfen
+    label = label or type(command).__name__
+    app_state["history"].push(records, label)
+    publish_to_workers("history", op="push", label=label, records=encode_records(records))
+    apply_state_changes(g.db, records)
+    emit_state_delta(g.db, records)
 
 def clear_history():
-    app_state["undo_stack"].clear()
-    app_state["redo_stack"].clear()
+    app_state["history"].clear()
+    publish_to_workers("history", op="clear")
     try:
         emit_history_status()
     except RuntimeError as e:
@@ -141,189 +292,294 @@ def clear_history():
         else:
             raise e
 
-def build_graph_from_db(db_session: DBSessionType):
-    app_state["graph"].clear()
-    devices = db_session.query(Device).all()
-    links = db_session.query(Link).all()
-    for device in devices:
-        app_state["graph"].add_node(device.device_id_str, db_obj=device)
-    for link in links:
-        if link.source and link.target:
-            source_id_str = link.source.device_id_str
-            target_id_str = link.target.device_id_str
-            app_state["graph"].add_edge(source_id_str, target_id_str, db_obj=link, link_id_str=link.link_id_str)
+def build_graph_from_db(db_session: DBSessionType, publish: bool = True):
+    """
+    Vollständiger Rebuild des Graphen. Nur beim Start und beim Laden eines Snapshots nötig.
+    Mit publish=True bauen auch die anderen Worker neu auf.
+    """
+    with STATE_LOCK:
+        app_state["graph"] = build_graph(db_session)
+        app_state["path_index"].rebuild(app_state["graph"])
+        app_state["impact_index"].rebuild(app_state["graph"])
+        app_state["ring_engine"].rebuild(app_state["graph"])
+        app_state["traffic"].rebuild(app_state["graph"])
+        app_state["budget"].rebuild(app_state["graph"])
+        app_state["active_view"].rebuild(app_state["graph"])
+        app_state["kpis"].rebuild(app_state["graph"])
+        app_state["spatial_index"].rebuild(app_state["graph"])
+        app_state["geo_index"].rebuild(app_state["graph"])
+        app_state["alarms"].rebuild(db_session)
+        app_state["topology_cache"].invalidate()
+        # Vollständiger Neuaufbau: Replays dürfen nicht über diesen Punkt hinweg laufen
+        app_state["change_log"].checkpoint(change_log_state(), reason="reset")
+    if publish:
+        publish_to_workers("rebuild")
     print("In-Memory Graph wurde aus der Datenbank gebaut.")
 
+def apply_state_changes(db_session: DBSessionType, records: list, publish: bool = True):
+    """
+    Patcht den In-Memory-Graphen und die abgeleiteten Indizes anhand der Change-Records eines Commands.
+    Mit publish=True ziehen die anderen Worker dieselben Records nach.
+    """
+    with STATE_LOCK:
+        applied = apply_change_records(app_state["graph"], records)
+        app_state["path_index"].apply_changes(app_state["graph"], applied)
+        app_state["impact_index"].apply_changes(app_state["graph"], applied)
+        app_state["traffic"].apply_changes(app_state["graph"], applied)
+        app_state["budget"].apply_changes(app_state["graph"], applied)
+        app_state["active_view"].apply_changes(app_state["graph"], applied)
+        app_state["kpis"].apply_changes(app_state["graph"], applied)
+        app_state["spatial_index"].apply_changes(app_state["graph"], applied)
+        app_state["geo_index"].apply_changes(app_state["graph"], applied)
+        if applied:
+            app_state["topology_cache"].invalidate()
+            log_changes(record_events(applied))
+            if publish:
+                publish_to_workers("records", records=encode_records(applied))
+        if GRAPH_CONSISTENCY_CHECK:
+            differences = check_graph_consistency(db_session)
+            if differences:
+                print(f"WARN: Gepatchter Graph weicht vom Datenbankstand ab ({len(differences)} Abweichungen), baue neu: {differences[:5]}")
+                build_graph_from_db(db_session, publish=publish)
+
+def change_log_state() -> dict:
+    """Vollständiger Zustand für einen Checkpoint des Änderungsprotokolls."""
+    topology = get_serialized_topology()
+    return {
+        'devices': topology['devices'],
+        'links': topology['links'],
+        'rings': topology['rings'],
+        'alarms': app_state["alarms"].active_alarms(),
+        'config': {'virtual_router': dict(VIRTUAL_ROUTER_CONFIG)},
+    }
+
+def log_changes(events: list):
+    """Hängt Events an das Änderungsprotokoll an und schreibt bei Bedarf einen Checkpoint."""
+    change_log = app_state["change_log"]
+    change_log.append(events)
+    if change_log.needs_checkpoint():
+        change_log.checkpoint(change_log_state())
+
+def check_graph_consistency(db_session: DBSessionType) -> list:
+    """Vergleicht den gepatchten Graphen und den Pfad-Index mit einem frischen Rebuild aus der Datenbank."""
+    fresh_graph = build_graph(db_session)
+    fresh_path_index = PathIndex(HEAD_END_TYPES)
+    fresh_path_index.rebuild(fresh_graph)
+    fresh_active_view = ActiveLinkView()
+    fresh_active_view.rebuild(fresh_graph)
+    fresh_kpis = TopologyKpis()
+    fresh_kpis.rebuild(fresh_graph)
+    fresh_spatial_index = SpatialGrid()
+    fresh_spatial_index.rebuild(fresh_graph)
+    fresh_alarms = AlarmEngine()
+    fresh_alarms.rebuild(db_session)
+    kpi_differences = [] if fresh_kpis.snapshot() == app_state["kpis"].snapshot() else [f"kpis differ: {app_state['kpis'].snapshot()} != {fresh_kpis.snapshot()}"]
+    return (
+        diff_graphs(fresh_graph, app_state["graph"])
+        + app_state["path_index"].diff(fresh_path_index)
+        + app_state["active_view"].diff(fresh_active_view)
+        + kpi_differences
+        + app_state["spatial_index"].diff(fresh_spatial_index)
+        + app_state["alarms"].diff(fresh_alarms)
+    )
+
 # --- Realtime & Statistik-Logik ---
-def emit_full_state_updates(db_session: DBSessionType):
-    full_topology = serialize_topology(db_session)
-    stats = get_current_topology_stats(db_session)
+def build_full_state(db_session: DBSessionType, viewport: dict = None) -> dict:
+    """
+    Kompletter Zustand inkl. Version; wird nur noch für request_initial_data und Resyncs gebraucht.
+    Mit viewport (siehe parse_viewport) nur die Geräte und Links im Kartenausschnitt.
+    """
+    full_topology = get_serialized_topology()
+    stats = get_current_topology_stats()
     history_status = get_current_history_status()
-    active_alarms = db_session.query(Alarm).filter_by(status='ACTIVE').all()
-    serialized_alarms = [{"id": a.id, "severity": a.severity, "status": a.status, "timestamp_raised": a.timestamp_raised, "affected_object_type": a.affected_object_type, "affected_object_id": a.affected_object_id, "description": a.description} for a in active_alarms]
-    socketio.emit('full_state_update', {'devices': full_topology['devices'], 'links': full_topology['links'], 'rings': full_topology['rings'], 'stats': stats, 'history_status': history_status, 'alarms': serialized_alarms})
+    serialized_alarms = app_state["alarms"].active_alarms()
+    state = {'version': app_state["delta_log"].version, 'devices': full_topology['devices'], 'links': full_topology['links'], 'rings': full_topology['rings'], 'stats': stats, 'history_status': history_status, 'alarms': serialized_alarms}
+    if viewport:
+        state.update(query_viewport(app_state["graph"], app_state["spatial_index"], **viewport), viewport=viewport)
+    return state
+
+def parse_viewport(params) -> dict:
+    """
+    Liest bbox, zoom, cursor und limit aus Query-Parametern bzw. dem WebSocket-Payload.
+    Ohne bbox wird None zurückgegeben (volle Topologie); ungültige Werte lösen ValueError aus.
+    """
+    if not params or not params.get('bbox'):
+        return None
+    bbox = params['bbox']
+    bbox = parse_bbox(bbox) if isinstance(bbox, str) else parse_bbox(",".join(str(v) for v in bbox))
+    zoom = params.get('zoom')
+    limit = int(params.get('limit', VIEWPORT_DEFAULT_LIMIT))
+    if not 1 <= limit <= VIEWPORT_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {VIEWPORT_MAX_LIMIT}.")
+    cursor = params.get('cursor')
+    return {"bbox": bbox, "zoom": float(zoom) if zoom not in (None, '') else None, "cursor": str(cursor) if cursor else None, "limit": limit}
 
-def emit_stats_update(db_session: DBSessionType):
-    stats = get_current_topology_stats(db_session)
-    socketio.emit('stats_update', stats)
+def emit_state_delta(db_session: DBSessionType, records: list = (), alarms: list = (), resync: bool = False, publish: bool = True):
+    """
+    Sendet nur die geänderten Geräte, Links, Ringe und Alarme als versioniertes 'state_delta'.
+    Mit resync=True werden die Clients aufgefordert, den vollständigen Zustand neu anzufordern.
+    Mit publish=True senden auch die anderen Worker das Delta an ihre Clients (Versionen zählt jeder Worker selbst).
+    """
+    if publish:
+        publish_to_workers("delta", records=encode_records(records), alarms=list(alarms), resync=resync)
+    graph = app_state["graph"]
+    link_endpoints = graph.graph.get("link_endpoints", {})
+    device_ids = {r.object_id for r in records if r.kind == 'device' and graph.has_node(r.object_id)}
+    link_ids = {r.object_id for r in records if r.kind == 'link' and r.object_id in link_endpoints}
+    # Alarmänderungen laufen immer über das State-Delta und werden hier protokolliert
+    log_changes(alarm_events(alarms))
+    rings = [
+        ring for ring in graph.graph.get("rings", {}).values()
+        if ring["rpl_link_id"] in link_ids or device_ids.intersection(ring["nodes"])
+    ]
+    delta = app_state["delta_log"].record({
+        'devices': [serialize_device(graph, device_id) for device_id in device_ids],
+        'links': [serialize_link(graph, link_id) for link_id in link_ids],
+        'rings': rings,
+        'alarms': list(alarms),
+        'stats': get_current_topology_stats(),
+        'history_status': get_current_history_status(),
+        'resync': resync
+    })
+    app_state["emitter"].delta(delta)
+
+def emit_stats_update():
+    stats = get_current_topology_stats()
+    emit_latest('stats_update', stats)
 
 def emit_history_status():
     status = get_current_history_status()
-    socketio.emit('history_status_update', status)
+    emit_latest('history_status_update', status)
 
 def get_current_history_status() -> dict:
-    return {"can_undo": len(app_state["undo_stack"]) > 0, "can_redo": len(app_state["redo_stack"]) > 0}
-
-def get_current_topology_stats(db_session: DBSessionType) -> dict:
-    devices = db_session.query(Device).all()
-    links = db_session.query(Link).all()
-    devices_total = len(devices)
-    devices_online = sum(1 for d in devices if d.status == 'online')
-    links_total = len(links)
-    links_up = sum(1 for l in links if l.status == 'up')
-    links_with_issue = sum(1 for l in links if l.status not in ['up', 'blocking'])
-    devices_with_issue = devices_total - devices_online
-    alarms = devices_with_issue + links_with_issue
-    return {"devices_total": devices_total, "devices_online": devices_online, "links_total": links_total, "links_up": links_up, "alarms": alarms}
+    return app_state["history"].status()
+
+def get_current_topology_stats() -> dict:
+    """Liest die live gepflegten KPI-Zähler (keine Datenbankabfrage)."""
+    return app_state["kpis"].snapshot()
 
 # --- Ring-Logik ---
 def initialize_rings(db_session: DBSessionType):
-    rings = db_session.query(Ring).all()
-    if not rings:
-        return
-    for ring in rings:
-        rpl_link = db_session.query(Link).filter_by(link_id_str=ring.rpl_link_id_str).first()
-        if rpl_link and rpl_link.status != 'blocking':
-            rpl_link.status = 'blocking'
-            db_session.add(rpl_link)
-            db_session.commit()
-            db_session.refresh(rpl_link)
-            add_event(f"ERPS: Link '{rpl_link.link_id_str}' in Ring '{ring.name}' set to BLOCKING.")
-
-def handle_ring_failure(db_session: DBSessionType, broken_link_id_str: str):
-    affected_ring = None
-    rings = db_session.query(Ring).all()
-    if not rings:
-        return None
-    broken_link_db_obj = db_session.query(Link).filter_by(link_id_str=broken_link_id_str).first()
-    if not broken_link_db_obj:
-        return None
-    for r in rings:
-        ring_node_ids_str = {node.device_id_str for node in r.nodes}
-        if broken_link_db_obj.source.device_id_str in ring_node_ids_str and broken_link_db_obj.target.device_id_str in ring_node_ids_str:
-            affected_ring = r
-            break
-    if not affected_ring or affected_ring.rpl_link_id_str == broken_link_id_str:
-        return None
-    rpl_link = db_session.query(Link).filter_by(link_id_str=affected_ring.rpl_link_id_str).first()
-    if rpl_link and rpl_link.status == 'blocking':
-        failover_command = UpdateLinkStatusCommand(db_session, rpl_link.link_id_str, 'up')
-        add_event(f"ERPS: Failover in Ring '{affected_ring.name}'. Unblocking RPL '{rpl_link.link_id_str}'.")
-        return failover_command
-    return None
-    
+    """Bringt alle Ringe in ihren Sollzustand (RPL blockiert bzw. bei Störung offen): ein Batch, ein Commit, ohne Historie."""
+    with STATE_LOCK:
+        engine = app_state["ring_engine"]
+        graph = app_state["graph"]
+        changes, events = engine.plan(graph, ring_ids=list(engine.rings))
+        if not changes:
+            return
+        link_endpoints = graph.graph["link_endpoints"]
+        records = [ChangeRecord('link', link_id_str, 'status', graph.edges[link_endpoints[link_id_str]]['status'], status)
+                   for link_id_str, status in changes.items()]
+        apply_status_updates(db_session, 'link', changes)
+        db_session.commit()
+        apply_state_changes(db_session, records)
+    for event in events:
+        add_event(event)
+
+def add_ring_commands(db_session: DBSessionType, composite_command: CompositeCommand, link_changes: dict, device_changes: dict = None) -> list:
+    """
+    ERPS: ergänzt ein Composite-Command um die Blockierungsänderungen der betroffenen Ringe, damit Ausfall
+    und Failover gemeinsam committet und rückgängig gemacht werden. Liefert die Ereignistexte.
+    """
+    changes, events = app_state["ring_engine"].plan(app_state["graph"], link_changes, device_changes)
+    # Ein Link, den das Command bereits ändert, bekommt den Zielstatus des Rings (ein Record pro Objekt)
+    planned = {c.link_id_str: c for c in composite_command.commands if isinstance(c, UpdateLinkStatusCommand)}
+    for link_id_str, status in changes.items():
+        if link_id_str in planned:
+            planned[link_id_str].new_status = status
+        else:
+            composite_command.add(UpdateLinkStatusCommand(db_session, link_id_str, status))
+    return events
+
+# --- Verkehrssimulation ---
+# Zustand der Tick-Schleife; eine neue generation beendet eine noch laufende alte Schleife
+TRAFFIC_LOOP = {"running": False, "generation": 0, "tick_s": TRAFFIC_TICK_S, "time_scale": TRAFFIC_TIME_SCALE, "last_tick_ms": None}
+
+def run_traffic_tick(db_session: DBSessionType, sim_seconds: float) -> list:
+    """Ein Tick der Verkehrssimulation; nur SLA-Übergänge schreiben Alarme und erzeugen ein State-Delta."""
+    started = time.perf_counter()
+    with STATE_LOCK:
+        checks = app_state["traffic"].tick(app_state["graph"], app_state["path_index"], time.time(), sim_seconds)
+        changed_alarms = app_state["alarms"].evaluate(db_session, checks) if checks else []
+    TRAFFIC_LOOP["last_tick_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if changed_alarms:
+        raised = sum(1 for alarm in changed_alarms if alarm["status"] != "CLEARED")
+        add_event(f"TRAFFIC: SLA violation risk raised on {raised} link(s), cleared on {len(changed_alarms) - raised} link(s).")
+        emit_state_delta(db_session, alarms=changed_alarms)
+    emit_latest('traffic_update', app_state["traffic"].status(top=5))
+    return changed_alarms
+
+def traffic_loop(generation: int):
+    while TRAFFIC_LOOP["running"] and TRAFFIC_LOOP["generation"] == generation:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            run_traffic_tick(db, TRAFFIC_LOOP["tick_s"] * TRAFFIC_LOOP["time_scale"])
+        except Exception as e:
+            db.rollback()
+            print(f"WARN: Verkehrssimulation: Tick fehlgeschlagen: {e}")
+        finally:
+            db.close()
+        socketio.sleep(max(0.0, TRAFFIC_LOOP["tick_s"] - (time.perf_counter() - started)))
+
+def start_traffic_simulation(tick_s: float, time_scale: float):
+    TRAFFIC_LOOP.update(running=True, generation=TRAFFIC_LOOP["generation"] + 1, tick_s=tick_s, time_scale=time_scale)
+    socketio.start_background_task(traffic_loop, TRAFFIC_LOOP["generation"])
+
+def get_traffic_status(top: int = 10) -> dict:
+    loop = {key: TRAFFIC_LOOP[key] for key in ("running", "tick_s", "time_scale", "last_tick_ms")}
+    with STATE_LOCK:
+        return {**loop, **app_state["traffic"].status(top)}
+
 # --- Alarm- & Berechnungs-Logik (Layer 1 & 2) ---
-def check_thresholds_and_update_alarms(db, updated_object, **kwargs):
-    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
-    alarm_changed = False
-
-    if isinstance(updated_object, Link) and updated_object.properties.get("link_technology") == "PtP":
-        utilization = updated_object.properties.get('utilization_percent', 0)
-        guaranteed_bw = updated_object.properties.get('guaranteed_bandwidth_gbps', 0)
-        existing_alarm = db.query(Alarm).filter_by(affected_object_id=updated_object.link_id_str, description="SLA Violation Risk", status="ACTIVE").first()
-        if guaranteed_bw > 0 and utilization > 80 and not existing_alarm:
-            new_alarm = Alarm(severity="MAJOR", status="ACTIVE", timestamp_raised=now, affected_object_type="link", affected_object_id=updated_object.link_id_str, description="SLA Violation Risk")
-            db.add(new_alarm)
-            alarm_changed = True
-        elif utilization <= 80 and existing_alarm:
-            existing_alarm.status = "CLEARED"
-            existing_alarm.timestamp_cleared = now
-            alarm_changed = True
-
-    if isinstance(updated_object, Device) and updated_object.type in END_DEVICE_TYPES:
-        signal_status = kwargs.get("signal_status")
-        existing_alarm = db.query(Alarm).filter_by(affected_object_id=updated_object.device_id_str, description="Loss of Signal", status="ACTIVE").first()
-        if signal_status == "LOS" and not existing_alarm:
-            new_alarm = Alarm(severity="CRITICAL", status="ACTIVE", timestamp_raised=now, affected_object_type="device", affected_object_id=updated_object.device_id_str, description="Loss of Signal")
-            db.add(new_alarm)
-            alarm_changed = True
-        elif signal_status != "LOS" and existing_alarm:
-            existing_alarm.status = "CLEARED"
-            existing_alarm.timestamp_cleared = now
-            alarm_changed = True
-
-    if alarm_changed:
-        db.commit()
-        emit_full_state_updates(db)
+def get_derived_link_lengths() -> dict:
+    """Abgeleitete Linklängen für das optische Budget (None bei LINK_LENGTH_SOURCE=property)."""
+    if LINK_LENGTH_SOURCE == 'property':
+        return None
+    return app_state["geo_index"].derived_lengths_km()
+
+def reevaluate_signal_alarms(db: DBSessionType, records: list):
+    """
+    LOS-Neubewertung für die Endgeräte unterhalb geänderter Budget-Parameter (Link- oder Geräte-Properties),
+    z.B. nach einer Property-Änderung und ihrem Undo/Redo. Liefert (Budgetergebnisse, geänderte Alarme).
+    """
+    with STATE_LOCK:
+        graph, path_index = app_state["graph"], app_state["path_index"]
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        tops = set()
+        for record in records:
+            if not budget_changed(record):
+                continue
+            if record.kind == 'link':
+                # Nur Baumlinks liegen auf einem Signalpfad
+                endpoints = link_endpoints.get(record.object_id)
+                if endpoints and path_index.parent.get(endpoints[1]) == endpoints[0]:
+                    tops.add(endpoints[1])
+            elif record.object_id in path_index.depth:
+                tops.add(record.object_id)
+        if not tops:
+            return {}, []
+        affected = set()
+        for node_id in tops:
+            affected.update(path_index.end_devices_below(graph, node_id, END_DEVICE_TYPES))
+        results = app_state["budget"].results(graph, path_index.tree(), affected)
+        return results, app_state["alarms"].evaluate(db, signal_checks(results))
 
 def calculate_signal_power(db: DBSessionType, end_device_id_str: str):
     graph = app_state["graph"]
     end_node = graph.nodes.get(end_device_id_str)
-    if not end_node or end_node['db_obj'].type not in END_DEVICE_TYPES:
+    if not end_node or end_node['type'] not in END_DEVICE_TYPES:
         return {"error": f"Device is not a valid end device ({', '.join(END_DEVICE_TYPES)})"}
 
-    path_nodes = None
-    head_end_device_ids = [n for n, d in graph.nodes(data=True) if d.get('db_obj') and d['db_obj'].type in HEAD_END_TYPES]
-    
-    for start_node_id in head_end_device_ids:
-        if nx.has_path(graph, source=start_node_id, target=end_device_id_str):
-            path_nodes = nx.shortest_path(graph, source=start_node_id, target=end_device_id_str)
-            break
-    
-    if not path_nodes:
-        return {"error": "No path from any head-end found", "status": "NO_PATH", "power_dbm": None, "budget": {}}
-
-    path_links = [graph.get_edge_data(path_nodes[i], path_nodes[i+1])['db_obj'] for i in range(len(path_nodes) - 1)]
-    is_ptp_path = any(link.properties.get("link_technology") == "PtP" for link in path_links)
-    start_node_db = graph.nodes[path_nodes[0]]['db_obj']
-    transmit_power = float(start_node_db.properties.get("transmit_power_dbm", 0.0))
-    ont_tech = end_node['db_obj'].properties.get("technology", "GPON")
-    downstream_wavelength = '1490nm' if ont_tech == 'GPON' else '1577nm'
-    
-    budget_breakdown = {
-        "Transmit Power": transmit_power,
-        "Fiber Loss": 0.0,
-        "Splitter Loss": 0.0,
-        "Connector Loss": 0.0,
-        "Splice Loss": 0.0,
-        "Maintenance Margin": MAINTENANCE_MARGIN_DB
-    }
-
-    for link in path_links:
-        props = link.properties or {}
-        budget_breakdown["Fiber Loss"] += props.get("length_km", 0) * FIBER_LOSS_PER_KM.get(downstream_wavelength, 0.4)
-        budget_breakdown["Connector Loss"] += props.get("connector_count", 0) * CONNECTOR_LOSS_DB
-        budget_breakdown["Splice Loss"] += props.get("splice_count", 0) * SPLICE_LOSS_DB
-        
-    if not is_ptp_path:
-        for node_id in path_nodes:
-            node_db = graph.nodes[node_id]['db_obj']
-            if node_db.type == 'Splitter':
-                props = node_db.properties or {}
-                budget_breakdown["Splitter Loss"] += float(props.get("insertion_loss_db", 0.0))
-
-    total_loss = (
-        budget_breakdown["Fiber Loss"] +
-        budget_breakdown["Splitter Loss"] +
-        budget_breakdown["Connector Loss"] +
-        budget_breakdown["Splice Loss"] +
-        budget_breakdown["Maintenance Margin"]
-    )
-    
-    received_power = transmit_power - total_loss
-    end_device_db_obj = end_node['db_obj']
-    end_device_props = end_device_db_obj.properties or {}
-    sensitivity = float(end_device_props.get("sensitivity_min_dbm", -30.0))
-    device_status = "online" if received_power >= sensitivity else "LOS"
-    check_thresholds_and_update_alarms(db, end_device_db_obj, signal_status=device_status)
-
-    return {
-        "status": device_status,
-        "power_dbm": round(received_power, 2),
-        "budget": {k: round(v, 2) for k, v in budget_breakdown.items()},
-        "total_loss": round(total_loss, 2),
-        "path_technology": "PtP" if is_ptp_path else "PON"
-    }
+    # Budget aus den gecachten Verlustvektoren entlang des Head-End-Baums (keine Graphsuche)
+    with STATE_LOCK:
+        result = app_state["budget"].result(graph, app_state["path_index"].tree(), end_device_id_str)
+        if result["status"] == "NO_PATH":
+            return result
+        changed_alarms = app_state["alarms"].evaluate(db, signal_checks({end_device_id_str: result}))
+    if changed_alarms:
+        emit_state_delta(db, alarms=changed_alarms)
+    return result
 
 # --- Emulationslogik für Layer 2/3 (unverändert von Phase 5) ---
 def simulate_connection_attempt():
@@ -382,26 +638,89 @@ def simulate_sip_registration():
     return VIRTUAL_SIP_PHONE_CONFIG
 
 # --- API Endpoints ---
+@app.route('/api/debug/graph-consistency', methods=['GET'])
+def get_graph_consistency_api():
+    differences = check_graph_consistency(g.db)
+    return jsonify({"consistent": not differences, "differences": differences})
+
 @app.route('/api/topology', methods=['GET'])
 def get_topology_api():
-    db = g.db
-    topology_data = serialize_topology(db)
-    stats = get_current_topology_stats(db)
+    """
+    Vorkodierte Topologie aus dem Cache; unterstützt If-None-Match (304) und gzip.
+    Mit ?bbox=min_lon,min_lat,max_lon,max_lat[&zoom=..&cursor=..&limit=..] nur der Kartenausschnitt.
+    """
+    try:
+        viewport = parse_viewport(request.args)
+    except ValueError as e:
+        abort(400, description=str(e))
     history_status = get_current_history_status()
-    return jsonify({'devices': topology_data['devices'], 'links': topology_data['links'], 'rings': topology_data['rings'], 'stats': stats, 'history_status': history_status})
+    if viewport:
+        topology_data = get_serialized_topology()
+        return jsonify({**query_viewport(app_state["graph"], app_state["spatial_index"], **viewport), 'rings': topology_data['rings'], 'stats': get_current_topology_stats(), 'history_status': history_status, 'viewport': viewport})
+
+    def build_payload():
+        topology_data = get_serialized_topology()
+        return {'devices': topology_data['devices'], 'links': topology_data['links'], 'rings': topology_data['rings'], 'stats': get_current_topology_stats(), 'history_status': history_status}
+
+    payload = app_state["topology_cache"].encoded((history_status["can_undo"], history_status["can_redo"]), build_payload)
+    use_gzip = 'gzip' in request.accept_encodings
+    response = Response(payload.gzip_body if use_gzip else payload.body, mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(f"{payload.etag}-gz" if use_gzip else payload.etag)
+    return response.make_conditional(request)
 
 @app.route('/api/topology/stats', methods=['GET'])
 def get_topology_stats_api():
-    db = g.db
-    return jsonify(get_current_topology_stats(db))
+    return jsonify(get_current_topology_stats())
 
 @app.route('/api/events', methods=['GET'])
 def get_events_api():
     return jsonify(["Events sind jetzt über WebSockets verfügbar."])
 
+@app.route('/api/changelog', methods=['GET'])
+def get_change_log_api():
+    """Events des Änderungsprotokolls nach ?since=<seq> (höchstens ?limit=, Standard 1000)."""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+    except ValueError:
+        abort(400, description="'since' and 'limit' must be integers.")
+    change_log = app_state["change_log"]
+    return jsonify({**change_log.status(), "events": change_log.events(since, limit)})
+
+@app.route('/api/changelog/state', methods=['GET'])
+def get_change_log_state_api():
+    """Rekonstruierter Zustand nach ?seq=<n> oder zum Zeitpunkt ?at=<ISO 8601, ohne Zeitzone = UTC>."""
+    change_log = app_state["change_log"]
+    if not change_log.enabled:
+        abort(404, description="Change log is disabled (CHANGE_LOG_DIR).")
+    try:
+        seq = int(request.args['seq']) if 'seq' in request.args else None
+        at = datetime.datetime.fromisoformat(request.args['at']) if 'at' in request.args else None
+    except ValueError:
+        abort(400, description="'seq' must be an integer and 'at' an ISO 8601 timestamp.")
+    started = time.perf_counter()
+    state = change_log.replay(seq=seq, at=at)
+    if state is None:
+        abort(404, description="No checkpoint before the requested point in time.")
+    state["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return jsonify(state)
+
+@app.route('/api/debug/storage', methods=['GET'])
+def get_storage_status_api():
+    """Aktives Storage-Backend und (beim In-Memory-Store) Stand der Sicherung."""
+    return jsonify(storage.status())
+
+@app.route('/api/debug/emissions', methods=['GET'])
+def get_emission_stats_api():
+    """Zähler des Emission-Schedulers (gesendet, zusammengeführt, verworfen) und gedrosselte Clients."""
+    return jsonify(app_state["emitter"].stats())
+
 @app.route('/api/history/status', methods=['GET'])
 def get_history_status_api():
-    return jsonify(get_current_history_status())
+    return jsonify({**get_current_history_status(), **app_state["history"].stats()})
 
 @app.route('/api/links/<string:link_id_str>/status', methods=['POST'])
 def update_link_status(link_id_str: str):
@@ -410,24 +729,81 @@ def update_link_status(link_id_str: str):
         payload = UpdateLinkStatusPayload.model_validate(request.get_json())
     except ValidationError as e:
         abort(422, description=e.errors())
-    target_link = db.query(Link).filter_by(link_id_str=link_id_str).first()
-    if not target_link:
+    # Existenzprüfung über den Graphen; das Command liest den Ausgangsstatus ohnehin aus dem Storage
+    if link_id_str not in app_state["graph"].graph.get("link_endpoints", {}):
         abort(404, description=f"Link with ID '{link_id_str}' not found.")
     main_command = UpdateLinkStatusCommand(db, link_id_str, payload.status)
-    composite_command = CompositeCommand(db)
+    composite_command = CompositeCommand(db, batched=True)
     composite_command.add(main_command)
-    if payload.status in ['down', 'degraded']:
-        failover_cmd = handle_ring_failure(db, link_id_str)
-        if failover_cmd:
-            composite_command.add(failover_cmd)
+    ring_events = add_ring_commands(db, composite_command, {link_id_str: payload.status})
     try:
-        execute_command(composite_command)
+        execute_command(composite_command, f"link-status {link_id_str} -> {payload.status}")
         add_event(f"SIMULATION: Status of link '{link_id_str}' changed to '{payload.status}'.")
+        for event in ring_events:
+            add_event(event)
         return jsonify({"message": f"Link '{link_id_str}' status updated."})
     except ValueError as e:
         db.rollback()
         abort(500, description=str(e))
 
+@app.route('/api/links/status', methods=['POST'])
+def update_link_statuses():
+    """Ändert den Status vieler Links in einem Command (z.B. ein Alarmsturm); Ring-Failover wird gemeinsam geplant."""
+    db = g.db
+    try:
+        payload = BulkLinkStatusPayload.model_validate(request.get_json())
+    except ValidationError as e:
+        abort(422, description=e.errors())
+    if not payload.links:
+        abort(400, description="'links' must not be empty.")
+    started = time.perf_counter()
+    link_endpoints = app_state["graph"].graph.get("link_endpoints", {})
+    unknown = [link_id_str for link_id_str in payload.links if link_id_str not in link_endpoints]
+    if unknown:
+        abort(404, description=f"Links not found: {', '.join(unknown[:10])}")
+    composite_command = CompositeCommand(db, batched=True)
+    for link_id_str, status in payload.links.items():
+        composite_command.add(UpdateLinkStatusCommand(db, link_id_str, status))
+    ring_events = add_ring_commands(db, composite_command, payload.links)
+    try:
+        execute_command(composite_command, f"link-status x{len(payload.links)}")
+    except ValueError as e:
+        db.rollback()
+        abort(500, description=str(e))
+    duration_ms = (time.perf_counter() - started) * 1000
+    add_event(f"SIMULATION: Status of {len(payload.links)} links changed.")
+    for event in ring_events:
+        add_event(event)
+    return jsonify({"message": f"{len(payload.links)} link statuses updated.", "ring_changes": len(composite_command.commands) - len(payload.links), "duration_ms": round(duration_ms, 2)})
+
+@app.route('/api/rings', methods=['GET'])
+def get_rings():
+    """ERPS-Zustand aller Ringe (idle, protection, pending) aus dem Ring-Index."""
+    with STATE_LOCK:
+        return jsonify({"revertive": ERPS_REVERTIVE, "rings": app_state["ring_engine"].states(app_state["graph"])})
+
+@app.route('/api/rings/<string:ring_id_str>/clear', methods=['POST'])
+def clear_ring(ring_id_str: str):
+    """Nicht revertiver Betrieb: schaltet einen intakten Ring manuell auf den RPL zurück."""
+    db = g.db
+    engine = app_state["ring_engine"]
+    if ring_id_str not in engine.rings:
+        abort(404, description=f"Ring '{ring_id_str}' not found.")
+    changes, events = engine.clear(app_state["graph"], ring_id_str)
+    if not changes:
+        return jsonify({"message": f"Ring '{ring_id_str}' is failed or already blocking its RPL; nothing to clear."})
+    composite_command = CompositeCommand(db, batched=True)
+    for link_id_str, status in changes.items():
+        composite_command.add(UpdateLinkStatusCommand(db, link_id_str, status))
+    try:
+        execute_command(composite_command, f"ring-clear {ring_id_str}")
+    except ValueError as e:
+        db.rollback()
+        abort(500, description=str(e))
+    for event in events:
+        add_event(event)
+    return jsonify({"message": f"Ring '{ring_id_str}' cleared.", "changes": changes})
+
 @app.route('/api/devices/<string:device_id_str>/signal', methods=['GET'])
 def get_device_signal(device_id_str: str):
     db = g.db
@@ -441,6 +817,119 @@ def get_device_signal(device_id_str: str):
     signal_info = calculate_signal_power(db, device_id_str)
     return jsonify(signal_info)
 
+@app.route('/api/signal/bulk', methods=['GET'])
+def get_bulk_signal():
+    """
+    Netzweites LOS-Audit: Signalbudget aller Endgeräte in einem Durchlauf (optional ?status=LOS).
+    LOS-Alarme werden gesammelt gehoben/gecleart und als ein einziges Alarm-Delta gesendet.
+    """
+    db = g.db
+    started = datetime.datetime.now()
+    with STATE_LOCK:
+        results = app_state["budget"].results(app_state["graph"], app_state["path_index"].tree())
+        changed_alarms = app_state["alarms"].evaluate(db, signal_checks(results))
+    summary = {"total": len(results), "online": 0, "LOS": 0, "NO_PATH": 0}
+    for result in results.values():
+        summary[result["status"]] += 1
+    if changed_alarms:
+        emit_state_delta(db, alarms=changed_alarms)
+    summary["alarms_changed"] = len(changed_alarms)
+    status_filter = request.args.get('status')
+    if status_filter:
+        results = {device_id: r for device_id, r in results.items() if r["status"] == status_filter}
+    duration_ms = (datetime.datetime.now() - started).total_seconds() * 1000
+    return jsonify({"summary": summary, "results": results, "duration_ms": round(duration_ms, 2)})
+
+def _geo_query_args():
+    """lon/lat (Pflicht) und optionale type-Filter (mehrfach oder kommagetrennt) aus den Query-Parametern."""
+    try:
+        lon, lat = float(request.args['lon']), float(request.args['lat'])
+    except (KeyError, ValueError):
+        abort(400, description="Query parameters 'lon' and 'lat' are required and must be numbers.")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        abort(400, description="'lon' or 'lat' out of range.")
+    types = [t for value in request.args.getlist('type') for t in value.split(',') if t] or None
+    return lon, lat, types
+
+@app.route('/api/geo/nearest', methods=['GET'])
+def get_geo_nearest():
+    """k nächste Geräte zu einem Punkt, z.B. ?lon=6.4&lat=51.7&type=Core Node&k=1 für den nächsten Core Node."""
+    lon, lat, types = _geo_query_args()
+    try:
+        k = int(request.args.get('k', 1))
+        max_km = float(request.args['max_km']) if 'max_km' in request.args else None
+    except ValueError:
+        abort(400, description="'k' must be an integer and 'max_km' a number.")
+    if not 1 <= k <= GEO_MAX_RESULTS:
+        abort(400, description=f"'k' must be between 1 and {GEO_MAX_RESULTS}.")
+    started = time.perf_counter()
+    results = app_state["geo_index"].nearest(lon, lat, k, types, max_km)
+    return jsonify({"results": results, "duration_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+@app.route('/api/geo/radius', methods=['GET'])
+def get_geo_radius():
+    """Alle Geräte im Umkreis radius_km um einen Punkt, nach Distanz sortiert (höchstens limit)."""
+    lon, lat, types = _geo_query_args()
+    try:
+        radius_km = float(request.args['radius_km'])
+        limit = int(request.args.get('limit', GEO_MAX_RESULTS))
+    except (KeyError, ValueError):
+        abort(400, description="'radius_km' is required and must be a number; 'limit' must be an integer.")
+    if radius_km < 0 or limit < 1:
+        abort(400, description="'radius_km' must not be negative and 'limit' must be positive.")
+    started = time.perf_counter()
+    results = app_state["geo_index"].within_radius(lon, lat, radius_km, types, limit)
+    return jsonify({"results": results, "duration_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+@app.route('/api/geo/link-lengths', methods=['GET'])
+def get_geo_link_lengths():
+    """Aus Geometrie bzw. Endpunktkoordinaten abgeleitete Linklängen neben dem gepflegten length_km."""
+    graph = app_state["graph"]
+    derived = app_state["geo_index"].link_lengths()
+    budget_lengths = get_derived_link_lengths()
+    results = {}
+    for source, target, edge in graph.edges(data=True):
+        entry = derived.get(edge['link_id_str'])
+        results[edge['link_id_str']] = {
+            "length_km": (edge['properties'] or {}).get("length_km"),
+            "derived_length_km": entry["length_km"] if entry else None,
+            "method": entry["method"] if entry else None,
+            "budget_length_km": fiber_length_km(edge, budget_lengths, LINK_LENGTH_SOURCE == 'derived'),
+        }
+    return jsonify({"length_source": LINK_LENGTH_SOURCE, "links": results})
+
+@app.route('/api/links/<string:link_id_str>/properties', methods=['POST'])
+def update_link_properties(link_id_str: str):
+    """
+    Ändert length_km, connector_count oder splice_count eines Links (rückgängig machbar). Das Budget
+    führt nur den Teilbaum unter dem Link nach; LOS wird für die Endgeräte darunter neu bewertet.
+    """
+    db = g.db
+    try:
+        payload = UpdateLinkPropertiesPayload.model_validate(request.get_json())
+    except ValidationError as e:
+        abort(422, description=e.errors())
+    updates = payload.model_dump(exclude_none=True)
+    if not updates:
+        abort(400, description="At least one of 'length_km', 'connector_count' or 'splice_count' is required.")
+    endpoints = app_state["graph"].graph.get("link_endpoints", {}).get(link_id_str)
+    if endpoints is None:
+        abort(404, description=f"Link with ID '{link_id_str}' not found.")
+    started = time.perf_counter()
+    command = UpdateLinkPropertiesCommand(db, link_id_str, updates)
+    try:
+        execute_command(command, f"link-properties {link_id_str}")
+    except ValueError as e:
+        db.rollback()
+        abort(500, description=str(e))
+    results, changed_alarms = reevaluate_signal_alarms(db, command.get_change_records())
+    if changed_alarms:
+        emit_state_delta(db, alarms=changed_alarms)
+    duration_ms = (time.perf_counter() - started) * 1000
+    add_event(f"LINK-BUDGET: Properties of link '{link_id_str}' changed ({', '.join(f'{key}={value}' for key, value in updates.items())}).")
+    return jsonify({"message": f"Properties of link '{link_id_str}' updated.", "affected_devices": len(results),
+                    "LOS": sum(1 for result in results.values() if result["status"] == "LOS"), "alarms_changed": len(changed_alarms),
+                    "duration_ms": round(duration_ms, 2)})
 
 @app.route('/api/links/<string:link_id_str>/utilization', methods=['POST'])
 def set_link_utilization(link_id_str: str):
@@ -455,18 +944,91 @@ def set_link_utilization(link_id_str: str):
     if not link:
         abort(404, description=f"Link with ID '{link_id_str}' not found.")
     
-    props = link.properties.copy() if link.properties else {}
+    old_props = link.properties or {}
+    props = old_props.copy()
     props['utilization_percent'] = utilization
     link.properties = props
     db.add(link)
-    
-    check_thresholds_and_update_alarms(db, link)
     db.commit()
+    records = [ChangeRecord('link', link_id_str, 'properties', old_props, props)]
+    apply_state_changes(db, records)
+    with STATE_LOCK:
+        changed_alarms = app_state["alarms"].evaluate(db, sla_checks({link_id_str: props}))
     
     add_event(f"LINK-UTIL: Utilization of link '{link_id_str}' set to {utilization}%.")
-    emit_full_state_updates(db)
+    emit_state_delta(db, records, alarms=changed_alarms)
     return jsonify({"message": f"Utilization of link '{link_id_str}' set to {utilization}%."})
 
+@app.route('/api/traffic', methods=['GET'])
+def get_traffic_api():
+    try:
+        top = int(request.args.get('top', 10))
+    except ValueError:
+        abort(400, description="'top' must be an integer.")
+    return jsonify(get_traffic_status(top))
+
+@app.route('/api/traffic/start', methods=['POST'])
+def start_traffic_api():
+    payload = request.get_json(silent=True) or {}
+    try:
+        tick_s = float(payload.get('tick_s', TRAFFIC_LOOP["tick_s"]))
+        time_scale = float(payload.get('time_scale', TRAFFIC_LOOP["time_scale"]))
+    except (TypeError, ValueError):
+        abort(400, description="'tick_s' and 'time_scale' must be numbers.")
+    if tick_s <= 0 or time_scale < 0:
+        abort(400, description="'tick_s' must be positive and 'time_scale' must not be negative.")
+    start_traffic_simulation(tick_s, time_scale)
+    add_event(f"TRAFFIC: Simulation started (tick {tick_s} s, time scale {time_scale}x).")
+    return jsonify(get_traffic_status())
+
+@app.route('/api/traffic/stop', methods=['POST'])
+def stop_traffic_api():
+    TRAFFIC_LOOP["running"] = False
+    add_event("TRAFFIC: Simulation stopped.")
+    return jsonify(get_traffic_status())
+
+@app.route('/api/traffic/tick', methods=['POST'])
+def tick_traffic_api():
+    """Einzelne Ticks von Hand (z.B. bei gestoppter Simulation); sim_seconds ist der Zeitvorschub pro Tick."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        count = int(payload.get('count', 1))
+        sim_seconds = float(payload.get('sim_seconds', TRAFFIC_LOOP["tick_s"] * TRAFFIC_LOOP["time_scale"]))
+    except (TypeError, ValueError):
+        abort(400, description="'count' and 'sim_seconds' must be numbers.")
+    if not 1 <= count <= TRAFFIC_HISTORY_LENGTH or sim_seconds < 0:
+        abort(400, description=f"'count' must be between 1 and {TRAFFIC_HISTORY_LENGTH}, 'sim_seconds' must not be negative.")
+    changed_alarms = []
+    for _ in range(count):
+        changed_alarms += run_traffic_tick(g.db, sim_seconds)
+    return jsonify({**get_traffic_status(), "changed_alarms": len(changed_alarms)})
+
+@app.route('/api/traffic/history', methods=['GET'])
+def get_traffic_history_api():
+    """Ausschnitt aus dem Ringpuffer: ?links=a,b (mehrfach oder kommagetrennt) und ?window=<Ticks>."""
+    link_ids = [link_id for value in request.args.getlist('links') for link_id in value.split(',') if link_id]
+    if not link_ids:
+        abort(400, description="Query parameter 'links' is required.")
+    return traffic_history_response(link_ids)
+
+@app.route('/api/traffic/links/<string:link_id_str>/history', methods=['GET'])
+def get_link_traffic_history_api(link_id_str: str):
+    return traffic_history_response([link_id_str])
+
+def traffic_history_response(link_ids: list):
+    try:
+        window = int(request.args['window']) if request.args.get('window') else None
+    except ValueError:
+        abort(400, description="'window' must be an integer (number of ticks).")
+    if window is not None and window < 0:
+        abort(400, description="'window' must not be negative.")
+    with STATE_LOCK:
+        engine = app_state["traffic"]
+        for link_id in link_ids:
+            if link_id not in engine.link_index:
+                abort(404, description=f"Link '{link_id}' not found.")
+        return jsonify(engine.history_for(link_ids, window))
+
 # --- ERWEITERT FÜR PHASE 6: Endpunkt für die virtuelle Router-Konfiguration ---
 @app.route('/api/simulation/virtual-router/config', methods=['POST'])
 def configure_virtual_router():
@@ -479,7 +1041,9 @@ def configure_virtual_router():
         abort(400, "Keine Konfigurationsdaten empfangen.")
 
     # Aktualisiere die globale Konfiguration sicher
+    old_config = dict(VIRTUAL_ROUTER_CONFIG)
     VIRTUAL_ROUTER_CONFIG.update(config_data)
+    log_changes([{"type": "config", "name": "virtual_router", "old": old_config, "new": dict(VIRTUAL_ROUTER_CONFIG)}])
     add_event(f"ROUTER-SIM: Received new config: {config_data}")
     
     # Simuliere einen Verbindungs-Neustart und den SIP-Versuch
@@ -487,7 +1051,8 @@ def configure_virtual_router():
     sip_result = simulate_sip_registration()
 
     # Sende alle relevanten Status an die Clients
-    socketio.emit('full_service_status', {
+    publish_to_workers("config", virtual_router=dict(VIRTUAL_ROUTER_CONFIG), sip_phone=dict(VIRTUAL_SIP_PHONE_CONFIG))
+    emit_latest('full_service_status', {
         "connection": connection_result,
         "sip": sip_result
     })
@@ -495,197 +1060,370 @@ def configure_virtual_router():
     return jsonify({"message": "Configuration applied and services re-evaluated."})
 
 
+def trace_from_path_index(start_node_str: str, end_node_str: str):
+    """Liefert den Trace aus der Parent-Kette, falls ein Knoten Vorfahre des anderen im Head-End-Baum ist."""
+    graph = app_state["graph"]
+    path_index = app_state["path_index"]
+    for ancestor, descendant in ((start_node_str, end_node_str), (end_node_str, start_node_str)):
+        chain = path_index.path_to(descendant)
+        if not chain or ancestor not in chain:
+            continue
+        chain = chain[chain.index(ancestor):]
+        edges = [graph.edges[chain[i], chain[i + 1]] for i in range(len(chain) - 1)]
+        if any(edge['status'] != 'up' for edge in edges):
+            return None
+        if ancestor == end_node_str:
+            chain.reverse()
+            edges.reverse()
+        return {"nodes": chain, "links": [edge['link_id_str'] for edge in edges]}
+    return None
+
 @app.route('/api/simulation/trace-path', methods=['POST'])
 def trace_path():
-    db = g.db
     payload = request.get_json()
     start_node_str = payload.get('start_node')
     end_node_str = payload.get('end_node')
     if not start_node_str or not end_node_str:
         abort(400, description="Missing 'start_node' or 'end_node' in request.")
-    build_graph_from_db(db)
     graph = app_state["graph"]
     if not graph.has_node(start_node_str) or not graph.has_node(end_node_str):
         abort(404, description="One of the specified nodes does not exist.")
+    # Head-End -> Teilnehmer: Pfad direkt aus dem Index, wenn die Kette komplett 'up' ist
+    indexed_path = trace_from_path_index(start_node_str, end_node_str)
+    if indexed_path:
+        return jsonify(indexed_path)
     try:
-        active_graph = nx.Graph()
-        active_graph.add_nodes_from([d.device_id_str for d in db.query(Device).all()])
-        active_links = []
-        for l in db.query(Link).all():
-            if l.status == 'up' and l.source and l.target:
-                active_links.append((l.source.device_id_str, l.target.device_id_str))
-        active_graph.add_edges_from(active_links)
-        path_nodes_str = nx.shortest_path(active_graph, source=start_node_str, target=end_node_str)
-        path_links_str = []
-        for i in range(len(path_nodes_str) - 1):
-            u_str, v_str = path_nodes_str[i], path_nodes_str[i+1]
-            link_obj = db.query(Link).filter((Link.source.has(device_id_str=u_str) & Link.target.has(device_id_str=v_str)) | (Link.source.has(device_id_str=v_str) & Link.target.has(device_id_str=u_str))).first()
-            if link_obj:
-                path_links_str.append(link_obj.link_id_str)
+        # Eine BFS über die gepflegte 'up'-Sicht, Link-IDs aus dem (u, v)-Index
+        path_nodes_str, path_links_str = app_state["active_view"].trace(start_node_str, end_node_str)
         return jsonify({"nodes": path_nodes_str, "links": path_links_str})
-    except nx.NetworkXNoPath:
-        return jsonify({"nodes": [], "links": []})
     except Exception as e:
         abort(500, description=str(e))
 
 @app.route('/api/simulation/undo', methods=['POST'])
 def undo_last_action():
     db = g.db
-    if not app_state["undo_stack"]:
+    history = app_state["history"]
+    recorded = history.peek_undo()
+    if recorded is None:
         abort(400, description="Nothing to undo.")
-    command = app_state["undo_stack"].pop()
+    # Umgekehrte Reihenfolge, Objekte werden in der aktuellen Session über ihre ID aufgelöst
+    records = [record.inverted() for record in reversed(recorded)]
     try:
-        command.undo()
-        app_state["redo_stack"].append(command)
-        add_event("SYSTEM: Undid last action.")
-        build_graph_from_db(db)
-        emit_full_state_updates(db)
-        return jsonify({"message": "Action undone."})
+        apply_records_to_db(db, records)
+        db.commit()
+    except StaleRecordError as e:
+        db.rollback()
+        abort(409, description=str(e))
     except ValueError as e:
         db.rollback()
         abort(500, description=str(e))
+    history.commit_undo()
+    publish_to_workers("history", op="undo")
+    add_event("SYSTEM: Undid last action.")
+    apply_state_changes(db, records)
+    _, changed_alarms = reevaluate_signal_alarms(db, records)
+    emit_state_delta(db, records, alarms=changed_alarms)
+    return jsonify({"message": "Action undone."})
 
 @app.route('/api/simulation/redo', methods=['POST'])
 def redo_last_action():
     db = g.db
-    if not app_state["redo_stack"]:
+    history = app_state["history"]
+    records = history.peek_redo()
+    if records is None:
         abort(400, description="Nothing to redo.")
-    command = app_state["redo_stack"].pop()
+    records = list(records)
     try:
-        command.execute()
-        app_state["undo_stack"].append(command)
-        add_event("SYSTEM: Redid last action.")
-        build_graph_from_db(db)
-        emit_full_state_updates(db)
-        return jsonify({"message": "Action redone."})
+        apply_records_to_db(db, records)
+        db.commit()
+    except StaleRecordError as e:
+        db.rollback()
+        abort(409, description=str(e))
     except ValueError as e:
         db.rollback()
         abort(500, description=str(e))
+    history.commit_redo()
+    publish_to_workers("history", op="redo")
+    add_event("SYSTEM: Redid last action.")
+    apply_state_changes(db, records)
+    _, changed_alarms = reevaluate_signal_alarms(db, records)
+    emit_state_delta(db, records, alarms=changed_alarms)
+    return jsonify({"message": "Action redone."})
 
 @app.route('/api/simulation/fiber-cut', methods=['POST'])
 def fiber_cut():
     db = g.db
     payload = request.get_json()
     cut_node_id_str = payload.get('node_id')
-    build_graph_from_db(db)
+    started = time.perf_counter()
     graph = app_state["graph"]
     if not cut_node_id_str or not graph.has_node(cut_node_id_str):
         abort(404, description=f"Node '{cut_node_id_str}' not found.")
     descendant_nodes_str = nx.descendants(graph, cut_node_id_str)
     affected_nodes_set_str = descendant_nodes_str.union({cut_node_id_str})
-    composite_command = CompositeCommand(db)
+    # Teilnehmer, die aktuell über den geschnittenen Knoten versorgt werden (aus dem Pfad-Index)
+    affected_end_devices = app_state["path_index"].end_devices_below(graph, cut_node_id_str, END_DEVICE_TYPES)
+    # Betroffene Geräte und Links samt aktuellem Status direkt aus dem Graphen (keine Einzelabfragen)
+    composite_command = CompositeCommand(db, batched=True)
+    device_changes, link_changes = {}, {}
     for node_id_str in affected_nodes_set_str:
-        device = db.query(Device).filter_by(device_id_str=node_id_str).first()
-        if device and device.status != 'offline':
+        if graph.nodes[node_id_str]['status'] != 'offline':
             composite_command.add(UpdateDeviceStatusCommand(db, node_id_str, 'offline'))
-    affected_device_objs = db.query(Device).filter(Device.device_id_str.in_(affected_nodes_set_str)).all()
-    device_ids_in_set = [d.id for d in affected_device_objs]
-    affected_links = db.query(Link).filter((Link.source_id.in_(device_ids_in_set)) | (Link.target_id.in_(device_ids_in_set))).all()
-    for link in affected_links:
-        if link.status != 'down':
-            composite_command.add(UpdateLinkStatusCommand(db, link.link_id_str, 'down'))
+            device_changes[node_id_str] = 'offline'
+    affected_edges = set(graph.in_edges(affected_nodes_set_str)) | set(graph.out_edges(affected_nodes_set_str))
+    for edge in affected_edges:
+        link = graph.edges[edge]
+        if link['status'] != 'down':
+            composite_command.add(UpdateLinkStatusCommand(db, link['link_id_str'], 'down'))
+            link_changes[link['link_id_str']] = 'down'
+    # Schnitte in einem Ring öffnen dessen RPL im selben Command
+    ring_events = add_ring_commands(db, composite_command, link_changes, device_changes)
     if composite_command.commands:
         try:
-            execute_command(composite_command)
-            add_event(f"SCENARIO: Fiber cut at '{cut_node_id_str}' affected {len(affected_nodes_set_str)} devices.")
-            return jsonify({"message": f"Fiber cut scenario at '{cut_node_id_str}' executed."})
+            execute_command(composite_command, f"fiber-cut {cut_node_id_str}")
+            for event in ring_events:
+                add_event(event)
+            duration_ms = (time.perf_counter() - started) * 1000
+            add_event(f"SCENARIO: Fiber cut at '{cut_node_id_str}' affected {len(affected_nodes_set_str)} devices ({len(affected_end_devices)} subscribers).")
+            return jsonify({"message": f"Fiber cut scenario at '{cut_node_id_str}' executed.", "affected_end_devices": affected_end_devices, "changes": len(composite_command.commands), "duration_ms": round(duration_ms, 2)})
         except ValueError as e:
             db.rollback()
             abort(500, description=str(e))
     else:
         return jsonify({"message": "No changes needed for fiber cut scenario."})
 
+# --- Analyse-Endpunkte (nur lesend) ---
+def get_failure_model(fiber_failures_per_km_year: float, mtbf_hours: dict, mttr_hours: dict) -> FailureModel:
+    """Schreibgeschützte Kopie des Graphen für die Simulation, gecacht pro Topologie-Generation und Parametersatz."""
+    with STATE_LOCK:
+        key = (app_state["topology_cache"].generation, id(app_state["graph"]), fiber_failures_per_km_year,
+               tuple(sorted(mtbf_hours.items())), tuple(sorted(mttr_hours.items())), LINK_LENGTH_SOURCE)
+        cached = app_state.get("failure_model")
+        if cached is None or cached[0] != key:
+            model = FailureModel(app_state["graph"], HEAD_END_TYPES, END_DEVICE_TYPES, fiber_failures_per_km_year, mtbf_hours, mttr_hours,
+                                 derived_lengths=get_derived_link_lengths(), prefer_derived=LINK_LENGTH_SOURCE == 'derived')
+            cached = app_state["failure_model"] = (key, model)
+        return cached[1]
+
+@app.route('/api/analysis/monte-carlo', methods=['POST'])
+def monte_carlo_failures():
+    """
+    Monte-Carlo-Ausfallsimulation über eine Kopie des Graphen; Datenbank und Live-Zustand bleiben unverändert.
+    Optionen im Payload: trials, seed, workers, years, fiber_failures_per_km_year, mtbf_hours ({Gerätetyp: Stunden}),
+    mttr_hours ({'link': h, 'device': h}), top (Länge der Kritikalitäts-Rankings).
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        trials = int(payload.get('trials', MONTE_CARLO_TRIALS))
+        seed = int(payload['seed']) if payload.get('seed') is not None else int(time.time())
+        workers = int(payload.get('workers', MONTE_CARLO_WORKERS)) or None
+        years = float(payload.get('years', 1.0))
+        top = int(payload.get('top', 20))
+        fiber_rate = float(payload.get('fiber_failures_per_km_year', DEFAULT_FIBER_FAILURES_PER_KM_YEAR))
+        mtbf_hours = {str(k): float(v) for k, v in (payload.get('mtbf_hours') or {}).items()}
+        mttr_hours = {str(k): float(v) for k, v in (payload.get('mttr_hours') or {}).items()}
+    except (TypeError, ValueError, AttributeError) as e:
+        abort(400, description=f"Invalid simulation parameters: {e}")
+    if not 1 <= trials <= MONTE_CARLO_MAX_TRIALS:
+        abort(400, description=f"'trials' must be between 1 and {MONTE_CARLO_MAX_TRIALS}.")
+    if years <= 0 or fiber_rate < 0 or top < 0 or any(v <= 0 for v in mtbf_hours.values()) or any(v < 0 for v in mttr_hours.values()):
+        abort(400, description="'years' and MTBF values must be positive, rates, MTTR and 'top' must not be negative.")
+    started = time.perf_counter()
+    model = get_failure_model(fiber_rate, mtbf_hours, mttr_hours)
+    model_ms = (time.perf_counter() - started) * 1000
+    result = simulate(model, trials=trials, seed=seed, workers=workers, years=years, top=top)
+    result["model_ms"] = round(model_ms, 2)
+    return jsonify(result)
+
+@app.route('/api/analysis/impact', methods=['POST'])
+def what_if_impact():
+    """
+    Was-wäre-wenn-Analyse ohne Schreibzugriff: betroffene Geräte, Links und Teilnehmer bei gleichzeitigem
+    Ausfall der Geräte in 'nodes' und der Links in 'links'. Mit "details": false nur die Zählwerte.
+    """
+    payload = request.get_json(silent=True) or {}
+    node_ids, link_ids = payload.get('nodes') or [], payload.get('links') or []
+    if not isinstance(node_ids, list) or not isinstance(link_ids, list) or not (node_ids or link_ids):
+        abort(400, description="'nodes' and/or 'links' must be non-empty lists of IDs.")
+    started = time.perf_counter()
+    with STATE_LOCK:
+        graph = app_state["graph"]
+        for node_id in node_ids:
+            if not graph.has_node(node_id):
+                abort(404, description=f"Node '{node_id}' not found.")
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        for link_id in link_ids:
+            if link_id not in link_endpoints:
+                abort(404, description=f"Link '{link_id}' not found.")
+        impact = app_state["impact_index"].query(node_ids, link_ids)
+        details = payload.get('details', True)
+        if details:
+            customers = [graph.nodes[device_id]['properties'].get(CUSTOMER_ID_PROPERTY) or device_id for device_id in impact["end_devices"]]
+    result = {
+        "failed": {"nodes": node_ids, "links": link_ids},
+        "counts": {
+            "devices": len(impact["devices"]),
+            "links": len(impact["links"]),
+            "end_devices": len(impact["end_devices"]),
+            "onts": impact["end_devices_by_type"].get('ONT', 0),
+            "end_devices_by_type": impact["end_devices_by_type"],
+        },
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+    if details:
+        result.update({"affected_devices": impact["devices"], "affected_links": impact["links"],
+                       "affected_end_devices": impact["end_devices"], "customers": customers})
+    return jsonify(result)
+
 # --- Snapshot Endpoints ---
 @app.route('/api/snapshot/save', methods=['POST'])
 def save_snapshot():
+    """
+    Speichert die Topologie standardmäßig im kompakten Format (.unoc). Optionen im Payload:
+    'format': 'json' für das alte JSON-Format, 'base': Name eines vorhandenen Snapshots für einen
+    Delta-Snapshot, 'compression': 'gzip' oder 'zstd'.
+    """
     db = g.db
-    snapshot_name = request.get_json()['name']
+    payload = request.get_json() or {}
+    snapshot_name = payload.get('name')
     if not snapshot_name:
         abort(400, description="Snapshot name is required.")
+    SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
+    base_name = payload.get('base')
+    base_path = find_snapshot(SNAPSHOT_DIR, base_name) if base_name else None
+    if base_name == snapshot_name:
+        abort(400, description="A delta snapshot cannot use itself as base.")
+    if base_name and not base_path:
+        abort(404, description=f"Base snapshot '{base_name}' not found.")
     try:
+        started = time.perf_counter()
         topology_data = serialize_topology(db)
         snapshot = {"version": "1.0.0", "devices": topology_data["devices"], "links": topology_data["links"], "rings": topology_data["rings"]}
-        SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
         if not os.path.exists(SNAPSHOT_DIR):
             os.makedirs(SNAPSHOT_DIR)
-        snapshot_path = os.path.join(SNAPSHOT_DIR, f"{snapshot_name}.json")
-        with open(snapshot_path, 'w', encoding='utf-8') as f:
-            json.dump(snapshot, f, indent=2)
-        add_event(f"SYSTEM: Snapshot '{snapshot_name}' saved.")
-        return jsonify({"message": "Snapshot saved."}), 201
+        if payload.get('format') == 'json':
+            snapshot_path = os.path.join(SNAPSHOT_DIR, f"{snapshot_name}{LEGACY_EXTENSION}")
+            with open(snapshot_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=2)
+            kind = "full"
+        else:
+            snapshot_path = os.path.join(SNAPSHOT_DIR, f"{snapshot_name}{COMPACT_EXTENSION}")
+            base_topology = read_snapshot(base_path, SNAPSHOT_DIR) if base_path else None
+            header = write_snapshot(snapshot_path, snapshot, compression=payload.get('compression', 'gzip'), base_name=base_name, base_topology=base_topology)
+            kind = header["kind"]
+        # Ein kompakter Snapshot verdeckt sonst eine gleichnamige alte JSON-Datei (und umgekehrt)
+        for extension in (COMPACT_EXTENSION, LEGACY_EXTENSION):
+            stale_path = os.path.join(SNAPSHOT_DIR, f"{snapshot_name}{extension}")
+            if stale_path != snapshot_path and os.path.exists(stale_path):
+                os.remove(stale_path)
+        size_bytes = os.path.getsize(snapshot_path)
+        duration_ms = (time.perf_counter() - started) * 1000
+        add_event(f"SYSTEM: Snapshot '{snapshot_name}' saved ({kind}, {size_bytes / 1024:.1f} KiB in {duration_ms:.0f} ms).")
+        return jsonify({"message": "Snapshot saved.", "file": os.path.basename(snapshot_path), "kind": kind, "size_bytes": size_bytes, "duration_ms": round(duration_ms, 2)}), 201
+    except ValueError as e:
+        db.rollback()
+        abort(400, description=f"Failed to save snapshot: {str(e)}")
     except Exception as e:
         db.rollback()
         abort(500, description=f"Failed to save snapshot: {str(e)}")
 
 @app.route('/api/snapshot/load', methods=['POST'])
 def load_snapshot():
+    payload = request.get_json() or {}
+    snapshot_name = payload.get('name')
+    if not snapshot_name:
+        abort(400, description="Snapshot name is required.")
+    SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
+    snapshot_path = find_snapshot(SNAPSHOT_DIR, snapshot_name)
+    if not snapshot_path:
+        abort(404, "Snapshot not found.")
+    if payload.get('background'):
+        # Große Snapshots im Hintergrund laden, Fortschritt kommt über 'snapshot_progress'
+        socketio.start_background_task(load_snapshot_in_background, snapshot_name, snapshot_path)
+        return jsonify({"message": "Snapshot loading started."}), 202
     db = g.db
     try:
-        snapshot_name = request.get_json()['name']
-        if not snapshot_name:
-            abort(400, description="Snapshot name is required.")
-        SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
-        snapshot_path = os.path.join(SNAPSHOT_DIR, f"{snapshot_name}.json")
-        if not os.path.exists(snapshot_path):
-            abort(404, "Snapshot not found.")
-        with open(snapshot_path, 'r', encoding='utf-8') as f:
-            snapshot_data = json.load(f)
-        from sqlalchemy import text
-        db.execute(text("DELETE FROM ring_device_association"))
-        db.query(Link).delete()
-        db.query(Ring).delete()
-        db.query(Device).delete()
-        db.commit()
-        device_map = {}
-        for device_data in snapshot_data['devices']:
-            new_device = Device(device_id_str=device_data['id'], type=device_data['type'], status=device_data['status'], properties=device_data.get('properties', {}), coordinates=device_data.get('coordinates'))
-            db.add(new_device)
-            db.flush()
-            device_map[device_data['id']] = new_device
-        db.commit()
-        for link_data in snapshot_data['links']:
-            source_device = device_map.get(link_data['source'])
-            target_device = device_map.get(link_data['target'])
-            if not source_device or not target_device:
-                raise ValueError(f"Device for link '{link_data['id']}' not found in snapshot.")
-            new_link = Link(link_id_str=link_data['id'], source_id=source_device.id, target_id=target_device.id, status=link_data['status'], properties=link_data.get('properties', {}))
-            db.add(new_link)
-        db.commit()
-        for ring_data in snapshot_data.get('rings', []):
-            node_devices = [device_map[node_id] for node_id in ring_data['nodes']]
-            new_ring = Ring(ring_id_str=ring_data['id'], name=ring_data['name'], rpl_link_id_str=ring_data['rpl_link_id'], nodes=node_devices)
-            db.add(new_ring)
-        db.commit()
-        build_graph_from_db(db)
-        clear_history()
-        initialize_rings(db)
-        add_event(f"SYSTEM: Snapshot '{snapshot_name}' loaded successfully.")
-        emit_full_state_updates(db)
-        return jsonify({"message": "Snapshot loaded."})
+        counts = load_snapshot_file(db, snapshot_name, snapshot_path)
+        return jsonify({"message": "Snapshot loaded.", **counts})
     except Exception as e:
         db.rollback()
         abort(500, description=f"Failed to load snapshot: {str(e)}")
 
+def load_snapshot_file(db: DBSessionType, snapshot_name: str, snapshot_path: str) -> dict:
+    """Lädt einen Snapshot (kompakt oder Legacy-JSON) per Bulk-Loader und baut danach den In-Memory-State neu auf."""
+    started = time.perf_counter()
+    snapshot_data, reader = open_snapshot_for_loading(snapshot_path, os.path.dirname(snapshot_path))
+
+    def report_progress(stage: str, done: int, total: int):
+        emit_latest('snapshot_progress', {"name": snapshot_name, "stage": stage, "done": done, "total": total})
+
+    try:
+        counts = bulk_load_snapshot(db, snapshot_data, progress=report_progress)
+    finally:
+        if reader:
+            reader.close()
+    build_graph_from_db(db)
+    clear_history()
+    initialize_rings(db)
+    duration_ms = (time.perf_counter() - started) * 1000
+    size_bytes = os.path.getsize(snapshot_path)
+    add_event(f"SYSTEM: Snapshot '{snapshot_name}' loaded successfully ({counts['devices']} devices, {counts['links']} links, {size_bytes / 1024:.1f} KiB in {duration_ms:.0f} ms).")
+    emit_state_delta(db, resync=True)
+    return {**counts, "size_bytes": size_bytes, "duration_ms": round(duration_ms, 2)}
+
+def load_snapshot_in_background(snapshot_name: str, snapshot_path: str):
+    db = SessionLocal()
+    try:
+        load_snapshot_file(db, snapshot_name, snapshot_path)
+    except Exception as e:
+        db.rollback()
+        add_event(f"ERROR: Failed to load snapshot '{snapshot_name}': {e}")
+    finally:
+        db.close()
+
 # --- WebSocket Event Handlers ---
 @socketio.on('connect')
 def handle_connect():
     print(f'Client verbunden: {request.sid}')
 
 @socketio.on('request_initial_data')
-def handle_initial_data_request():
+def handle_initial_data_request(data=None):
+    """Optional mit {bbox, zoom, cursor, limit}: dann nur der Kartenausschnitt (seitenweise)."""
+    try:
+        viewport = parse_viewport(data)
+    except (ValueError, TypeError) as e:
+        print(f"WARN: Ungültiger Viewport von {request.sid} ({e}), sende volle Topologie.")
+        viewport = None
     db = SessionLocal()
     try:
-        full_topology = serialize_topology(db)
-        stats = get_current_topology_stats(db)
-        history_status = get_current_history_status()
-        active_alarms = db.query(Alarm).filter_by(status='ACTIVE').all()
-        serialized_alarms = [{"id": a.id, "severity": a.severity, "status": a.status, "timestamp_raised": a.timestamp_raised, "affected_object_type": a.affected_object_type, "affected_object_id": a.affected_object_id, "description": a.description} for a in active_alarms]
-        socketio.emit('initial_topology', {'devices': full_topology['devices'], 'links': full_topology['links'], 'rings': full_topology['rings'], 'stats': stats, 'history_status': history_status, 'alarms': serialized_alarms}, room=request.sid)
+        state = build_full_state(db, viewport)
+        socketio.emit('initial_topology', state, room=request.sid)
+        app_state["emitter"].register(request.sid, state['version'])
     finally:
         db.close()
 
+@socketio.on('request_resync')
+def handle_resync_request(data):
+    """Ein Client, der Deltas verpasst hat, holt alles ab seiner bekannten Version nach."""
+    since_version = (data or {}).get('since_version')
+    missed_deltas = app_state["delta_log"].since(since_version) if isinstance(since_version, int) else None
+    if missed_deltas is None or any(delta['resync'] for delta in missed_deltas):
+        handle_initial_data_request()
+        return
+    # Alle verpassten Deltas als ein zusammengeführtes Delta
+    if not app_state["emitter"].catch_up(request.sid, since_version):
+        handle_initial_data_request()
+
+@socketio.on('delta_ack')
+def handle_delta_ack(data):
+    """Client hat alle Deltas bis zur Version angewendet (Grundlage der Backpressure)."""
+    version = (data or {}).get('version')
+    if isinstance(version, int):
+        app_state["emitter"].ack(request.sid, version)
+
 @socketio.on('disconnect')
 def handle_disconnect():
+    app_state["emitter"].unregister(request.sid)
     print(f'Client getrennt: {request.sid}')
 
 # --- Main Execution ---
@@ -694,11 +1432,15 @@ if __name__ == '__main__':
     init_db()
     print("Schema initialisiert.")
     with SessionLocal() as db:
-        build_graph_from_db(db)
+        # Jeder Worker baut beim Start selbst auf, die anderen müssen dafür nicht neu laden
+        build_graph_from_db(db, publish=False)
         initialize_rings(db)
     SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'snapshots')
     if not os.path.exists(SNAPSHOT_DIR):
         os.makedirs(SNAPSHOT_DIR)
-    add_event("SYSTEM: Backend started with PostgreSQL & WebSockets. Topology loaded, rings initialized.")
+    add_event(f"SYSTEM: Backend started ({storage.name} storage) & WebSockets. Topology loaded, rings initialized.")
+    if TRAFFIC_AUTOSTART:
+        # Nur auf einem Worker einschalten, sonst wertet jeder Worker die SLA-Alarme selbst aus
+        start_traffic_simulation(TRAFFIC_TICK_S, TRAFFIC_TIME_SCALE)
     print("Starting UNOC Backend Server...")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    socketio.run(app, host='0.0.0.0', port=int(os.getenv("PORT", "5000")), debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,179 @@
+#
+# UNOC - benchmark.py
+#
+# Skalierungs-Benchmark auf Basis synthetischer Topologien (topology_generator.py).
+# Misst Seeding, Graph-Aufbau, Serialisierung, Signalberechnung, Trace, Geo-Abfragen, Faserschnitt und
+# Snapshot Save/Load gegen eine lokale SQLite- oder PostgreSQL-Datenbank und schreibt die
+# Ergebnisse als JSON-Datei.
+#
+# Beispiel:
+#   python benchmark.py --onts 10000 100000 --database-url sqlite:///benchmark.db --output benchmark_results.json
+#   python benchmark.py --onts 10000 --storage memory --output benchmark_memory.json
+#
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from topology_generator import generate_topology
+
+
+def _timed(func: Callable, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _check(response, label: str):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{label} failed with HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def _sample_timings(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def run_scale(ont_count: int, sample_size: int, seed: int) -> dict:
+    """Ein Benchmark-Durchlauf für eine Netzgröße. Setzt voraus, dass DATABASE_URL bereits gesetzt ist."""
+    import backend
+    from database import SessionLocal, init_db
+    from snapshot_loader import bulk_load_snapshot
+
+    rng = random.Random(seed)
+    timings: Dict[str, object] = {}
+    topology, timings["generate_ms"] = _timed(generate_topology, ont_count, seed=seed)
+    onts = [d["id"] for d in topology["devices"] if d["type"] == "ONT"]
+    olts = {d["id"] for d in topology["devices"] if d["type"] == "OLT"}
+    nvts = [d["id"] for d in topology["devices"] if d["type"] == "NVt"]
+    link_ids = [l["id"] for l in topology["links"]]
+
+    init_db()
+    with SessionLocal() as db:
+        counts, timings["seed_ms"] = _timed(bulk_load_snapshot, db, topology)
+        _, timings["build_graph_ms"] = _timed(backend.build_graph_from_db, db)
+        backend.initialize_rings(db)
+        backend.clear_history()
+        _, timings["serialize_topology_ms"] = _timed(backend.serialize_topology, db)
+    del topology
+
+    client = backend.app.test_client()
+    sample = rng.sample(onts, min(sample_size, len(onts)))
+    signal_samples = [_timed(lambda device_id=device_id: _check(client.get(f"/api/devices/{device_id}/signal"), "signal"))[1] for device_id in sample]
+    timings["signal_single"] = _sample_timings(signal_samples)
+    _, timings["signal_bulk_ms"] = _timed(lambda: _check(client.get("/api/signal/bulk?status=LOS"), "signal bulk"))
+
+    path_index = backend.app_state["path_index"]
+    trace_pairs = [(path_index.serving_head_end(device_id), device_id) for device_id in sample if path_index.serving_head_end(device_id) in olts]
+    trace_samples = [
+        _timed(lambda start=start, end=end: _check(client.post("/api/simulation/trace-path", json={"start_node": start, "end_node": end}), "trace"))[1]
+        for start, end in trace_pairs
+    ]
+    timings["trace"] = _sample_timings(trace_samples) if trace_samples else None
+
+    geo_samples = [
+        _timed(lambda device_id=device_id: _check(client.get("/api/geo/nearest", query_string={"lon": lon, "lat": lat, "k": 5, "type": "OLT"}), "geo nearest"))[1]
+        for device_id in sample
+        for lon, lat in [backend.app_state["graph"].nodes[device_id]["coordinates"]]
+    ]
+    timings["geo_nearest"] = _sample_timings(geo_samples)
+
+    # Link-Flap: down und wieder up, je Request Command, Commit, Graph-Patch und State-Delta
+    flap_samples = [
+        _timed(lambda link_id=link_id, status=status: _check(client.post(f"/api/links/{link_id}/status", json={"status": status}), "link flap"))[1]
+        for link_id in rng.sample(link_ids, min(sample_size, len(link_ids)))
+        for status in ("down", "up")
+    ]
+    timings["link_flap"] = _sample_timings(flap_samples)
+
+    # Budget-Änderung: verschiebt nur die Präfixsummen des Teilbaums (erste Abfrage baut den Cache auf)
+    property_samples = [
+        _timed(lambda link_id=link_id: _check(client.post(f"/api/links/{link_id}/properties", json={"connector_count": 4}), "link properties"))[1]
+        for link_id in rng.sample(link_ids, min(sample_size, len(link_ids)))
+    ]
+    timings["link_properties"] = _sample_timings(property_samples)
+    _, timings["signal_bulk_cached_ms"] = _timed(lambda: _check(client.get("/api/signal/bulk?status=LOS"), "signal bulk"))
+
+    cut_node = rng.choice(nvts)
+    _, timings["fiber_cut_ms"] = _timed(lambda: _check(client.post("/api/simulation/fiber-cut", json={"node_id": cut_node}), "fiber cut"))
+    _, timings["fiber_cut_undo_ms"] = _timed(lambda: _check(client.post("/api/simulation/undo"), "undo"))
+    _, timings["monte_carlo_ms"] = _timed(lambda: _check(client.post("/api/analysis/monte-carlo", json={"trials": 200, "seed": 1}), "monte carlo"))
+    # Verkehrssimulation: der erste Tick baut die Baum-Zuordnung auf, danach nur Vektoroperationen
+    def traffic_tick():
+        return _check(client.post("/api/traffic/tick", json={"sim_seconds": 60}), "traffic tick")
+    _, timings["traffic_first_tick_ms"] = _timed(traffic_tick)
+    timings["traffic_tick"] = _sample_timings([_timed(traffic_tick)[1] for _ in range(sample_size)])
+
+    snapshot_name = f"benchmark-{ont_count}"
+    snapshot_dir = os.path.join(os.path.dirname(os.path.abspath(backend.__file__)), 'snapshots')
+    try:
+        saved, timings["snapshot_save_ms"] = _timed(lambda: _check(client.post("/api/snapshot/save", json={"name": snapshot_name}), "snapshot save"))
+        loaded, timings["snapshot_load_ms"] = _timed(lambda: _check(client.post("/api/snapshot/load", json={"name": snapshot_name}), "snapshot load"))
+        snapshot_bytes = saved.get_json().get("size_bytes")
+    finally:
+        for extension in (".unoc", ".json"):
+            path = os.path.join(snapshot_dir, f"{snapshot_name}{extension}")
+            if os.path.exists(path):
+                os.remove(path)
+
+    for key, value in timings.items():
+        if isinstance(value, float):
+            timings[key] = round(value, 3)
+    return {"onts": ont_count, **counts, "snapshot_bytes": snapshot_bytes, "timings": timings}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="UNOC Skalierungs-Benchmark mit synthetischen Topologien.")
+    parser.add_argument("--onts", type=int, nargs="+", default=[1000, 10000], help="Netzgrößen (Anzahl ONTs)")
+    parser.add_argument("--database-url", default=None, help="Standard: temporäre SQLite-Datei")
+    parser.add_argument("--storage", choices=["sql", "memory"], default="sql", help="memory: In-Memory-Store ohne Datenbankdatei (--database-url wird ignoriert)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--samples", type=int, default=50, help="Stichprobe für Einzelabfragen (Signal, Trace)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    # Muss vor dem ersten Import von database/backend gesetzt sein
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='unoc-bench-'), 'benchmark.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["STORAGE_BACKEND"] = args.storage
+    os.environ["STORAGE_SNAPSHOT"] = ""
+    os.environ["GRAPH_CONSISTENCY_CHECK"] = "0"
+    work_dir = tempfile.mkdtemp(prefix='unoc-bench-')
+    os.environ["HISTORY_JOURNAL"] = os.path.join(work_dir, 'undo_journal.jsonl')
+    os.environ["CHANGE_LOG_DIR"] = os.path.join(work_dir, 'changelog')
+
+    results = []
+    for ont_count in args.onts:
+        print(f"Benchmark mit {ont_count} ONTs...")
+        result = run_scale(ont_count, args.samples, args.seed)
+        results.append(result)
+        print(json.dumps(result["timings"], indent=2))
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "database": database_url.split(":", 1)[0] if args.storage == "sql" else "memory",
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Ergebnisse nach '{args.output}' geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
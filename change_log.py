@@ -0,0 +1,279 @@
+#
+# UNOC - change_log.py
+#
+# Event-sourced Änderungsprotokoll: Status-, Property-, Alarm- und Konfigurationsänderungen werden
+# mit fortlaufender Sequenznummer an ein append-only Log (JSONL) angehängt. In regelmäßigen
+# Abständen (und nach jedem vollständigen Neuaufbau des Graphen) wird ein Checkpoint des ganzen
+# Zustands geschrieben. Ein Replay startet am letzten Checkpoint vor dem Ziel und wendet nur die
+# Events danach an - für "wie sah das Netz um 14:02 aus" und zum Wiederherstellen nach einem Absturz.
+#
+# Beispiel (Zustand als Snapshot für /api/snapshot/load exportieren):
+#   python change_log.py --at 2026-10-18T14:02:00+00:00 --output snapshots/1402.json
+#
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+DEFAULT_CHECKPOINT_INTERVAL = 1000
+EVENTS_FILE = "events.jsonl"
+CHECKPOINT_INDEX_FILE = "checkpoints.jsonl"
+
+
+def utc_timestamp(moment: Optional[datetime.datetime] = None) -> str:
+    """ISO-Zeitstempel in UTC mit fester Breite, damit Zeitstempel als Strings vergleichbar sind."""
+    moment = moment or datetime.datetime.now(datetime.timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_line(payload: dict) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n").encode("utf-8")
+
+
+def record_events(records: Iterable) -> List[dict]:
+    """ChangeRecords -> Log-Events ('status' bzw. 'property' für alle anderen Felder)."""
+    return [
+        {"type": "status" if r.field == 'status' else "property", "kind": r.kind, "id": r.object_id, "field": r.field, "old": r.old, "new": r.new}
+        for r in records
+    ]
+
+
+def alarm_events(alarms: Iterable[dict]) -> List[dict]:
+    return [{"type": "alarm", "alarm": alarm} for alarm in alarms]
+
+
+def apply_event(state: dict, event: dict):
+    """Wendet ein Event auf einen Zustand aus replay() an."""
+    event_type = event["type"]
+    if event_type in ("status", "property"):
+        objects = state["devices"] if event["kind"] == 'device' else state["links"]
+        target = objects.get(event["id"])
+        if target is not None:
+            target[event["field"]] = event["new"]
+    elif event_type == "alarm":
+        alarm = event["alarm"]
+        if alarm.get("status") == 'CLEARED':
+            state["alarms"].pop(alarm["id"], None)
+        else:
+            state["alarms"][alarm["id"]] = alarm
+    elif event_type == "config":
+        state["config"][event["name"]] = event["new"]
+
+
+class ChangeLog:
+    """
+    Append-only Log in directory/events.jsonl mit Checkpoints in directory/checkpoints/.
+    Ohne directory ist das Log deaktiviert (append/checkpoint sind dann No-Ops).
+    """
+
+    def __init__(self, directory: Optional[str], checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        self.directory = directory or None
+        self.checkpoint_interval = checkpoint_interval
+        self.seq = 0
+        self.last_ts: Optional[str] = None
+        self.checkpoints: List[dict] = []  # {"seq", "ts", "file", "log_offset"} aufsteigend
+        self._lock = threading.RLock()
+        if self.directory:
+            os.makedirs(os.path.join(self.directory, "checkpoints"), exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    @property
+    def events_path(self) -> str:
+        return os.path.join(self.directory, EVENTS_FILE)
+
+    def _load(self):
+        """Liest den Checkpoint-Index und ermittelt die letzte Sequenznummer ab dem letzten Checkpoint."""
+        index_path = os.path.join(self.directory, CHECKPOINT_INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if os.path.exists(os.path.join(self.directory, "checkpoints", entry["file"])):
+                        self.checkpoints.append(entry)
+        if self.checkpoints:
+            self.seq, self.last_ts = self.checkpoints[-1]["seq"], self.checkpoints[-1]["ts"]
+        if not os.path.exists(self.events_path):
+            return
+        offset = self.checkpoints[-1]["log_offset"] if self.checkpoints else 0
+        complete = True
+        with open(self.events_path, 'r+b') as f:
+            f.seek(offset)
+            for raw in f:
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    break
+                self.seq, self.last_ts = event["seq"], event["ts"]
+                offset += len(raw)
+                complete = raw.endswith(b"\n")
+            # Abgebrochene letzte Zeile nach einem Absturz entfernen, sonst hinge das nächste append daran
+            f.truncate(offset)
+            if not complete:
+                f.seek(offset)
+                f.write(b"\n")
+
+    def _read_events(self, offset: int = 0) -> Iterator[dict]:
+        if not os.path.exists(self.events_path):
+            return
+        with open(self.events_path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                try:
+                    yield json.loads(raw)
+                except ValueError:
+                    return  # abgebrochene letzte Zeile nach einem Absturz
+
+    # --- Schreiben ---
+    def append(self, events: List[dict]) -> int:
+        """Vergibt Sequenznummern und Zeitstempel und hängt die Events in einem Schreibvorgang an."""
+        if not self.enabled or not events:
+            return self.seq
+        with self._lock:
+            ts = utc_timestamp()
+            data = bytearray()
+            for event in events:
+                self.seq += 1
+                data += _encode_line({"seq": self.seq, "ts": ts, **event})
+            with open(self.events_path, 'ab') as f:
+                f.write(data)
+            self.last_ts = ts
+            return self.seq
+
+    def needs_checkpoint(self) -> bool:
+        last = self.checkpoints[-1]["seq"] if self.checkpoints else 0
+        return self.enabled and self.seq - last >= self.checkpoint_interval
+
+    def checkpoint(self, state: dict, reason: str = "interval"):
+        """
+        Schreibt den vollständigen Zustand (devices, links, rings als Listen, alarms, config) für die
+        aktuelle Sequenznummer. Ein 'reset'-Checkpoint markiert einen Neuaufbau (z.B. Snapshot-Load).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if reason == "reset":
+                self.append([{"type": "reset"}])
+            ts = utc_timestamp()
+            file_name = f"checkpoint-{self.seq:012d}-{len(self.checkpoints)}.json.gz"
+            log_offset = os.path.getsize(self.events_path) if os.path.exists(self.events_path) else 0
+            with gzip.open(os.path.join(self.directory, "checkpoints", file_name), 'wb', compresslevel=1) as f:
+                f.write(_encode_line({"seq": self.seq, "ts": ts, "reason": reason, **state}))
+            entry = {"seq": self.seq, "ts": ts, "file": file_name, "log_offset": log_offset}
+            with open(os.path.join(self.directory, CHECKPOINT_INDEX_FILE), 'ab') as f:
+                f.write(_encode_line(entry))
+            self.checkpoints.append(entry)
+
+    # --- Lesen ---
+    def events(self, since: int = 0, limit: int = 1000) -> List[dict]:
+        """Events mit seq > since; startet am letzten Checkpoint davor statt am Dateianfang."""
+        if not self.enabled:
+            return []
+        offset = 0
+        for entry in self.checkpoints:
+            if entry["seq"] <= since:
+                offset = entry["log_offset"]
+        result = []
+        for event in self._read_events(offset):
+            if event["seq"] > since:
+                result.append(event)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def replay(self, seq: Optional[int] = None, at: Optional[datetime.datetime] = None) -> Optional[dict]:
+        """
+        Zustand nach Event seq bzw. zum Zeitpunkt at (letztes Event mit ts <= at).
+        None, wenn das Ziel vor dem ersten Checkpoint liegt.
+        """
+        if not self.enabled:
+            return None
+        target_ts = utc_timestamp(at) if at is not None else None
+        with self._lock:
+            candidates = [
+                entry for entry in self.checkpoints
+                if (seq is None or entry["seq"] <= seq) and (target_ts is None or entry["ts"] <= target_ts)
+            ]
+            if not candidates:
+                return None
+            start = candidates[-1]
+            with gzip.open(os.path.join(self.directory, "checkpoints", start["file"]), 'rb') as f:
+                checkpoint = json.loads(f.read())
+        state = {
+            "seq": checkpoint["seq"],
+            "ts": checkpoint["ts"],
+            "devices": {device["id"]: device for device in checkpoint["devices"]},
+            "links": {link["id"]: link for link in checkpoint["links"]},
+            "rings": checkpoint["rings"],
+            "alarms": {alarm["id"]: alarm for alarm in checkpoint["alarms"]},
+            "config": checkpoint["config"],
+        }
+        replayed = 0
+        for event in self._read_events(start["log_offset"]):
+            if (seq is not None and event["seq"] > seq) or (target_ts is not None and event["ts"] > target_ts) or event["type"] == "reset":
+                break
+            apply_event(state, event)
+            state["seq"], state["ts"] = event["seq"], event["ts"]
+            replayed += 1
+        return {
+            "seq": state["seq"],
+            "ts": state["ts"],
+            "checkpoint_seq": start["seq"],
+            "replayed_events": replayed,
+            "devices": list(state["devices"].values()),
+            "links": list(state["links"].values()),
+            "rings": state["rings"],
+            "alarms": list(state["alarms"].values()),
+            "config": state["config"],
+        }
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "seq": self.seq,
+            "last_ts": self.last_ts,
+            "checkpoints": len(self.checkpoints),
+            "last_checkpoint_seq": self.checkpoints[-1]["seq"] if self.checkpoints else None,
+            "checkpoint_interval": self.checkpoint_interval,
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rekonstruiert den Netzzustand aus dem UNOC-Änderungsprotokoll.")
+    parser.add_argument("--directory", default=os.getenv("CHANGE_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'changelog')))
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--seq", type=int, help="Zustand nach dieser Sequenznummer")
+    target.add_argument("--at", type=datetime.datetime.fromisoformat, help="Zustand zu diesem Zeitpunkt (ISO 8601, ohne Zeitzone = UTC)")
+    parser.add_argument("--output", required=True, help="Snapshot-Datei (JSON), ladbar über /api/snapshot/load")
+    args = parser.parse_args(argv)
+
+    state = ChangeLog(args.directory).replay(seq=args.seq, at=args.at)
+    if state is None:
+        raise SystemExit("Kein Checkpoint vor dem gewünschten Zeitpunkt vorhanden.")
+    snapshot = {"version": "1.0.0", "devices": state["devices"], "links": state["links"], "rings": state["rings"]}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2, default=_json_default)
+    print(f"Zustand nach Event {state['seq']} ({state['ts']}) aus Checkpoint {state['checkpoint_seq']} "
+          f"plus {state['replayed_events']} Events nach '{args.output}' geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,108 @@
 #
 
 from abc import ABC, abstractmethod
-from typing import List, TYPE_CHECKING
+from typing import Any, Dict, List, NamedTuple, TYPE_CHECKING
 
 # Import für Type Hinting, um Zirkelimporte zu vermeiden
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
     from database import Device, Link # Typ-Imports für ORM-Objekte
 
+class ChangeRecord(NamedTuple):
+    """A single state change emitted by a command, used to patch in-memory state."""
+    kind: str       # 'device' oder 'link'
+    object_id: str  # device_id_str bzw. link_id_str
+    field: str      # geändertes Attribut, z.B. 'status'
+    old: Any
+    new: Any
+
+    def inverted(self) -> 'ChangeRecord':
+        """Returns the record that reverses this change."""
+        return self._replace(old=self.new, new=self.old)
+
+
+# Maximale Anzahl IDs pro "IN (...)"-Liste, um Parameterlimits der Datenbanken einzuhalten
+BULK_CHUNK_SIZE = 500
+
+
+def _status_model(kind: str):
+    """Liefert ORM-Modell und String-ID-Spalte für 'link' bzw. 'device'."""
+    from database import Device, Link # Importiere hier, um Zirkelimport zu vermeiden
+    if kind == 'link':
+        return Link, Link.link_id_str
+    return Device, Device.device_id_str
+
+
+def load_statuses(db_session: 'Session', kind: str, id_strs) -> Dict[str, str]:
+    """Liest den aktuellen Status vieler Objekte mit wenigen SELECTs (chunked)."""
+    from sqlalchemy import select
+    model, id_column = _status_model(kind)
+    id_strs = list(id_strs)
+    statuses = {}
+    for i in range(0, len(id_strs), BULK_CHUNK_SIZE):
+        chunk = id_strs[i:i + BULK_CHUNK_SIZE]
+        statuses.update(db_session.execute(select(id_column, model.status).where(id_column.in_(chunk))).all())
+    return statuses
+
+
+def apply_status_updates(db_session: 'Session', kind: str, new_status_by_id: Dict[str, str]):
+    """
+    Setzt Status set-basiert per UPDATE ... WHERE id IN (...), ein Statement pro Zielstatus und Chunk.
+    Committet nicht; das übernimmt der Aufrufer, damit alles in einer Transaktion bleibt.
+    """
+    from sqlalchemy import update
+    model, id_column = _status_model(kind)
+    ids_by_status: Dict[str, List[str]] = {}
+    for id_str, status in new_status_by_id.items():
+        ids_by_status.setdefault(status, []).append(id_str)
+    for status, id_strs in ids_by_status.items():
+        for i in range(0, len(id_strs), BULK_CHUNK_SIZE):
+            chunk = id_strs[i:i + BULK_CHUNK_SIZE]
+            db_session.execute(update(model).where(id_column.in_(chunk)).values(status=status), execution_options={"synchronize_session": False})
+    # Bereits geladene ORM-Objekte der Session sollen den neuen Status nicht überdecken
+    db_session.expire_all()
+
+
+class StaleRecordError(ValueError):
+    """Der aktuelle Datenbankwert passt nicht mehr zum Ausgangswert eines Change-Records."""
+
+
+def apply_records_to_db(db_session: 'Session', records: List[ChangeRecord]):
+    """
+    Schreibt Change-Records (z.B. aus der Undo-Historie) in die Datenbank. Die Objekte werden über
+    ihre String-ID in der aktuellen Session aufgelöst; vorher wird geprüft, dass jedes Objekt noch den
+    Ausgangswert (old) seines ersten Records hat. Committet nicht.
+    """
+    from sqlalchemy import select, update
+    expected: Dict[tuple, Any] = {}
+    target: Dict[tuple, Any] = {}
+    for record in records:
+        key = (record.kind, record.field, record.object_id)
+        expected.setdefault(key, record.old)
+        target[key] = record.new
+    ids_by_field: Dict[tuple, List[str]] = {}
+    for kind, field, object_id in expected:
+        ids_by_field.setdefault((kind, field), []).append(object_id)
+    for (kind, field), id_strs in ids_by_field.items():
+        model, id_column = _status_model(kind)
+        column = getattr(model, field)
+        current = {}
+        for i in range(0, len(id_strs), BULK_CHUNK_SIZE):
+            current.update(db_session.execute(select(id_column, column).where(id_column.in_(id_strs[i:i + BULK_CHUNK_SIZE]))).all())
+        for id_str in id_strs:
+            if id_str not in current:
+                raise StaleRecordError(f"{kind.capitalize()} with ID '{id_str}' not found in database.")
+            if current[id_str] != expected[(kind, field, id_str)]:
+                raise StaleRecordError(f"{kind.capitalize()} '{id_str}' has {field}={current[id_str]!r}, expected {expected[(kind, field, id_str)]!r}; it was changed outside the history.")
+        new_values = {id_str: target[(kind, field, id_str)] for id_str in id_strs}
+        if field == 'status':
+            apply_status_updates(db_session, kind, new_values)
+        else:
+            for id_str, value in new_values.items():
+                db_session.execute(update(model).where(id_column == id_str).values({field: value}), execution_options={"synchronize_session": False})
+            db_session.expire_all()
+
+
 class Command(ABC):
     """Abstract base class for a command."""
     def __init__(self, db_session: 'Session'):
@@ -27,9 +122,15 @@ class Command(ABC):
         """Reverses the command."""
         pass
 
+    def get_change_records(self, undo: bool = False) -> List[ChangeRecord]:
+        """Returns the changes of the last execute (or, with undo=True, of the last undo)."""
+        return []
+
 
 class UpdateLinkStatusCommand(Command):
     """A command to update the status of a link in the database."""
+    kind = 'link'
+
     def __init__(self, db_session: 'Session', link_id_str: str, new_status: str):
         super().__init__(db_session)
         self.link_id_str = link_id_str
@@ -37,6 +138,10 @@ class UpdateLinkStatusCommand(Command):
         self.old_status = None
         self.link_db_obj = None # Store the actual DB object for undo/redo
 
+    @property
+    def object_id_str(self) -> str:
+        return self.link_id_str
+
     def _find_link(self) -> 'Link':
         """Helper to find the link object in the database."""
         # Query the database to find the link by its string ID
@@ -66,9 +171,17 @@ class UpdateLinkStatusCommand(Command):
         self.db_session.commit() # Speichern der Rückgängigmachung
         self.db_session.refresh(self.link_db_obj)
 
+    def get_change_records(self, undo: bool = False) -> List[ChangeRecord]:
+        if self.old_status is None:
+            return []
+        record = ChangeRecord('link', self.link_id_str, 'status', self.old_status, self.new_status)
+        return [record.inverted() if undo else record]
+
 
 class UpdateDeviceStatusCommand(Command):
     """Command to update the status of a device in the database."""
+    kind = 'device'
+
     def __init__(self, db_session: 'Session', device_id_str: str, new_status: str):
         super().__init__(db_session)
         self.device_id_str = device_id_str
@@ -76,6 +189,10 @@ class UpdateDeviceStatusCommand(Command):
         self.old_status = None
         self.device_db_obj = None # Store the actual DB object for undo/redo
 
+    @property
+    def object_id_str(self) -> str:
+        return self.device_id_str
+
     def _find_device(self) -> 'Device':
         """Helper to find the device object in the database."""
         from database import Device # Importiere hier, um Zirkelimport zu vermeiden
@@ -102,17 +219,105 @@ class UpdateDeviceStatusCommand(Command):
         self.db_session.commit()
         self.db_session.refresh(self.device_db_obj)
 
+    def get_change_records(self, undo: bool = False) -> List[ChangeRecord]:
+        if self.old_status is None:
+            return []
+        record = ChangeRecord('device', self.device_id_str, 'status', self.old_status, self.new_status)
+        return [record.inverted() if undo else record]
+
+
+class UpdateLinkPropertiesCommand(Command):
+    """Command to merge new values (e.g. length_km, connector_count) into a link's properties."""
+    kind = 'link'
+
+    def __init__(self, db_session: 'Session', link_id_str: str, updates: Dict[str, Any]):
+        super().__init__(db_session)
+        self.link_id_str = link_id_str
+        self.updates = dict(updates)
+        self.old_properties = None
+        self.new_properties = None
+
+    def _find_link(self) -> 'Link':
+        from database import Link # Importiere hier, um Zirkelimport zu vermeiden
+        link = self.db_session.query(Link).filter_by(link_id_str=self.link_id_str).first()
+        if not link:
+            raise ValueError(f"Link with ID '{self.link_id_str}' not found in database.")
+        return link
+
+    def execute(self):
+        link = self._find_link()
+        # Neues Dict zuweisen, damit SQLAlchemy die Änderung an der JSON-Spalte erkennt
+        self.old_properties = dict(link.properties or {})
+        self.new_properties = {**self.old_properties, **self.updates}
+        link.properties = self.new_properties
+        self.db_session.commit()
+
+    def undo(self):
+        if self.old_properties is None:
+            raise ValueError("Undo called before execute or on a failed command.")
+        link = self._find_link()
+        link.properties = dict(self.old_properties)
+        self.db_session.commit()
+
+    def get_change_records(self, undo: bool = False) -> List[ChangeRecord]:
+        if self.old_properties is None:
+            return []
+        record = ChangeRecord('link', self.link_id_str, 'properties', self.old_properties, self.new_properties)
+        return [record.inverted() if undo else record]
+
 
 class CompositeCommand(Command):
-    """A command that bundles multiple commands into a single transaction."""
-    def __init__(self, db_session: 'Session'):
+    """
+    A command that bundles multiple commands.
+    With batched=True, status sub-commands are applied as set-based UPDATEs in one transaction.
+    """
+    def __init__(self, db_session: 'Session', batched: bool = False):
         super().__init__(db_session)
         self.commands: List[Command] = []
+        self.batched = batched
 
     def add(self, command: Command):
         self.commands.append(command)
 
+    def _can_batch(self) -> bool:
+        return self.batched and all(isinstance(c, (UpdateLinkStatusCommand, UpdateDeviceStatusCommand)) for c in self.commands)
+
+    def _execute_batched(self):
+        """Liest alle Ausgangsstatus mit wenigen SELECTs, schreibt alle Änderungen mit einem Commit."""
+        ids_by_kind: Dict[str, set] = {'link': set(), 'device': set()}
+        for command in self.commands:
+            ids_by_kind[command.kind].add(command.object_id_str)
+        original = {kind: load_statuses(self.db_session, kind, ids) for kind, ids in ids_by_kind.items() if ids}
+        current = {kind: dict(statuses) for kind, statuses in original.items()}
+        for command in self.commands:
+            if command.object_id_str not in current[command.kind]:
+                raise ValueError(f"{command.kind.capitalize()} with ID '{command.object_id_str}' not found in database.")
+            # Mehrfach betroffene Objekte: der nächste Sub-Command sieht den Status des vorherigen
+            command.old_status = current[command.kind][command.object_id_str]
+            current[command.kind][command.object_id_str] = command.new_status
+        for kind, new_status_by_id in current.items():
+            changed = {id_str: status for id_str, status in new_status_by_id.items() if original[kind][id_str] != status}
+            apply_status_updates(self.db_session, kind, changed)
+        self.db_session.commit()
+
+    def _undo_batched(self):
+        target = {'link': {}, 'device': {}}
+        for command in reversed(self.commands):
+            if command.old_status is None:
+                raise ValueError("Undo called before execute or on a failed command.")
+            target[command.kind][command.object_id_str] = command.old_status
+        for kind, old_status_by_id in target.items():
+            apply_status_updates(self.db_session, kind, old_status_by_id)
+        self.db_session.commit()
+
     def execute(self):
+        if self._can_batch():
+            try:
+                self._execute_batched()
+            except Exception as e:
+                self.db_session.rollback()
+                raise e
+            return
         # Alle Befehle in einer Transaktion ausführen
         try:
             for command in self.commands:
@@ -126,6 +331,13 @@ class CompositeCommand(Command):
             raise e
 
     def undo(self):
+        if self._can_batch():
+            try:
+                self._undo_batched()
+            except Exception as e:
+                self.db_session.rollback()
+                raise e
+            return
         # Befehle in umgekehrter Reihenfolge rückgängig machen
         try:
             for command in reversed(self.commands):
@@ -133,4 +345,12 @@ class CompositeCommand(Command):
             # Commit für die Undo-Operationen
         except Exception as e:
             self.db_session.rollback() # Rollback bei Fehler
-            raise e
\ No newline at end of file
+            raise e
+
+    def get_change_records(self, undo: bool = False) -> List[ChangeRecord]:
+        # Undo läuft in umgekehrter Reihenfolge, daher auch die Records umdrehen
+        commands = reversed(self.commands) if undo else self.commands
+        records = []
+        for command in commands:
+            records.extend(command.get_change_records(undo=undo))
+        return records
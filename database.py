@@ -5,20 +5,28 @@
 #
 
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, JSON, ForeignKey, Table
-from sqlalchemy.orm import sessionmaker, relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, Table
+from sqlalchemy.orm import relationship, declarative_base
 from dotenv import load_dotenv
 
+from storage import create_storage, DEFAULT_PERSIST_INTERVAL_S
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 # Das Debug-Print kann für die Produktion entfernt werden
 # print(f"DEBUG: Geladene DATABASE_URL: '{DATABASE_URL}'")
-if not DATABASE_URL:
-    raise ValueError("Keine DATABASE_URL in der .env-Datei gefunden!")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Storage-Backend (siehe storage.py): sql = DATABASE_URL, memory = In-Memory-Store ohne externen Dienst.
+# Ohne DATABASE_URL wird der In-Memory-Store verwendet.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND") or ("sql" if DATABASE_URL else "memory")
+# Sicherung des In-Memory-Stores (leer = keine Persistenz) und Intervall in Sekunden (0 = nur beim Beenden)
+STORAGE_SNAPSHOT = os.getenv("STORAGE_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'storage', 'memory_store.unoc'))
+STORAGE_PERSIST_INTERVAL_S = float(os.getenv("STORAGE_PERSIST_INTERVAL_S", str(DEFAULT_PERSIST_INTERVAL_S)))
+
+storage = create_storage(STORAGE_BACKEND, DATABASE_URL, STORAGE_SNAPSHOT, STORAGE_PERSIST_INTERVAL_S)
+engine = storage.engine
+SessionLocal = storage.session_factory
 Base = declarative_base()
 
 # Assoziationstabelle für die Many-to-Many-Beziehung zwischen Ring und Device
@@ -78,5 +86,6 @@ class Alarm(Base):
     description = Column(String)
 
 def init_db():
-    """Erstellt alle Tabellen in der Datenbank."""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Erstellt alle Tabellen in der Datenbank (der In-Memory-Store lädt danach seine letzte Sicherung)."""
+    Base.metadata.create_all(bind=engine)
+    storage.restore()
\ No newline at end of file
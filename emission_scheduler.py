@@ -0,0 +1,210 @@
+#
+# UNOC - emission_scheduler.py
+#
+# Bündelt Socket.IO-Emissionen in einem Zeitfenster (Standard 50 ms):
+#   - state_delta: alle Deltas im Fenster werden zu einem zusammengeführt (pro Gerät, Link, Ring
+#     und Alarm nur der letzte Stand; base_version des ersten, version des letzten Deltas)
+#   - new_event: Textmeldungen gehen gesammelt als ein 'new_events'-Frame raus
+#   - Statusmeldungen (stats_update, history_status_update, ...): nur die jeweils letzte
+# Clients, die Deltas mit 'delta_ack' bestätigen, bekommen Backpressure: liegen zu viele Frames
+# unbestätigt bei ihnen, werden weitere Frames verworfen und nach dem nächsten Ack durch ein
+# einziges zusammengeführtes Nachhol-Delta ersetzt. Clients ohne Acks werden nie gedrosselt.
+#
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_WINDOW_MS = 50
+DEFAULT_MAX_IN_FLIGHT = 4
+# Die Oberfläche zeigt ohnehin nur die letzten 100 Meldungen
+MAX_EVENTS_PER_FRAME = 100
+
+
+def merge_deltas(deltas: List[dict]) -> dict:
+    """Führt aufeinanderfolgende State-Deltas zu einem zusammen (pro Objekt-ID gewinnt der letzte Stand)."""
+    merged: Dict[str, Dict[object, dict]] = {'devices': {}, 'links': {}, 'rings': {}, 'alarms': {}}
+    for delta in deltas:
+        for key, objects in merged.items():
+            for item in delta.get(key, ()):
+                objects.pop(item.get('id'), None)  # neu einsortieren, damit die Reihenfolge der letzten Änderung folgt
+                objects[item.get('id')] = item
+    last = deltas[-1]
+    return {
+        **{key: list(objects.values()) for key, objects in merged.items()},
+        'stats': last.get('stats'),
+        'history_status': last.get('history_status'),
+        'resync': any(delta.get('resync') for delta in deltas),
+        'base_version': deltas[0]['base_version'],
+        'version': last['version'],
+    }
+
+
+class _ClientState:
+    __slots__ = ('sent_version', 'in_flight', 'acks', 'stale')
+
+    def __init__(self, version: int):
+        self.sent_version = version
+        self.in_flight: List[int] = []  # Versionen gesendeter, noch unbestätigter Frames
+        self.acks = False               # Client bestätigt Deltas (sonst keine Drosselung)
+        self.stale = False              # Frames wurden verworfen, Nachholen steht aus
+
+
+class EmissionScheduler:
+    """
+    send(event, payload, to=None, skip_sid=None) sendet einen Frame (z.B. socketio.emit);
+    missed_since(version) liefert die Deltas nach einer Version oder None (DeltaLog.since).
+    window_ms=0 sendet sofort (ohne Hintergrund-Task), z.B. für Tests.
+    """
+
+    def __init__(self, send: Callable, missed_since: Callable[[int], Optional[List[dict]]], window_ms: int = DEFAULT_WINDOW_MS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, start_task: Optional[Callable] = None, sleep: Callable[[float], None] = time.sleep):
+        self.send = send
+        self.missed_since = missed_since
+        self.window = window_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.start_task = start_task or (lambda fn: threading.Thread(target=fn, daemon=True).start())
+        self.sleep = sleep
+        self.pending_deltas: List[dict] = []
+        self.pending_events: List[str] = []
+        self.pending_latest: Dict[str, object] = {}
+        self.clients: Dict[str, _ClientState] = {}
+        self.counters = {"emitted": 0, "coalesced": 0, "dropped": 0}
+        self._flush_scheduled = False
+        self._lock = threading.RLock()
+
+    # --- Eingänge ---
+    def delta(self, delta: dict):
+        with self._lock:
+            self.pending_deltas.append(delta)
+        self._schedule()
+
+    def event(self, message: str):
+        with self._lock:
+            self.pending_events.append(message)
+        self._schedule()
+
+    def latest(self, event: str, payload):
+        """Statusmeldung, von der nur der letzte Stand im Fenster gesendet wird."""
+        with self._lock:
+            if event in self.pending_latest:
+                self.counters["coalesced"] += 1
+            self.pending_latest[event] = payload
+        self._schedule()
+
+    # --- Clients ---
+    def register(self, sid: str, version: int):
+        """Client hat den vollständigen Zustand mit dieser Version erhalten."""
+        with self._lock:
+            state = self.clients.get(sid)
+            if state is None:
+                self.clients[sid] = _ClientState(version)
+            else:
+                state.sent_version, state.in_flight, state.stale = version, [], False
+
+    def unregister(self, sid: str):
+        with self._lock:
+            self.clients.pop(sid, None)
+
+    def ack(self, sid: str, version: int):
+        """Client hat alle Deltas bis version angewendet; ausstehendes Nachholen wird jetzt gesendet."""
+        with self._lock:
+            state = self.clients.get(sid)
+            if state is None:
+                return
+            state.acks = True
+            state.in_flight = [v for v in state.in_flight if v > version]
+            if state.stale and len(state.in_flight) < self.max_in_flight:
+                self._catch_up(sid, state)
+
+    def catch_up(self, sid: str, since_version: int) -> bool:
+        """Sendet alle Deltas nach since_version als ein Delta; False, wenn sie nicht mehr vorliegen."""
+        with self._lock:
+            state = self.clients.setdefault(sid, _ClientState(since_version))
+            state.sent_version = since_version
+            return self._catch_up(sid, state)
+
+    def _catch_up(self, sid: str, state: _ClientState) -> bool:
+        missed = self.missed_since(state.sent_version)
+        state.stale = False
+        if missed is None:
+            return False
+        if missed:
+            merged = merge_deltas(missed)
+            self._send_frame('state_delta', merged, to=sid)
+            self.counters["coalesced"] += len(missed) - 1
+            state.sent_version = merged['version']
+            if state.acks:
+                state.in_flight.append(merged['version'])
+        return True
+
+    # --- Senden ---
+    def _schedule(self):
+        if self.window <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.start_task(self._flush_after_window)
+
+    def _flush_after_window(self):
+        self.sleep(self.window)
+        self.flush()
+
+    def _send_frame(self, event: str, payload, to: Optional[str] = None, skip_sid: Optional[List[str]] = None):
+        self.send(event, payload, to=to, skip_sid=skip_sid)
+        self.counters["emitted"] += 1
+
+    def flush(self):
+        with self._lock:
+            self._flush_scheduled = False
+            deltas, self.pending_deltas = self.pending_deltas, []
+            events, self.pending_events = self.pending_events, []
+            latest, self.pending_latest = self.pending_latest, {}
+            if deltas:
+                self._flush_deltas(deltas)
+            for event, payload in latest.items():
+                self._send_frame(event, payload)
+            if events:
+                if len(events) > MAX_EVENTS_PER_FRAME:
+                    self.counters["dropped"] += len(events) - MAX_EVENTS_PER_FRAME
+                    events = events[-MAX_EVENTS_PER_FRAME:]
+                self._send_frame('new_events', events)
+                self.counters["coalesced"] += len(events) - 1
+
+    def _flush_deltas(self, deltas: List[dict]):
+        merged = merge_deltas(deltas) if len(deltas) > 1 else deltas[0]
+        self.counters["coalesced"] += len(deltas) - 1
+        skip, catch_up = [], []
+        for sid, state in self.clients.items():
+            if state.acks and len(state.in_flight) >= self.max_in_flight:
+                # Backpressure: Client hängt hinterher, Frame verwerfen und später nachholen
+                skip.append(sid)
+                state.stale = True
+                self.counters["dropped"] += 1
+            elif state.stale or state.sent_version != merged['base_version']:
+                skip.append(sid)
+                catch_up.append((sid, state))
+        self._send_frame('state_delta', merged, skip_sid=skip or None)
+        for state in self.clients.values():
+            if state.sent_version == merged['base_version'] and not state.stale:
+                state.sent_version = merged['version']
+                # Nur bestätigende Clients werden gedrosselt; für die anderen wüchse die Liste unbegrenzt
+                if state.acks:
+                    state.in_flight.append(merged['version'])
+        for sid, state in catch_up:
+            if not self._catch_up(sid, state):
+                self._send_frame('state_delta', {**merged, 'resync': True}, to=sid)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "window_ms": self.window * 1000,
+                "max_in_flight": self.max_in_flight,
+                "clients": len(self.clients),
+                "throttled_clients": sum(1 for s in self.clients.values() if s.stale),
+                "pending": len(self.pending_deltas) + len(self.pending_events) + len(self.pending_latest),
+            }
@@ -0,0 +1,264 @@
+#
+# UNOC - failure_simulation.py
+#
+# Monte-Carlo-Ausfallsimulation für die Kapazitätsplanung. Auf einer schreibgeschützten Kopie des
+# Graphen (FailureModel, reine NumPy-Arrays) werden pro Trial ein oder mehrere Betriebsjahre
+# simuliert: Faserausfälle mit einer Rate pro km, Geräteausfälle über die MTBF des Gerätetyps,
+# Reparaturdauer exponentiell um die MTTR. Ausfälle ohne Redundanz dazwischen wirken unabhängig;
+# sich zeitlich überlappende Ausfälle in Ringen und auf redundanten Wegen bilden eine gemeinsame
+# Ausfallmenge, deren Auswirkung auf die Teilnehmer inklusive ERPS-Failover exakt bewertet wird.
+# Trials laufen blockweise in einem Prozess-Pool; die Datenbank wird nie angefasst.
+# Das Versorgungsmodell (Zugangsnetz, Uplink, ERPS) stammt aus service_model.py.
+#
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import networkx as nx
+import numpy as np
+
+from optical_budget import fiber_length_km
+from service_model import ServiceModel
+
+HOURS_PER_YEAR = 8760.0
+DEFAULT_FIBER_FAILURES_PER_KM_YEAR = 0.002
+# Mittlere Betriebsdauer zwischen Ausfällen je Gerätetyp (Stunden); passive Elemente fallen selten aus
+DEFAULT_MTBF_HOURS = {
+    'Core Node': 200000.0,
+    'Aggregation Switch': 200000.0,
+    'POP': 500000.0,
+    'ODF': 2000000.0,
+    'OLT': 150000.0,
+    'AON Switch': 150000.0,
+    'NVt': 1000000.0,
+    'Splitter': 2000000.0,
+    'HÜP': 2000000.0,
+    'ONT': 100000.0,
+    'Business NT': 100000.0,
+}
+DEFAULT_DEVICE_MTBF_HOURS = 500000.0
+DEFAULT_MTTR_HOURS = {"link": 12.0, "device": 4.0}
+# Feste Blockgröße: die Ergebnisse hängen nur vom Seed ab, nicht von der Anzahl der Worker
+TRIALS_PER_CHUNK = 100
+HISTOGRAM_BINS = 20
+
+
+class FailureModel(ServiceModel):
+    """
+    ServiceModel mit Ausfallraten (pro Jahr) und Reparaturdauern (Stunden) je Element. Nur Elemente,
+    die heute Teilnehmer versorgen oder schützen, haben eine Rate.
+    """
+
+    def __init__(self, graph: nx.DiGraph, head_end_types: Iterable[str], end_device_types: Iterable[str],
+                 fiber_failures_per_km_year: float = DEFAULT_FIBER_FAILURES_PER_KM_YEAR, mtbf_hours: Optional[Dict[str, float]] = None,
+                 mttr_hours: Optional[Dict[str, float]] = None, derived_lengths: Optional[Dict[str, float]] = None, prefer_derived: bool = False):
+        super().__init__(graph, head_end_types, end_device_types)
+        mtbf_hours = {**DEFAULT_MTBF_HOURS, **(mtbf_hours or {})}
+        mttr_hours = {**DEFAULT_MTTR_HOURS, **(mttr_hours or {})}
+        link_count, n = self.link_count, len(self.node_ids)
+        target = self.link_target
+        # Faserlängen in derselben Reihenfolge wie die Links des ServiceModel
+        length_km = [float(fiber_length_km(data, derived_lengths, prefer_derived) or 0.0)
+                     for targets in graph.adj.values() for data in targets.values()]
+
+        # Ausfallraten pro Jahr und Reparaturdauern; nur Elemente, die heute versorgen oder schützen
+        modeled_links = np.zeros(link_count, dtype=bool)
+        modeled_links[self.access_links] = True
+        modeled_links[(self.uplink_child >= 0)] = True
+        modeled_links[self.spare] = True
+        self.rate = np.zeros(link_count + n)
+        self.rate[:link_count] = np.where(modeled_links, fiber_failures_per_km_year * np.array(length_km), 0.0)
+        device_rate = {node_type: HOURS_PER_YEAR / float(mtbf) for node_type, mtbf in mtbf_hours.items()}
+        default_rate = HOURS_PER_YEAR / DEFAULT_DEVICE_MTBF_HOURS
+        self.rate[link_count:] = np.where(self.access_visited | self.uplink_visited, [device_rate.get(node_type, default_rate) for node_type in self.node_types], 0.0)
+        self.mttr = np.empty(link_count + n)
+        self.mttr[:link_count] = mttr_hours["link"]
+        self.mttr[link_count:] = mttr_hours["device"]
+
+        access_links, pred_count, subscribers = self.access_links, np.array(self.pred_count), self.access_subscribers
+        idom, merge, predecessors, spare = self.idom, self.merge, self.predecessors, self.spare
+        uplink_parent, head_ends_below = self.uplink_parent, self.head_ends_below
+        # Einzelausfälle im Zugangsnetz: die dominierten Teilnehmer (ein Link nur, wenn er der einzige
+        # Zugang seines Zielknotens ist). Oberhalb der Head-Ends wird exakt über impact() gerechnet.
+        self.single_impact = np.zeros(link_count + n, dtype=np.int64)
+        sole = access_links[pred_count[target[access_links]] == 1]
+        self.single_impact[sole] = subscribers[target[sole]]
+        self.single_impact[link_count:] = subscribers
+        upstream = np.zeros(link_count + n, dtype=bool)
+        uplink_links = np.nonzero(self.uplink_child >= 0)[0]
+        upstream[uplink_links] = head_ends_below[self.uplink_child[uplink_links]] > 0
+        upstream[link_count:] = head_ends_below > 0
+        for element in np.nonzero(upstream)[0].tolist():
+            self.single_impact[element] = self.impact((element,))
+
+        # Geschützt: Head-Ends im Uplink-Teilbaum mit Ersatzweg, oder Elemente auf einem von mehreren
+        # Zugängen im Zugangsnetz. Nur deren Ausfälle beeinflussen sich gegenseitig.
+        self.protected = np.zeros(link_count + n, dtype=bool)
+        for u, v, _, _ in self.alternatives:
+            for node in (u, v):
+                while node >= 0 and not self.protected[link_count + node]:
+                    self.protected[link_count + node] = True
+                    node = uplink_parent[node]
+        self.protected[uplink_links] = self.protected[link_count + self.uplink_child[uplink_links]]
+        self.protected &= upstream
+        for node, preds in predecessors.items():
+            for pred in preds:
+                while pred >= 0 and pred != idom[node]:
+                    self.protected[link_count + pred] = True
+                    pred = idom[pred]
+        redundant_target = np.isin(target[access_links], merge) | self.protected[link_count + target[access_links]]
+        self.protected[access_links[redundant_target]] = True
+        self.interacting = self.protected.copy()
+        self.interacting[spare] = True
+        self.interacting[list(self.triggers)] = True
+
+
+def _summary(values: np.ndarray) -> dict:
+    if not len(values):
+        return {}
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    percentiles = np.percentile(values, [50, 90, 95, 99])
+    return {
+        "mean": round(float(values.mean()), 3),
+        "std": round(float(values.std()), 3),
+        "min": round(float(values.min()), 3),
+        "p50": round(float(percentiles[0]), 3),
+        "p90": round(float(percentiles[1]), 3),
+        "p95": round(float(percentiles[2]), 3),
+        "p99": round(float(percentiles[3]), 3),
+        "max": round(float(values.max()), 3),
+        "histogram": {"edges": [round(float(e), 3) for e in edges], "counts": counts.tolist()},
+    }
+
+
+def run_trials(model: FailureModel, trials: int, seed, years: float = 1.0) -> dict:
+    """Simuliert trials unabhängige Zeiträume von years Jahren (seed: int oder np.random.SeedSequence)."""
+    rng = np.random.default_rng(seed)
+    hours = years * HOURS_PER_YEAR
+    affected = np.zeros(trials)
+    outage_hours = np.zeros(trials)
+    events = np.zeros(trials)
+    worst_event = np.zeros(trials)
+    # Überlagerte Poisson-Prozesse: Gesamtzahl der Ausfälle, dann das Element proportional zur Rate
+    cumulative_rate = np.cumsum(model.rate)
+    total_rate = float(cumulative_rate[-1]) if len(cumulative_rate) else 0.0
+    all_elements, all_impacts = [], []
+    for trial in range(trials):
+        count = rng.poisson(total_rate * years)
+        if not count:
+            continue
+        elements = np.searchsorted(cumulative_rate, rng.uniform(0.0, total_rate, count), side='right')
+        starts = rng.uniform(0.0, hours, count)
+        ends = starts + rng.exponential(model.mttr[elements])
+
+        # Unabhängige Ausfälle wirken einzeln mit ihrer eigenen Dauer
+        independent = ~model.interacting[elements]
+        event_impact = model.single_impact[elements].astype(np.float64)
+        impact = event_impact[independent]
+        duration = ends[independent] - starts[independent]
+
+        # Sich überlappende Ausfälle in Ringen und auf redundanten Wegen bilden eine gemeinsame Ausfallmenge
+        linked = np.nonzero(~independent)[0]
+        if len(linked):
+            linked = linked[np.argsort(starts[linked])]
+            new_cluster = np.ones(len(linked), dtype=bool)
+            new_cluster[1:] = starts[linked][1:] > np.maximum.accumulate(ends[linked])[:-1]
+            first = np.nonzero(new_cluster)[0]
+            cluster_size = np.diff(np.append(first, len(linked)))
+            cluster_impact = event_impact[linked[first]]
+            for c in np.nonzero(cluster_size > 1)[0].tolist():
+                cluster_impact[c] = model.impact(elements[linked[first[c]:first[c] + cluster_size[c]]].tolist())
+            event_impact[linked] = cluster_impact[np.cumsum(new_cluster) - 1]
+            impact = np.concatenate([impact, cluster_impact])
+            duration = np.concatenate([duration, np.maximum.reduceat(ends[linked], first) - starts[linked][first]])
+
+        affected[trial] = impact.sum()
+        outage_hours[trial] = (impact * duration).sum()
+        events[trial] = count
+        worst_event[trial] = impact.max()
+        all_elements.append(elements)
+        all_impacts.append(event_impact)
+
+    element_count = len(model.rate)
+    elements = np.concatenate(all_elements) if all_elements else np.zeros(0, dtype=np.int64)
+    impacts = np.concatenate(all_impacts) if all_impacts else np.zeros(0)
+    return {"affected": affected, "outage_hours": outage_hours, "events": events, "worst_event": worst_event,
+            "failures": np.bincount(elements, minlength=element_count).astype(np.float64),
+            "impact_sum": np.bincount(elements, weights=impacts, minlength=element_count),
+            "impacting": np.bincount(elements, weights=impacts > 0, minlength=element_count)}
+
+
+# --- Prozess-Pool: das Modell wird einmal pro Worker übergeben, nicht pro Block ---
+_worker_model: Optional[FailureModel] = None
+
+
+def _init_worker(model: FailureModel):
+    global _worker_model
+    _worker_model = model
+
+
+def _run_chunk(trials: int, seed, years: float) -> dict:
+    return run_trials(_worker_model, trials, seed, years)
+
+
+def _pool_context():
+    # fork übernimmt das Modell ohne Pickling und importiert das Backend nicht neu
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def simulate(model: FailureModel, trials: int = 1000, seed: int = 0, workers: Optional[int] = None, years: float = 1.0, top: int = 20) -> dict:
+    """Verteilt die Trials blockweise auf workers Prozesse (Standard: alle Kerne) und fasst die Ergebnisse zusammen."""
+    started = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, math.ceil(trials / TRIALS_PER_CHUNK)))
+    chunk_sizes = [min(TRIALS_PER_CHUNK, trials - i) for i in range(0, trials, TRIALS_PER_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    if workers == 1:
+        parts = [run_trials(model, size, chunk_seed, years) for size, chunk_seed in zip(chunk_sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(), initializer=_init_worker, initargs=(model,)) as pool:
+            parts = list(pool.map(_run_chunk, chunk_sizes, seeds, [years] * len(chunk_sizes)))
+
+    combined = {key: np.concatenate([part[key] for part in parts]) for key in ("affected", "outage_hours", "events", "worst_event")}
+    for key in ("failures", "impact_sum", "impacting"):
+        combined[key] = np.sum([part[key] for part in parts], axis=0)
+    total = trials * years
+
+    def ranking(elements: np.ndarray) -> List[dict]:
+        expected_impact = combined["impact_sum"][elements] / total
+        analytic = model.rate[elements] * model.single_impact[elements]
+        ranked = elements[np.lexsort((-analytic, -expected_impact))][:top]
+        return [{
+            "id": model.element_id(element),
+            "failures_per_year": round(float(combined["failures"][element] / total), 5),
+            "expected_subscribers_affected_per_year": round(float(combined["impact_sum"][element] / total), 4),
+            "impacting_failures_per_year": round(float(combined["impacting"][element] / total), 5),
+            "single_failure_impact": int(model.single_impact[element]),
+            "protected": bool(model.protected[element]),
+        } for element in ranked.tolist()]
+
+    modeled = np.nonzero(model.rate > 0)[0]
+    return {
+        "trials": trials,
+        "years_per_trial": years,
+        "seed": seed,
+        "workers": workers,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "network": {
+            "subscribers": model.total_subscribers,
+            "links": int((modeled < model.link_count).sum()),
+            "devices": int((modeled >= model.link_count).sum()),
+            "rings": len(model.ring_ids),
+            "expected_failures_per_year": round(float(model.rate.sum()), 3),
+        },
+        "subscribers_affected_per_year": _summary(combined["affected"] / years),
+        "subscriber_outage_hours_per_year": _summary(combined["outage_hours"] / years),
+        "failure_events_per_year": _summary(combined["events"] / years),
+        "worst_single_event": _summary(combined["worst_event"]),
+        "link_criticality": ranking(modeled[modeled < model.link_count]),
+        "device_criticality": ranking(modeled[modeled >= model.link_count]),
+    }
@@ -181,23 +181,40 @@ function initializeWebSocket() {
     socket.on('initial_topology', (data) => {
         console.log("Initiale Topologie empfangen.", data);
         fullTopologyData = data;
+        socket.emit('delta_ack', { version: data.version });
         renderView(activeViewMode);
     });
 
-    socket.on('full_state_update', (data) => {
-        console.log("Full State Update empfangen.");
-        fullTopologyData = data;
+    socket.on('state_delta', (delta) => {
+        if (!fullTopologyData) return;
+        if (delta.resync) {
+            socket.emit('request_initial_data');
+            return;
+        }
+        if (delta.version <= fullTopologyData.version) return; // Bereits bekannt (z.B. doppelt nach Resync)
+        if (delta.base_version !== fullTopologyData.version) {
+            console.warn(`State-Delta-Lücke (${fullTopologyData.version} -> ${delta.base_version}), fordere Resync an.`);
+            socket.emit('request_resync', { since_version: fullTopologyData.version });
+            return;
+        }
+        applyStateDelta(delta);
+        // Bestätigung für die Backpressure im Backend (unbestätigte Frames werden gedrosselt)
+        socket.emit('delta_ack', { version: delta.version });
         renderView(activeViewMode);
     });
-    
-    socket.on('new_event', (event_message) => {
+
+    // Meldungen kommen gebündelt pro Sendefenster
+    socket.on('new_events', (event_messages) => event_messages.forEach(addEventLogEntry));
+    socket.on('new_event', addEventLogEntry);
+
+    function addEventLogEntry(event_message) {
         const eventLog = document.getElementById('event-log');
         const newLi = document.createElement('li');
         newLi.textContent = event_message;
         if (eventLog.firstChild && eventLog.firstChild.classList.contains('loader')) eventLog.innerHTML = '';
         eventLog.prepend(newLi);
         if (eventLog.children.length > 100) eventLog.removeChild(eventLog.lastChild);
-    });
+    }
 
     // --- ERWEITERT FÜR PHASE 6: WebSocket-Handler für den gesamten Dienst-Status ---
     socket.on('full_service_status', (data) => {
@@ -242,6 +259,32 @@ function initializeWebSocket() {
     });
 }
 
+// Übernimmt nur die geänderten Objekte eines State-Deltas in fullTopologyData
+function applyStateDelta(delta) {
+    const upsertById = (list, changed) => {
+        const indexById = new Map(list.map((item, i) => [item.id, i]));
+        changed.forEach(item => {
+            if (indexById.has(item.id)) list[indexById.get(item.id)] = item;
+            else list.push(item);
+        });
+    };
+    upsertById(fullTopologyData.devices, delta.devices || []);
+    upsertById(fullTopologyData.links, delta.links || []);
+    upsertById(fullTopologyData.rings, delta.rings || []);
+
+    const alarms = fullTopologyData.alarms || [];
+    (delta.alarms || []).forEach(alarm => {
+        const idx = alarms.findIndex(a => a.id === alarm.id);
+        if (idx >= 0) alarms.splice(idx, 1);
+        if (alarm.status === 'ACTIVE') alarms.push(alarm);
+    });
+    fullTopologyData.alarms = alarms;
+
+    fullTopologyData.stats = delta.stats;
+    fullTopologyData.history_status = delta.history_status;
+    fullTopologyData.version = delta.version;
+}
+
 // --- Filter- & Rendering-Logik ---
 function applyArchFilter(tech) {
     console.log(`Architektur-Filter wird auf "${tech}" gesetzt.`);
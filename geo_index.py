@@ -0,0 +1,196 @@
+#
+# UNOC - geo_index.py
+#
+# Geo-Abfragen über Device.coordinates ([lon, lat]): k nächste Nachbarn (z.B. der nächste
+# Core Node für einen neuen POP) und Umkreissuche. Die Positionen liegen als NumPy-Arrays nach
+# Breitengrad sortiert vor; eine Abfrage liest per Binärsuche nur das passende Breitenband und
+# berechnet die Haversine-Distanzen darin vektorisiert.
+# Zusätzlich werden Linklängen aus den LineString-Geometrien der GeoJSON-Daten (bzw. aus den
+# Koordinaten der Endpunkte) abgeleitet, damit Links ohne length_km ins optische Budget eingehen.
+#
+
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from commands import ChangeRecord
+from stream_parsers import iter_geojson_features
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_GEOMETRY_PATH = "dg_network_data.json"
+_INITIAL_SEARCH_RADIUS_KM = 10.0
+
+
+def haversine_km(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """Großkreisdistanz in km; alle Argumente in Grad, beliebig broadcastbar."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def polyline_lengths_km(lines: List[List[List[float]]]) -> np.ndarray:
+    """Längen vieler Linienzüge ([[lon, lat], ...]) in einem Durchlauf über alle Segmente."""
+    if not lines:
+        return np.zeros(0)
+    points = np.array([point[:2] for line in lines for point in line], dtype=np.float64).reshape(-1, 2)
+    sizes = np.array([len(line) for line in lines])
+    segments = haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    # Segmente zwischen dem letzten Punkt einer Linie und dem ersten der nächsten verwerfen
+    ends = np.cumsum(sizes)
+    segments = np.append(segments, 0.0)
+    segments[ends - 1] = 0.0
+    lengths = np.add.reduceat(segments, np.concatenate(([0], ends[:-1]))) if len(points) else np.zeros(len(lines))
+    return np.where(sizes > 1, lengths, 0.0)
+
+
+def load_line_geometries(path: str = DEFAULT_GEOMETRY_PATH) -> Dict[Tuple[str, str], list]:
+    """(source, target) -> Koordinatenliste für alle LineString-Features mit source/target."""
+    geometries = {}
+    if not os.path.exists(path):
+        return geometries
+    for feature in iter_geojson_features(path):
+        geometry = feature.get('geometry') or {}
+        props = feature.get('properties') or {}
+        if geometry.get('type') == 'LineString' and props.get('source') and props.get('target'):
+            geometries[(props['source'], props['target'])] = geometry.get('coordinates') or []
+    return geometries
+
+
+class GeoIndex:
+    """
+    Nach Breitengrad sortierte Positionen aller Geräte mit gültigen Koordinaten.
+    Wird bei Koordinatenänderungen nur als veraltet markiert und bei der nächsten Abfrage neu aufgebaut.
+    """
+
+    def __init__(self, geometry_path: str = DEFAULT_GEOMETRY_PATH):
+        self.geometry_path = geometry_path
+        self._geometries: Optional[Dict[Tuple[str, str], list]] = None
+        self._graph: Optional[nx.DiGraph] = None
+        self._dirty = True
+        self._link_lengths: Optional[Dict[str, dict]] = None
+        self.ids = np.empty(0, dtype=object)
+        self.lon = np.empty(0)
+        self.lat = np.empty(0)
+        self.type_codes = np.empty(0, dtype=np.int32)
+        self.type_index: Dict[str, int] = {}
+
+    def rebuild(self, graph: nx.DiGraph):
+        self._graph = graph
+        self._dirty = True
+        self._link_lengths = None
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        if any(record.kind == 'device' and record.field == 'coordinates' for record in records):
+            self.rebuild(graph)
+
+    def _ensure_built(self):
+        if not self._dirty:
+            return
+        ids, lon, lat, types = [], [], [], []
+        for node_id, node in (self._graph.nodes(data=True) if self._graph is not None else []):
+            coordinates = node.get('coordinates')
+            if not isinstance(coordinates, (list, tuple)) or len(coordinates) != 2:
+                continue
+            try:
+                x, y = float(coordinates[0]), float(coordinates[1])
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(x) and math.isfinite(y):
+                ids.append(node_id)
+                lon.append(x)
+                lat.append(y)
+                types.append(node.get('type'))
+        self.type_index = {t: i for i, t in enumerate(sorted(set(types), key=str))}
+        order = np.argsort(np.array(lat, dtype=np.float64), kind='stable')
+        self.ids = np.array(ids, dtype=object)[order]
+        self.lon = np.array(lon, dtype=np.float64)[order]
+        self.lat = np.array(lat, dtype=np.float64)[order]
+        self.type_codes = np.array([self.type_index[t] for t in types], dtype=np.int32)[order] if types else np.empty(0, dtype=np.int32)
+        self._dirty = False
+
+    def _band(self, lat: float, radius_km: float, types: Optional[Iterable[str]]) -> Tuple[np.ndarray, bool]:
+        """Kandidaten im Breitenband ±radius_km (jede Distanz ist mindestens der Breitenabstand)."""
+        delta = radius_km / KM_PER_DEGREE_LAT
+        start = int(np.searchsorted(self.lat, lat - delta, side='left'))
+        stop = int(np.searchsorted(self.lat, lat + delta, side='right'))
+        candidates = np.arange(start, stop)
+        if types is not None:
+            codes = [self.type_index[t] for t in types if t in self.type_index]
+            candidates = candidates[np.isin(self.type_codes[start:stop], codes)]
+        return candidates, stop - start == len(self.lat)
+
+    def _results(self, candidates: np.ndarray, distances: np.ndarray) -> List[dict]:
+        return [
+            {"id": self.ids[i], "type": self._graph.nodes[self.ids[i]].get('type'), "coordinates": [float(self.lon[i]), float(self.lat[i])], "distance_km": round(float(d), 3)}
+            for i, d in zip(candidates, distances)
+        ]
+
+    def within_radius(self, lon: float, lat: float, radius_km: float, types: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> List[dict]:
+        """Alle Geräte im Umkreis (inklusive Rand), nach Distanz sortiert."""
+        self._ensure_built()
+        candidates, _ = self._band(lat, radius_km, types)
+        distances = haversine_km(lon, lat, self.lon[candidates], self.lat[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')[:limit]
+        return self._results(candidates[order], distances[order])
+
+    def nearest(self, lon: float, lat: float, k: int = 1, types: Optional[Iterable[str]] = None, max_km: Optional[float] = None) -> List[dict]:
+        """
+        Die k nächsten Geräte (optional nur bestimmter Typen und höchstens max_km entfernt).
+        Das Suchband wird vervierfacht, bis k Treffer innerhalb des Bandradius liegen.
+        """
+        self._ensure_built()
+        types = list(types) if types is not None else None
+        radius = min(_INITIAL_SEARCH_RADIUS_KM, max_km) if max_km is not None else _INITIAL_SEARCH_RADIUS_KM
+        while True:
+            candidates, covers_all = self._band(lat, radius, types)
+            distances = haversine_km(lon, lat, self.lon[candidates], self.lat[candidates])
+            inside = distances <= radius
+            if inside.sum() >= k or covers_all or (max_km is not None and radius >= max_km):
+                break
+            radius = min(radius * 4, max_km) if max_km is not None else radius * 4
+        if max_km is not None:
+            candidates, distances = candidates[distances <= max_km], distances[distances <= max_km]
+        if len(distances) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[top], distances[top]
+        order = np.argsort(distances, kind='stable')
+        return self._results(candidates[order], distances[order])
+
+    def link_lengths(self) -> Dict[str, dict]:
+        """
+        link_id -> {"length_km", "method"}: aus der LineString-Geometrie, sonst als Luftlinie
+        zwischen den Endpunkten. Links ohne Geometrie und ohne Endpunktkoordinaten fehlen.
+        """
+        if self._link_lengths is not None:
+            return self._link_lengths
+        if self._geometries is None:
+            self._geometries = load_line_geometries(self.geometry_path)
+        graph = self._graph if self._graph is not None else nx.DiGraph()
+        with_geometry, endpoint_links, endpoints = [], [], []
+        for source, target, edge in graph.edges(data=True):
+            geometry = self._geometries.get((source, target))
+            if geometry and len(geometry) > 1:
+                with_geometry.append((edge['link_id_str'], geometry))
+                continue
+            a, b = graph.nodes[source].get('coordinates'), graph.nodes[target].get('coordinates')
+            if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)) and len(a) == 2 and len(b) == 2 and None not in (*a, *b):
+                endpoint_links.append(edge['link_id_str'])
+                endpoints.append((*a, *b))
+        lengths = {}
+        for (link_id, _), km in zip(with_geometry, polyline_lengths_km([g for _, g in with_geometry])):
+            lengths[link_id] = {"length_km": round(float(km), 3), "method": "geometry"}
+        if endpoints:
+            coords = np.array(endpoints, dtype=np.float64)
+            for link_id, km in zip(endpoint_links, haversine_km(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3])):
+                lengths[link_id] = {"length_km": round(float(km), 3), "method": "endpoints"}
+        self._link_lengths = lengths
+        return lengths
+
+    def derived_lengths_km(self) -> Dict[str, float]:
+        return {link_id: entry["length_km"] for link_id, entry in self.link_lengths().items()}
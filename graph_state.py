@@ -0,0 +1,201 @@
+#
+# UNOC - graph_state.py
+#
+# Baut den In-Memory-Graphen aus der Datenbank und hält ihn über Change-Records
+# inkrementell aktuell, statt ihn nach jeder Mutation komplett neu zu lesen.
+#
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import networkx as nx
+from sqlalchemy.orm import Session as DBSessionType
+
+from database import Device, Link, Ring, ring_device_association
+from commands import ChangeRecord
+
+
+def build_graph(db_session: DBSessionType) -> nx.DiGraph:
+    """
+    Liest alle Geräte und Links genau einmal und baut daraus einen DiGraph.
+    Knoten und Kanten tragen reine Python-Daten (keine ORM-Objekte), damit der
+    Graph die Request-Session überlebt und in-place gepatcht werden kann.
+    """
+    graph = nx.DiGraph()
+    devices = db_session.query(Device).all()
+    links = db_session.query(Link).all()
+    device_id_map = {d.id: d.device_id_str for d in devices}
+    for device in devices:
+        graph.add_node(
+            device.device_id_str,
+            db_id=device.id,
+            type=device.type,
+            status=device.status,
+            properties=device.properties or {},
+            coordinates=device.coordinates
+        )
+    link_endpoints = {}
+    for link in links:
+        source_id_str = device_id_map.get(link.source_id)
+        target_id_str = device_id_map.get(link.target_id)
+        if source_id_str and target_id_str:
+            graph.add_edge(
+                source_id_str,
+                target_id_str,
+                db_id=link.id,
+                link_id_str=link.link_id_str,
+                status=link.status,
+                properties=link.properties or {}
+            )
+            link_endpoints[link.link_id_str] = (source_id_str, target_id_str)
+    # Schneller Zugriff link_id_str -> (source, target) für das Patchen von Link-Änderungen
+    graph.graph["link_endpoints"] = link_endpoints
+
+    # Ringe inkl. Mitgliedern mit einer einzigen Abfrage der Assoziationstabelle (statt N+1 über r.nodes)
+    ring_members = {}
+    for ring_id, device_id in db_session.query(ring_device_association.c.ring_id, ring_device_association.c.device_id).all():
+        ring_members.setdefault(ring_id, []).append(device_id_map.get(device_id))
+    graph.graph["rings"] = {
+        r.ring_id_str: {"id": r.ring_id_str, "name": r.name, "rpl_link_id": r.rpl_link_id_str, "nodes": ring_members.get(r.id, [])}
+        for r in db_session.query(Ring).all()
+    }
+    return graph
+
+
+def serialize_device(graph: nx.DiGraph, device_id_str: str) -> dict:
+    """Serialisiert ein Gerät aus dem Graphen im selben Format wie serialize_topology."""
+    node = graph.nodes[device_id_str]
+    return {"id": device_id_str, "type": node["type"], "status": node["status"], "properties": node["properties"], "coordinates": node["coordinates"]}
+
+
+def serialize_link(graph: nx.DiGraph, link_id_str: str) -> dict:
+    """Serialisiert einen Link aus dem Graphen im selben Format wie serialize_topology."""
+    source, target = graph.graph["link_endpoints"][link_id_str]
+    edge = graph.edges[source, target]
+    return {"id": link_id_str, "source": source, "target": target, "status": edge["status"], "properties": edge["properties"]}
+
+
+def serialize_graph(graph: nx.DiGraph) -> Dict[str, list]:
+    """Gesamte Topologie aus dem Graphen im Format von serialize_topology (ohne Datenbankzugriff)."""
+    return {
+        "devices": [serialize_device(graph, device_id) for device_id in graph.nodes],
+        "links": [serialize_link(graph, link_id) for link_id in graph.graph.get("link_endpoints", {})],
+        "rings": list(graph.graph.get("rings", {}).values())
+    }
+
+
+def apply_change_records(graph: nx.DiGraph, records: Iterable[ChangeRecord]) -> List[ChangeRecord]:
+    """
+    Wendet Change-Records in-place auf den Graphen an.
+    Gibt die tatsächlich angewendeten Records zurück (unbekannte Objekte werden übersprungen).
+    """
+    applied = []
+    link_endpoints = graph.graph.setdefault("link_endpoints", {})
+    for record in records:
+        if record.kind == "device":
+            if not graph.has_node(record.object_id):
+                continue
+            graph.nodes[record.object_id][record.field] = record.new
+        elif record.kind == "link":
+            endpoints = link_endpoints.get(record.object_id)
+            if not endpoints or not graph.has_edge(*endpoints):
+                continue
+            graph.edges[endpoints][record.field] = record.new
+        else:
+            continue
+        applied.append(record)
+    return applied
+
+
+def diff_graphs(expected: nx.DiGraph, actual: nx.DiGraph) -> List[str]:
+    """Vergleicht zwei Graphen (z.B. gepatcht vs. frisch gebaut) und listet alle Abweichungen."""
+    differences = []
+    expected_nodes, actual_nodes = set(expected.nodes), set(actual.nodes)
+    for node in sorted(expected_nodes - actual_nodes):
+        differences.append(f"node '{node}' missing")
+    for node in sorted(actual_nodes - expected_nodes):
+        differences.append(f"node '{node}' unexpected")
+    for node in sorted(expected_nodes & actual_nodes):
+        if expected.nodes[node] != actual.nodes[node]:
+            differences.append(f"node '{node}' differs: {actual.nodes[node]} != {expected.nodes[node]}")
+
+    expected_edges, actual_edges = set(expected.edges), set(actual.edges)
+    for edge in sorted(expected_edges - actual_edges):
+        differences.append(f"edge {edge} missing")
+    for edge in sorted(actual_edges - expected_edges):
+        differences.append(f"edge {edge} unexpected")
+    for edge in sorted(expected_edges & actual_edges):
+        if expected.edges[edge] != actual.edges[edge]:
+            differences.append(f"edge {edge} differs: {actual.edges[edge]} != {expected.edges[edge]}")
+    return differences
+
+
+class ActiveLinkView:
+    """
+    Ungerichtete Sicht nur über Links mit Status 'up' plus Hash-Index (u, v) -> link_id_str.
+    Wird über Change-Records synchron gehalten, damit ein Trace ohne Datenbank auskommt.
+    """
+
+    def __init__(self):
+        self.graph = nx.Graph()
+        self.link_ids: Dict[Tuple[str, str], str] = {}
+
+    def rebuild(self, graph: nx.DiGraph):
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(graph.nodes)
+        self.link_ids = {}
+        for source, target, data in graph.edges(data=True):
+            self.link_ids[(source, target)] = data['link_id_str']
+            if data['status'] == 'up':
+                self._add_up_link(source, target, data['link_id_str'])
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        for record in records:
+            if record.kind != 'link' or record.field != 'status' or record.object_id not in link_endpoints:
+                continue
+            source, target = link_endpoints[record.object_id]
+            if record.new == 'up':
+                self._add_up_link(source, target, record.object_id)
+            elif record.old == 'up':
+                self._remove_up_link(source, target, record.object_id)
+
+    def link_id(self, u: str, v: str) -> Optional[str]:
+        """Link zwischen zwei Knoten, unabhängig von der Richtung; bevorzugt einen aktiven Link."""
+        if self.graph.has_edge(u, v):
+            return min(self.graph.edges[u, v]['link_ids'])
+        return self.link_ids.get((u, v)) or self.link_ids.get((v, u))
+
+    def trace(self, start: str, end: str) -> Tuple[List[str], List[str]]:
+        """Kürzester Pfad über aktive Links (eine BFS, keine Datenbankzugriffe)."""
+        try:
+            path_nodes = nx.shortest_path(self.graph, source=start, target=end)
+        except nx.NetworkXNoPath:
+            return [], []
+        path_links = [self.link_id(path_nodes[i], path_nodes[i + 1]) for i in range(len(path_nodes) - 1)]
+        return path_nodes, path_links
+
+    def diff(self, other: 'ActiveLinkView') -> List[str]:
+        differences = []
+        own_edges = {frozenset(e): self.graph.edges[e]['link_ids'] for e in self.graph.edges}
+        other_edges = {frozenset(e): other.graph.edges[e]['link_ids'] for e in other.graph.edges}
+        for edge in set(own_edges) ^ set(other_edges):
+            differences.append(f"active view: edge {sorted(edge)} present in only one view")
+        for edge in set(own_edges) & set(other_edges):
+            if own_edges[edge] != other_edges[edge]:
+                differences.append(f"active view: links of edge {sorted(edge)} differ: {own_edges[edge]} != {other_edges[edge]}")
+        return differences
+
+    def _add_up_link(self, source: str, target: str, link_id_str: str):
+        # Antiparallele Links (u->v und v->u) teilen sich eine ungerichtete Kante
+        if self.graph.has_edge(source, target):
+            self.graph.edges[source, target]['link_ids'].add(link_id_str)
+        else:
+            self.graph.add_edge(source, target, link_ids={link_id_str})
+
+    def _remove_up_link(self, source: str, target: str, link_id_str: str):
+        if not self.graph.has_edge(source, target):
+            return
+        link_ids = self.graph.edges[source, target]['link_ids']
+        link_ids.discard(link_id_str)
+        if not link_ids:
+            self.graph.remove_edge(source, target)
@@ -0,0 +1,247 @@
+#
+# UNOC - history.py
+#
+# Begrenzte Undo/Redo-Historie. Statt Command-Objekten (mit ORM-Instanzen und Session) werden nur
+# die Change-Records eines Commands als Tupel gehalten. Jede Aktion wird sofort an ein
+# append-only Journal (JSONL) angehängt; ältere Einträge werden aus dem Speicher verdrängt und
+# bei Bedarf über ihren Datei-Offset nachgeladen. Nach einem Neustart wird die Historie aus dem
+# Journal rekonstruiert.
+#
+# Journal-Zeilen:
+#   {"op": "do", "seq": 7, "ts": ..., "label": ..., "records": [[kind, id, field, old, new], ...]}
+#   {"op": "undo", "seq": 7} / {"op": "redo", "seq": 7} / {"op": "clear"}
+#
+
+import datetime
+import json
+import os
+import sys
+import threading
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from commands import ChangeRecord
+
+DEFAULT_MAX_DEPTH = 1000
+DEFAULT_MAX_MEMORY_BYTES = 4 * 1024 * 1024
+# Journal neu schreiben, sobald es so viele Zeilen mehr enthält, als für die Historie nötig sind
+COMPACT_SLACK_LINES = 1000
+
+
+class HistoryEntry:
+    __slots__ = ('seq', 'label', 'records', 'offset', 'size')
+
+    def __init__(self, seq: int, label: str, records: Optional[Tuple[ChangeRecord, ...]], offset: Optional[int], size: int):
+        self.seq = seq
+        self.label = label
+        self.records = records  # None, wenn ins Journal ausgelagert
+        self.offset = offset    # Byte-Offset der "do"-Zeile im Journal (None ohne Journal)
+        self.size = size        # Größe der kodierten Zeile als Schätzung des Speicherbedarfs
+
+
+def _encode_records(records: Iterable[ChangeRecord]) -> list:
+    return [[r.kind, r.object_id, r.field, r.old, r.new] for r in records]
+
+
+def _decode_records(rows: list) -> Tuple[ChangeRecord, ...]:
+    return tuple(ChangeRecord(sys.intern(kind), object_id, sys.intern(field), old, new) for kind, object_id, field, old, new in rows)
+
+
+class UndoHistory:
+    """
+    Undo-Stack mit höchstens max_depth Einträgen; die Change-Records im Speicher werden auf
+    max_memory_bytes begrenzt. Ohne journal_path werden bei Überschreitung die ältesten Einträge verworfen.
+    Undo/Redo in zwei Schritten: peek_undo()/peek_redo() liefern die Records, commit_undo()/commit_redo()
+    verbuchen den Schritt erst, nachdem er in der Datenbank angewendet wurde.
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, max_depth: int = DEFAULT_MAX_DEPTH, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES):
+        self.journal_path = journal_path or None
+        self.max_depth = max_depth
+        self.max_memory_bytes = max_memory_bytes
+        self.undo_entries: Deque[HistoryEntry] = deque()
+        self.redo_entries: List[HistoryEntry] = []
+        self.memory_bytes = 0
+        self.next_seq = 1
+        self.journal_lines = 0
+        self._lock = threading.RLock()
+        if self.journal_path:
+            self._replay_journal()
+
+    # --- Öffentliche API ---
+    def push(self, records: Iterable[ChangeRecord], label: str = ""):
+        records = tuple(records)
+        if not records:
+            return
+        with self._lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            line = {"op": "do", "seq": seq, "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(), "label": label, "records": _encode_records(records)}
+            offset, size = self._append(line)
+            self._drop_entries(self.redo_entries)
+            self.redo_entries = []
+            entry = HistoryEntry(seq, label, records, offset, size)
+            self.undo_entries.append(entry)
+            self.memory_bytes += size
+            while len(self.undo_entries) > self.max_depth:
+                self._drop_entries([self.undo_entries.popleft()])
+            self._enforce_memory_cap()
+            self._maybe_compact()
+
+    def peek_undo(self) -> Optional[Tuple[ChangeRecord, ...]]:
+        """Records der Aktion, die ein Undo rückgängig machen würde (in Ausführungsreihenfolge)."""
+        with self._lock:
+            return self._records(self.undo_entries[-1]) if self.undo_entries else None
+
+    def peek_redo(self) -> Optional[Tuple[ChangeRecord, ...]]:
+        with self._lock:
+            return self._records(self.redo_entries[-1]) if self.redo_entries else None
+
+    def commit_undo(self):
+        with self._lock:
+            entry = self.undo_entries.pop()
+            self._append({"op": "undo", "seq": entry.seq})
+            self.redo_entries.append(entry)
+
+    def commit_redo(self):
+        with self._lock:
+            entry = self.redo_entries.pop()
+            self._append({"op": "redo", "seq": entry.seq})
+            self.undo_entries.append(entry)
+
+    def clear(self):
+        """Verwirft die Historie (z.B. nach dem Laden eines Snapshots) und leert das Journal."""
+        with self._lock:
+            self.undo_entries.clear()
+            self.redo_entries = []
+            self.memory_bytes = 0
+            self.journal_lines = 0
+            if self.journal_path and os.path.exists(self.journal_path):
+                open(self.journal_path, 'w').close()
+
+    def status(self) -> dict:
+        return {"can_undo": bool(self.undo_entries), "can_redo": bool(self.redo_entries)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "undo_depth": len(self.undo_entries),
+                "redo_depth": len(self.redo_entries),
+                "max_depth": self.max_depth,
+                "memory_bytes": self.memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "spilled_entries": sum(1 for e in self._all_entries() if e.records is None),
+                "journal": self.journal_path,
+            }
+
+    # --- Speicher & Journal ---
+    def _all_entries(self) -> Iterable[HistoryEntry]:
+        yield from self.undo_entries
+        yield from self.redo_entries
+
+    def _records(self, entry: HistoryEntry) -> Tuple[ChangeRecord, ...]:
+        if entry.records is None:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(entry.offset)
+                entry.records = _decode_records(json.loads(f.readline())["records"])
+            self.memory_bytes += entry.size
+            self._enforce_memory_cap(keep=entry)
+        return entry.records
+
+    def _drop_entries(self, entries: Iterable[HistoryEntry]):
+        for entry in entries:
+            if entry.records is not None:
+                self.memory_bytes -= entry.size
+
+    def _enforce_memory_cap(self, keep: Optional[HistoryEntry] = None):
+        """Lagert die ältesten Records aus (bzw. verwirft ohne Journal die ältesten Einträge)."""
+        if self.memory_bytes <= self.max_memory_bytes:
+            return
+        if not self.journal_path:
+            while self.memory_bytes > self.max_memory_bytes and len(self.undo_entries) > 1:
+                self._drop_entries([self.undo_entries.popleft()])
+            return
+        # Zuerst die ältesten Undo-Einträge, dann die am weitesten entfernten Redo-Einträge
+        for entry in list(self.undo_entries) + self.redo_entries:
+            if self.memory_bytes <= self.max_memory_bytes:
+                break
+            if entry.records is not None and entry is not keep:
+                entry.records = None
+                self.memory_bytes -= entry.size
+
+    def _append(self, line: dict) -> Tuple[Optional[int], int]:
+        data = (json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if not self.journal_path:
+            return None, len(data)
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        self.journal_lines += 1
+        return offset, len(data)
+
+    def _replay_journal(self):
+        """Rekonstruiert beide Stacks aus dem Journal; Records bleiben ausgelagert bis zum ersten Zugriff."""
+        if not os.path.exists(self.journal_path):
+            return
+        truncate_at, missing_newline = None, False
+        with open(self.journal_path, 'rb') as f:
+            offset = 0
+            for raw in f:
+                try:
+                    line = json.loads(raw)
+                except ValueError:
+                    # Abgebrochene letzte Zeile (z.B. Absturz beim Schreiben) ignorieren
+                    print(f"WARN: Unlesbare Zeile im Undo-Journal '{self.journal_path}' bei Offset {offset} übersprungen.")
+                    if not raw.endswith(b"\n"):
+                        truncate_at = offset  # sonst hinge die nächste Zeile an diesem Rest
+                    offset += len(raw)
+                    continue
+                self.journal_lines += 1
+                if not raw.endswith(b"\n"):
+                    missing_newline = True  # vollständige letzte Zeile ohne Zeilenende
+                op = line.get("op")
+                if op == "do":
+                    self.redo_entries = []
+                    self.undo_entries.append(HistoryEntry(line["seq"], line.get("label", ""), None, offset, len(raw)))
+                    while len(self.undo_entries) > self.max_depth:
+                        self.undo_entries.popleft()
+                    self.next_seq = max(self.next_seq, line["seq"] + 1)
+                elif op == "undo" and self.undo_entries and self.undo_entries[-1].seq == line["seq"]:
+                    self.redo_entries.append(self.undo_entries.pop())
+                elif op == "redo" and self.redo_entries and self.redo_entries[-1].seq == line["seq"]:
+                    self.undo_entries.append(self.redo_entries.pop())
+                elif op == "clear":
+                    self.undo_entries.clear()
+                    self.redo_entries = []
+                offset += len(raw)
+        if truncate_at is not None:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(truncate_at)
+        elif missing_newline:
+            with open(self.journal_path, 'ab') as f:
+                f.write(b"\n")
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """Schreibt das Journal neu, wenn es überwiegend aus nicht mehr erreichbaren Zeilen besteht."""
+        if not self.journal_path:
+            return
+        live = len(self.undo_entries) + 2 * len(self.redo_entries)
+        if self.journal_lines <= live + COMPACT_SLACK_LINES:
+            return
+        entries = list(self.undo_entries) + list(reversed(self.redo_entries))
+        lines = [{"op": "do", "seq": e.seq, "label": e.label, "records": _encode_records(self._records(e))} for e in entries]
+        # Redo-Einträge als "do" gefolgt von "undo" in umgekehrter Reihenfolge
+        lines += [{"op": "undo", "seq": e.seq} for e in self.redo_entries]
+        temp_path = f"{self.journal_path}.tmp"
+        offsets = {}
+        with open(temp_path, 'wb') as f:
+            for line in lines:
+                if line["op"] == "do":
+                    offsets[line["seq"]] = f.tell()
+                f.write((json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+        os.replace(temp_path, self.journal_path)
+        for entry in entries:
+            entry.offset = offsets[entry.seq]
+        self.journal_lines = len(lines)
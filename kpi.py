@@ -0,0 +1,88 @@
+#
+# UNOC - kpi.py
+#
+# Live-Aggregate für das HUD: Geräte- und Link-Zähler werden beim Graph-Aufbau einmal gezählt
+# und danach nur noch über Change-Records angepasst. Lesen ist O(1) bzgl. der Netzgröße.
+#
+
+from collections import Counter, defaultdict
+from typing import Iterable
+
+import networkx as nx
+
+from commands import ChangeRecord
+
+UNKNOWN_REGION = "Unbekannt"
+DEFAULT_LINK_TECHNOLOGY = "PON"  # wie im Frontend: Links ohne link_technology gelten als PON
+
+
+def device_region(node: dict) -> str:
+    return (node.get('properties') or {}).get('bundesland') or UNKNOWN_REGION
+
+
+def link_technology(edge: dict) -> str:
+    return (edge.get('properties') or {}).get('link_technology') or DEFAULT_LINK_TECHNOLOGY
+
+
+class TopologyKpis:
+    """Zähler für Geräte/Links gesamt sowie aufgeschlüsselt nach Gerätetyp, Bundesland und Technologie."""
+
+    def __init__(self):
+        self.totals = Counter()
+        self.by_type = defaultdict(Counter)
+        self.by_region = defaultdict(Counter)
+        self.by_technology = defaultdict(Counter)
+
+    def rebuild(self, graph: nx.DiGraph):
+        self.__init__()
+        for node_id, node in graph.nodes(data=True):
+            self._count_device(node, +1)
+        for source, target, edge in graph.edges(data=True):
+            self._count_link(edge, device_region(graph.nodes[source]), +1)
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        """
+        Der Graph ist bereits gepatcht: der alte Beitrag wird aus dem aktuellen Objekt mit dem
+        alten Feldwert rekonstruiert, abgezogen und durch den neuen Beitrag ersetzt.
+        """
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        for record in records:
+            if record.kind == 'device' and graph.has_node(record.object_id):
+                node = graph.nodes[record.object_id]
+                self._count_device({**node, record.field: record.old}, -1)
+                self._count_device(node, +1)
+            elif record.kind == 'link' and record.object_id in link_endpoints:
+                source, target = link_endpoints[record.object_id]
+                edge = graph.edges[source, target]
+                region = device_region(graph.nodes[source])
+                self._count_link({**edge, record.field: record.old}, region, -1)
+                self._count_link(edge, region, +1)
+
+    def snapshot(self) -> dict:
+        """HUD-Statistik im bisherigen Format plus Aufschlüsselungen."""
+        devices_with_issue = self.totals['devices_total'] - self.totals['devices_online']
+        return {
+            "devices_total": self.totals['devices_total'],
+            "devices_online": self.totals['devices_online'],
+            "links_total": self.totals['links_total'],
+            "links_up": self.totals['links_up'],
+            "alarms": devices_with_issue + self.totals['links_with_issue'],
+            "by_type": {key: dict(counter) for key, counter in self.by_type.items() if counter['devices_total']},
+            "by_region": {key: dict(counter) for key, counter in self.by_region.items() if counter['devices_total'] or counter['links_total']},
+            "by_technology": {key: dict(counter) for key, counter in self.by_technology.items() if counter['links_total']}
+        }
+
+    def _count_device(self, node: dict, sign: int):
+        online = node.get('status') == 'online'
+        for counter in (self.totals, self.by_type[node.get('type')], self.by_region[device_region(node)]):
+            counter['devices_total'] += sign
+            counter['devices_online'] += sign * online
+
+    def _count_link(self, edge: dict, region: str, sign: int):
+        status = edge.get('status')
+        up = status == 'up'
+        with_issue = status not in ('up', 'blocking')
+        for counter in (self.totals, self.by_region[region], self.by_technology[link_technology(edge)]):
+            counter['links_total'] += sign
+            counter['links_up'] += sign * up
+            counter['links_with_issue'] += sign * with_issue
@@ -0,0 +1,282 @@
+#
+# UNOC - message_bus.py
+#
+# Publish/Subscribe zwischen mehreren Backend-Workern. Jeder Worker hält seinen eigenen In-Memory-
+# Graphen; Änderungen werden in die Datenbank geschrieben und als Nachricht über den Bus verteilt,
+# damit die anderen Worker Graph, Indizes, Caches, Historie und WebSocket-Clients nachziehen.
+#   - memory://             In-Process-Bus (ein Worker, Standard)
+#   - redis://host:port/0   Redis-kompatibler Bus (RESP PUBLISH/SUBSCRIBE, ohne redis-Paket)
+#   - rediss://host:port/0  wie redis://, über TLS (Zertifikat und Hostname werden geprüft)
+# Für lokale Tests ohne Redis gibt es einen minimalen Stand-in-Server:
+#   python message_bus.py serve --port 6379
+#
+
+import argparse
+import datetime
+import json
+import socket
+import socketserver
+import ssl
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+Handler = Callable[[dict], None]
+RECONNECT_DELAY_S = 1.0
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+class InProcessBus:
+    """Stellt Nachrichten synchron an alle Abonnenten im selben Prozess zu."""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: dict):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, ()))
+        for handler in handlers:
+            handler(message)
+
+    def subscribe(self, channel: str, handler: Handler):
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(handler)
+
+    def close(self):
+        with self._lock:
+            self._handlers = {}
+
+
+# --- RESP (Redis Serialization Protocol) ---
+def _encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by message bus server.")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest.decode()
+    if prefix == b"-":
+        raise RuntimeError(f"Message bus error: {rest.decode()}")
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        count = int(rest)
+        return None if count < 0 else [_read_reply(reader) for _ in range(count)]
+    raise RuntimeError(f"Unexpected reply from message bus server: {line!r}")
+
+
+class RedisBus:
+    """
+    Redis-kompatibler Bus: eine Verbindung zum Publizieren, eine zweite in einem Hintergrund-Thread
+    für SUBSCRIBE. Nach Verbindungsabbrüchen wird neu verbunden und erneut abonniert.
+    rediss:// verbindet beide über TLS mit dem Standard-SSL-Kontext des Systems.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.ssl_context = ssl.create_default_context() if parsed.scheme == "rediss" else None
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._subscribe_conn = None
+        self._subscribe_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._listen, name="unoc-bus", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=5)
+        if self.ssl_context is not None:
+            try:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+            except OSError:  # auch ssl.SSLError
+                sock.close()
+                raise
+        sock.settimeout(None)
+        reader = sock.makefile("rb")
+        if self.password:
+            sock.sendall(_encode_command("AUTH", self.password))
+            _read_reply(reader)
+        return sock, reader
+
+    def publish(self, channel: str, message: dict):
+        payload = encode_message(message)
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None:
+                        self._publish_conn = self._connect()
+                    sock, reader = self._publish_conn
+                    sock.sendall(_encode_command("PUBLISH", channel, payload))
+                    _read_reply(reader)
+                    return
+                except (OSError, ConnectionError):
+                    self._publish_conn = None
+                    if attempt:
+                        raise
+
+    def subscribe(self, channel: str, handler: Handler):
+        with self._subscribe_lock:
+            new_channel = channel not in self._handlers
+            self._handlers.setdefault(channel, []).append(handler)
+            if new_channel and self._subscribe_conn is not None:
+                try:
+                    self._subscribe_conn[0].sendall(_encode_command("SUBSCRIBE", channel))
+                except OSError:
+                    pass  # der Listener abonniert nach dem Reconnect alle Kanäle erneut
+
+    def _listen(self):
+        while not self._closed:
+            try:
+                sock, reader = self._connect()
+                with self._subscribe_lock:
+                    self._subscribe_conn = (sock, reader)
+                    if self._handlers:
+                        sock.sendall(_encode_command("SUBSCRIBE", *self._handlers))
+                while not self._closed:
+                    reply = _read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        channel = reply[1].decode()
+                        message = json.loads(reply[2])
+                        for handler in list(self._handlers.get(channel, ())):
+                            try:
+                                handler(message)
+                            except Exception as e:  # ein fehlerhafter Handler darf den Listener nicht beenden
+                                print(f"WARN: Fehler beim Verarbeiten einer Bus-Nachricht auf '{channel}': {e}")
+            except (OSError, ConnectionError) as e:
+                if self._closed:
+                    return
+                print(f"WARN: Verbindung zum Message-Bus {self.host}:{self.port} unterbrochen ({e}), neuer Versuch in {RECONNECT_DELAY_S:.0f} s.")
+                with self._subscribe_lock:
+                    self._subscribe_conn = None
+                time.sleep(RECONNECT_DELAY_S)
+
+    def close(self):
+        self._closed = True
+        for conn in (self._publish_conn, self._subscribe_conn):
+            if conn is not None:
+                try:
+                    conn[0].close()
+                except OSError:
+                    pass
+
+
+def create_bus(url: Optional[str]):
+    """memory:// (oder leer) -> InProcessBus, redis://... bzw. rediss://... (TLS) -> RedisBus."""
+    if not url or url.startswith("memory://"):
+        return InProcessBus()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBus(url)
+    raise ValueError(f"Unsupported message bus URL '{url}'.")
+
+
+# --- Lokaler Stand-in-Server (nur PUBLISH/SUBSCRIBE) ---
+def _subscription_reply(kind: str, channel: str, count: int) -> bytes:
+    """[kind, channel, count] - das dritte Element ist bei Redis eine Zahl, kein Bulk-String."""
+    return _encode_command(kind, channel).replace(b"*2\r\n", b"*3\r\n", 1) + f":{count}\r\n".encode()
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        subscribed = set()
+        try:
+            while True:
+                command = _read_reply(self.rfile)
+                if not isinstance(command, list) or not command:
+                    continue
+                name, args = command[0].decode().upper(), command[1:]
+                if name == "PUBLISH":
+                    channel, data = args[0].decode(), args[1]
+                    with server.lock:
+                        receivers = [h for h, channels in server.subscribers.items() if channel in channels]
+                    for handler in receivers:
+                        handler.send(_encode_command("message", channel, data))
+                    self.send(f":{len(receivers)}\r\n".encode())
+                elif name == "SUBSCRIBE":
+                    for channel in (a.decode() for a in args):
+                        subscribed.add(channel)
+                        with server.lock:
+                            server.subscribers[self] = subscribed
+                        self.send(_subscription_reply("subscribe", channel, len(subscribed)))
+                elif name == "UNSUBSCRIBE":
+                    for channel in [a.decode() for a in args] if args else list(subscribed):
+                        subscribed.discard(channel)
+                        self.send(_subscription_reply("unsubscribe", channel, len(subscribed)))
+                elif name == "PING":
+                    self.send(b"+PONG\r\n")
+                elif name in ("AUTH", "SELECT", "CLIENT"):
+                    self.send(b"+OK\r\n")
+                elif name == "QUIT":
+                    self.send(b"+OK\r\n")
+                    return
+                else:
+                    self.send(f"-ERR unknown command '{name}'\r\n".encode())
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with server.lock:
+                server.subscribers.pop(self, None)
+
+    def send(self, data: bytes):
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    """Minimaler Redis-kompatibler Pub/Sub-Server für Entwicklung und Tests mit mehreren Workern."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379):
+        super().__init__((host, port), _StandInHandler)
+        self.subscribers: Dict[_StandInHandler, set] = {}
+        self.lock = threading.Lock()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Lokaler Redis-kompatibler Pub/Sub-Stand-in für den UNOC-Message-Bus.")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args(argv)
+    with StandInServer(args.host, args.port) as server:
+        print(f"Message-Bus-Stand-in lauscht auf {args.host}:{args.port} (UNOC_BUS_URL=redis://{args.host}:{args.port}/0).")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#
+# UNOC - optical_budget.py
+#
+# Vektorisierte Berechnung des optischen Leistungsbudgets für alle Endgeräte in einem Durchlauf.
+# Statt pro ONT eine Pfadsuche zu machen, werden die Verluste pro Kante als NumPy-Vektoren
+# entlang des Head-End-Baums aus dem PathIndex ebenenweise aufsummiert.
+# BudgetEngine hält die Verlustvektoren pro Link (Faserlänge, Stecker, Spleiße) und die Präfixsummen
+# in DFS-Reihenfolge im Speicher: ändert sich length_km, connector_count oder splice_count eines
+# Links, wird nur der Teilbaum darunter nachgeführt (ein zusammenhängender Slice). Aus den Summen
+# entstehen mit einer Matrixmultiplikation die Dämpfungen aller vier Wellenlängen und damit die
+# Reserven downstream (1490/1577 nm, am Endgerät) und upstream (1310/1270 nm, am Head-End).
+#
+
+from typing import Callable, Dict, Iterable, List, Optional
+
+import networkx as nx
+import numpy as np
+
+from commands import ChangeRecord
+
+# --- Physikalische Konstanten ---
+FIBER_LOSS_PER_KM = {
+    '1310nm': 0.35,
+    '1490nm': 0.40,
+    '1270nm': 0.35,
+    '1577nm': 0.25
+}
+CONNECTOR_LOSS_DB = 0.5
+SPLICE_LOSS_DB = 0.1
+MAINTENANCE_MARGIN_DB = 3.0
+DEFAULT_SENSITIVITY_DBM = -30.0
+DOWNSTREAM_WAVELENGTHS = ('1490nm', '1577nm')
+UPSTREAM_WAVELENGTHS = ('1310nm', '1270nm')
+WAVELENGTHS = DOWNSTREAM_WAVELENGTHS + UPSTREAM_WAVELENGTHS
+# Upstream: Sendeleistung des Endgeräts und Empfindlichkeit des Head-Ends (Properties
+# upstream_transmit_power_dbm bzw. upstream_sensitivity_dbm überschreiben)
+DEFAULT_UPSTREAM_TRANSMIT_DBM = {'1310nm': 2.0, '1270nm': 4.0}
+DEFAULT_UPSTREAM_SENSITIVITY_DBM = {'1310nm': -32.0, '1270nm': -29.5}
+# Budget-relevante Properties; nur ihre Änderung verschiebt die Präfixsummen bzw. Geräteparameter
+BUDGET_LINK_PROPERTIES = ('length_km', 'connector_count', 'splice_count', 'link_technology')
+BUDGET_DEVICE_PROPERTIES = ('insertion_loss_db', 'transmit_power_dbm', 'sensitivity_min_dbm', 'technology',
+                            'upstream_transmit_power_dbm', 'upstream_sensitivity_dbm')
+
+# Spalten der kumulierten Verlustmatrix
+_FIBER_KM, _CONNECTORS, _SPLICES, _SPLITTER_DB, _PTP_LINKS = range(5)
+
+
+def downstream_wavelength(technology: str) -> str:
+    """GPON sendet downstream auf 1490 nm, XGS-PON auf 1577 nm."""
+    return '1490nm' if technology == 'GPON' else '1577nm'
+
+
+def upstream_wavelength(technology: str) -> str:
+    """GPON sendet upstream auf 1310 nm, XGS-PON auf 1270 nm."""
+    return '1310nm' if technology == 'GPON' else '1270nm'
+
+
+def fiber_length_km(edge: dict, derived_lengths: Optional[Dict[str, float]] = None, prefer_derived: bool = False) -> float:
+    """
+    Faserlänge eines Links: das gepflegte length_km, sonst die aus der Geometrie abgeleitete Länge
+    (geo_index.GeoIndex). Mit prefer_derived hat die abgeleitete Länge Vorrang.
+    """
+    props = edge.get('properties') or {}
+    derived = derived_lengths.get(edge.get('link_id_str')) if derived_lengths else None
+    if derived is not None and (prefer_derived or props.get("length_km") is None):
+        return derived
+    return props.get("length_km", 0)
+
+
+def budget_changed(record: ChangeRecord) -> bool:
+    """Ändert der Record Link- oder Geräte-Properties, die ins Budget eingehen?"""
+    if record.field != 'properties':
+        return False
+    keys = BUDGET_LINK_PROPERTIES if record.kind == 'link' else BUDGET_DEVICE_PROPERTIES
+    old, new = record.old or {}, record.new or {}
+    return any(old.get(key) != new.get(key) for key in keys)
+
+
+def _no_path() -> dict:
+    return {"error": "No path from any head-end found", "status": "NO_PATH", "power_dbm": None, "budget": {}}
+
+
+def _loss_matrix() -> np.ndarray:
+    """Abbildung der summierten Größen (km, Stecker, Spleiße, Splitter-dB) auf die Dämpfung je Wellenlänge."""
+    matrix = np.zeros((5, len(WAVELENGTHS)))
+    matrix[_FIBER_KM] = [FIBER_LOSS_PER_KM[wavelength] for wavelength in WAVELENGTHS]
+    matrix[_CONNECTORS] = CONNECTOR_LOSS_DB
+    matrix[_SPLICES] = SPLICE_LOSS_DB
+    matrix[_SPLITTER_DB] = 1.0
+    return matrix
+
+
+class BudgetEngine:
+    """
+    Cache für das optische Budget aller Endgeräte. Verlustvektoren pro Link und Geräteparameter werden
+    beim ersten Zugriff aus dem Graphen gelesen, die Präfixsummen entlang des Head-End-Baums beim ersten
+    Bulk-Zugriff nach einer Statusänderung. derived_lengths liefert die abgeleiteten Linklängen (oder None).
+    """
+
+    def __init__(self, end_device_types: Iterable[str], derived_lengths: Callable[[], Optional[Dict[str, float]]] = lambda: None,
+                 prefer_derived: bool = False):
+        self.end_device_types = set(end_device_types)
+        self.derived_lengths = derived_lengths
+        self.prefer_derived = prefer_derived
+        self.loss_matrix = _loss_matrix()
+        self.link_vectors: Optional[np.ndarray] = None
+        self.cumulative: Optional[np.ndarray] = None
+
+    # --- Aufbau ---
+    def rebuild(self, graph: nx.DiGraph):
+        """Verwirft alle Caches; sie werden bei der nächsten Abfrage neu aufgebaut."""
+        self.link_vectors = None
+        self.cumulative = None
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        """
+        Statusänderungen verwerfen nur die Präfixsummen (der Baum ändert sich). Geänderte Linkparameter
+        und Splitter-Dämpfungen verschieben die Summen ihres Teilbaums um die Differenz.
+        """
+        if self.link_vectors is None:
+            return
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        for record in records:
+            if record.field == 'status':
+                self.cumulative = None
+            elif record.kind == 'device' and record.field == 'coordinates':
+                # Abgeleitete Linklängen hängen an den Koordinaten
+                self.link_vectors = None
+                self.cumulative = None
+                return
+            elif not budget_changed(record):
+                continue  # z.B. nur utilization geändert
+            elif record.kind == 'link' and record.object_id in self.link_index:
+                i = self.link_index[record.object_id]
+                old = self.link_vectors[i].copy()
+                self.link_vectors[i] = self._link_vector(graph.edges[link_endpoints[record.object_id]])
+                position = self.position.get(link_endpoints[record.object_id][1]) if self.cumulative is not None else None
+                if position is not None and self.tree_links[position] == i:
+                    self.cumulative[position:self.subtree_end[position]] += self.link_vectors[i] - old
+            elif record.kind == 'device' and record.object_id in self.node_index:
+                i = self.node_index[record.object_id]
+                old = self.splitter_db[i]
+                self._set_node(i, graph.nodes[record.object_id])
+                position = self.position.get(record.object_id) if self.cumulative is not None else None
+                if position is not None:
+                    self.cumulative[position:self.subtree_end[position], _SPLITTER_DB] += self.splitter_db[i] - old
+
+    # --- Abfragen ---
+    def results(self, graph: nx.DiGraph, tree: Dict[str, dict], device_ids: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Budget aller Endgeräte (oder nur device_ids) aus den Präfixsummen."""
+        self._ensure_links(graph)
+        if self.cumulative is None:
+            self._build_tree(tree)
+        if device_ids is None:
+            targets = [node_id for node_id, data in graph.nodes(data=True) if data.get('type') in self.end_device_types]
+        else:
+            targets = [node_id for node_id in device_ids if graph.has_node(node_id) and graph.nodes[node_id].get('type') in self.end_device_types]
+        results = {node_id: _no_path() for node_id in targets if node_id not in self.position}
+        reachable = [node_id for node_id in targets if node_id in self.position]
+        if reachable:
+            rows = np.array([self.position[node_id] for node_id in reachable], dtype=np.int64)
+            results.update(self._finalize(reachable, self.cumulative[rows], [tree["root"][node_id] for node_id in reachable]))
+        return results
+
+    def result(self, graph: nx.DiGraph, tree: Dict[str, dict], device_id: str) -> dict:
+        """
+        Budget eines Endgeräts: aus den Präfixsummen, solange sie gültig sind, sonst über die Parent-Kette
+        (Aufwand proportional zur Pfadlänge, ohne die Summen für alle neu aufzubauen).
+        """
+        self._ensure_links(graph)
+        if device_id not in tree["parent"]:
+            return _no_path()
+        if self.cumulative is not None:
+            return self.results(graph, tree, [device_id])[device_id]
+        sums = np.zeros(5)
+        node_id = device_id
+        while node_id is not None:
+            i = self.node_index[node_id]
+            sums[_SPLITTER_DB] += self.splitter_db[i]
+            parent_id = tree["parent"][node_id]
+            if parent_id is not None:
+                sums += self.link_vectors[self.edge_links[parent_id, node_id]]
+            node_id = parent_id
+        return self._finalize([device_id], sums[np.newaxis], [tree["root"][device_id]])[device_id]
+
+    # --- Interna ---
+    def _ensure_links(self, graph: nx.DiGraph):
+        if self.link_vectors is not None:
+            return
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        self._derived = self.derived_lengths()
+        self.link_index = {link_id: i for i, link_id in enumerate(link_endpoints)}
+        self.edge_links = {endpoints: i for i, endpoints in enumerate(link_endpoints.values())}
+        self.link_vectors = np.array([self._link_values(graph.edges[endpoints]) for endpoints in link_endpoints.values()], dtype=float).reshape(-1, 5)
+        self.node_ids = list(graph.nodes)
+        self.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        values = np.array([self._node_values(graph.nodes[node_id]) for node_id in self.node_ids], dtype=float).reshape(-1, 8)
+        self.splitter_db, self.transmit_power, self.sensitivity = values[:, 0].copy(), values[:, 1].copy(), values[:, 2].copy()
+        self.upstream_transmit, self.upstream_sensitivity = values[:, 3:5].copy(), values[:, 5:7].copy()
+        self.is_gpon = values[:, 7] > 0
+        self.cumulative = None
+
+    def _link_values(self, edge: dict) -> tuple:
+        """Verlustvektor eines Links in der Spaltenreihenfolge _FIBER_KM, _CONNECTORS, _SPLICES, _SPLITTER_DB, _PTP_LINKS."""
+        props = edge.get('properties') or {}
+        return (fiber_length_km(edge, self._derived, self.prefer_derived), props.get("connector_count", 0), props.get("splice_count", 0),
+                0.0, props.get("link_technology") == "PtP")
+
+    def _link_vector(self, edge: dict) -> np.ndarray:
+        return np.array(self._link_values(edge), dtype=float)
+
+    def _node_values(self, node: dict) -> tuple:
+        props = node.get('properties') or {}
+        return (
+            float(props.get("insertion_loss_db", 0.0)) if node.get('type') == 'Splitter' else 0.0,
+            float(props.get("transmit_power_dbm", 0.0)),
+            float(props.get("sensitivity_min_dbm", DEFAULT_SENSITIVITY_DBM)),
+            *(float(props.get("upstream_transmit_power_dbm", DEFAULT_UPSTREAM_TRANSMIT_DBM[w])) for w in UPSTREAM_WAVELENGTHS),
+            *(float(props.get("upstream_sensitivity_dbm", DEFAULT_UPSTREAM_SENSITIVITY_DBM[w])) for w in UPSTREAM_WAVELENGTHS),
+            props.get("technology", "GPON") == "GPON",
+        )
+
+    def _set_node(self, i: int, node: dict):
+        values = self._node_values(node)
+        self.splitter_db[i], self.transmit_power[i], self.sensitivity[i] = values[:3]
+        self.upstream_transmit[i], self.upstream_sensitivity[i] = values[3:5], values[5:7]
+        self.is_gpon[i] = values[7]
+
+    def _build_tree(self, tree: Dict[str, dict]):
+        """Präfixsummen in DFS-Reihenfolge: jeder Teilbaum ist ein zusammenhängender Bereich [position, subtree_end)."""
+        parent = tree["parent"]
+        children: Dict[str, List[str]] = {}
+        roots = []
+        for node_id, parent_id in parent.items():
+            if parent_id is None:
+                roots.append(node_id)
+            else:
+                children.setdefault(parent_id, []).append(node_id)
+        order: List[str] = []
+        stack = roots[::-1]
+        while stack:
+            node_id = stack.pop()
+            order.append(node_id)
+            stack.extend(reversed(children.get(node_id, ())))
+        self.position = position = {node_id: i for i, node_id in enumerate(order)}
+
+        n = len(order)
+        node_rows = np.array([self.node_index[node_id] for node_id in order], dtype=np.int64)
+        parent_pos = np.array([position[parent[node_id]] if parent[node_id] is not None else -1 for node_id in order], dtype=np.int64)
+        self.tree_links = np.array([self.edge_links[parent[node_id], node_id] if parent[node_id] is not None else -1 for node_id in order], dtype=np.int64)
+        depth = np.array([tree["depth"][node_id] for node_id in order], dtype=np.int64)
+        cumulative = np.zeros((n, 5))
+        has_link = self.tree_links >= 0
+        cumulative[has_link] = self.link_vectors[self.tree_links[has_link]]
+        if n:
+            cumulative[:, _SPLITTER_DB] += self.splitter_db[node_rows]
+        # Ebenenweise Präfixsummen entlang des Baums (eine Vektoroperation pro Tiefe),
+        # Teilbaumgrößen in umgekehrter Richtung
+        levels = [np.nonzero(depth == level)[0] for level in range(int(depth.max()) + 1 if n else 0)]
+        for level_nodes in levels[1:]:
+            cumulative[level_nodes] += cumulative[parent_pos[level_nodes]]
+        sizes = np.ones(n, dtype=np.int64)
+        for level_nodes in reversed(levels[1:]):
+            sizes += np.bincount(parent_pos[level_nodes], weights=sizes[level_nodes], minlength=n).astype(np.int64)
+        self.subtree_end = np.arange(n, dtype=np.int64) + sizes
+        self.cumulative = cumulative
+
+    def _finalize(self, reachable: List[str], sums: np.ndarray, roots: List[str]) -> Dict[str, dict]:
+        """Ergebnisse für Endgeräte mit Pfad; sums sind ihre Präfixsummen (Zeilen wie reachable)."""
+        results = {}
+        devices = np.array([self.node_index[node_id] for node_id in reachable], dtype=np.int64)
+        heads = np.array([self.node_index[node_id] for node_id in roots], dtype=np.int64)
+        is_ptp_path = sums[:, _PTP_LINKS] > 0
+        effective = sums.copy()
+        effective[is_ptp_path, _SPLITTER_DB] = 0.0
+        # Dämpfung aller Wellenlängen in einer Matrixmultiplikation (Spalten wie WAVELENGTHS)
+        losses = effective @ self.loss_matrix + MAINTENANCE_MARGIN_DB
+        transmit_power = self.transmit_power[heads]
+        downstream_margins = transmit_power[:, np.newaxis] - losses[:, :len(DOWNSTREAM_WAVELENGTHS)] - self.sensitivity[devices][:, np.newaxis]
+        upstream_received = self.upstream_transmit[devices] - losses[:, len(DOWNSTREAM_WAVELENGTHS):]
+        upstream_margins = upstream_received - self.upstream_sensitivity[heads]
+        margins = np.hstack([downstream_margins, upstream_margins])
+
+        # Eigene Wellenlängen des Endgeräts: GPON 1490/1310 nm, sonst (XGS-PON) 1577/1270 nm
+        own = np.where(self.is_gpon[devices], 0, 1)
+        rows = np.arange(len(reachable))
+        fiber_loss = sums[:, _FIBER_KM] * self.loss_matrix[_FIBER_KM, own]
+        splitter_loss = effective[:, _SPLITTER_DB]
+        connector_loss = sums[:, _CONNECTORS] * CONNECTOR_LOSS_DB
+        splice_loss = sums[:, _SPLICES] * SPLICE_LOSS_DB
+        total_loss = fiber_loss + splitter_loss + connector_loss + splice_loss + MAINTENANCE_MARGIN_DB
+        received_power = transmit_power - total_loss
+        is_online = (received_power >= self.sensitivity[devices]).tolist()
+        upstream_power = upstream_received[rows, own]
+        upstream_online = (upstream_margins[rows, own] >= 0).tolist()
+        is_ptp_path, own = is_ptp_path.tolist(), own.tolist()
+
+        # Einmal in Python-Floats umwandeln (bisherige Felder mit round wie in der Einzelabfrage), dann nur noch Dicts zusammensetzen
+        columns = [[round(value, 2) for value in row] for row in np.column_stack([received_power, transmit_power, fiber_loss, splitter_loss,
+                                                                                   connector_loss, splice_loss, total_loss]).tolist()]
+        upstream_columns = np.round(np.column_stack([upstream_power, margins]), 2).tolist()
+        wavelength_pairs = [{"downstream": down, "upstream": up} for down, up in zip(DOWNSTREAM_WAVELENGTHS, UPSTREAM_WAVELENGTHS)]
+        for i, node_id in enumerate(reachable):
+            power, transmit, fiber, splitter, connector, splice, total = columns[i]
+            upstream, *margin_values = upstream_columns[i]
+            results[node_id] = {
+                "status": "online" if is_online[i] else "LOS",
+                "power_dbm": power,
+                "budget": {
+                    "Transmit Power": transmit,
+                    "Fiber Loss": fiber,
+                    "Splitter Loss": splitter,
+                    "Connector Loss": connector,
+                    "Splice Loss": splice,
+                    "Maintenance Margin": MAINTENANCE_MARGIN_DB
+                },
+                "total_loss": total,
+                "path_technology": "PtP" if is_ptp_path[i] else "PON",
+                "head_end": roots[i],
+                "wavelengths": wavelength_pairs[own[i]],
+                "upstream": {"status": "online" if upstream_online[i] else "LOS", "power_dbm": upstream},
+                "margins_db": dict(zip(WAVELENGTHS, margin_values)),
+            }
+        return results
+
+
+def compute_bulk_budget(graph: nx.DiGraph, tree: Dict[str, List], end_device_types: Iterable[str], device_ids: Optional[Iterable[str]] = None,
+                        derived_lengths: Optional[Dict[str, float]] = None, prefer_derived: bool = False) -> Dict[str, dict]:
+    """
+    Berechnet Empfangsleistung, Budget-Aufschlüsselung und LOS-Status für alle Endgeräte
+    (oder nur für device_ids) mit demselben Ergebnisformat wie die Einzelabfrage, ohne Cache.
+    tree ist der Head-End-Baum aus PathIndex.tree(); derived_lengths siehe fiber_length_km.
+    """
+    engine = BudgetEngine(end_device_types, lambda: derived_lengths, prefer_derived)
+    engine.rebuild(graph)
+    return engine.results(graph, tree, device_ids)
@@ -3,6 +3,8 @@
 #
 # Ein Entwickler-Skript, um gezielt einen physikalischen Parameter
 # in der Datenbank zu ändern und einen Fehlerfall (hohe Dämpfung) zu simulieren.
+# Bei laufendem Backend stattdessen POST /api/links/<id>/properties verwenden: das Skript schreibt
+# nur in die Datenbank, der In-Memory-Graph sieht die Änderung erst nach einem Neuaufbau.
 #
 
 from database import SessionLocal, Link
@@ -0,0 +1,184 @@
+#
+# UNOC - path_index.py
+#
+# Vorberechneter Index Head-End -> Teilnehmer. Eine Multi-Source-BFS von allen Head-Ends
+# liefert für jeden erreichbaren Knoten den versorgenden Head-End, den Parent und die Tiefe.
+# Versorgend ist das Head-End mit den wenigsten Hops (bei Gleichstand das zuerst erreichte), nicht
+# das erste Head-End in Knotenreihenfolge, das überhaupt einen Pfad hat.
+# Statusänderungen invalidieren nur die betroffenen Teilbäume, die danach lokal repariert werden.
+#
+
+import heapq
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+import networkx as nx
+
+from commands import ChangeRecord
+
+# Links in diesen Zuständen leiten kein Signal weiter (RPL-Links im Ring sind 'blocking')
+NON_FORWARDING_LINK_STATUSES = ('down', 'blocking')
+NON_FORWARDING_DEVICE_STATUSES = ('offline',)
+
+
+class PathIndex:
+    """Hält den Head-End-Baum über alle aktiven (weiterleitenden) Links und Geräte."""
+
+    def __init__(self, head_end_types: Iterable[str]):
+        self.head_end_types = set(head_end_types)
+        self.parent: Dict[str, Optional[str]] = {}
+        self.root: Dict[str, str] = {}
+        self.depth: Dict[str, int] = {}
+        self.children: Dict[str, Set[str]] = {}
+
+    # --- Aufbau ---
+    def rebuild(self, graph: nx.DiGraph):
+        """Vollständiger Aufbau per Multi-Source-BFS (beim Start und nach dem Laden eines Snapshots)."""
+        self.parent, self.root, self.depth, self.children = {}, {}, {}, {}
+        queue = deque()
+        for node_id in graph.nodes:
+            if self._is_head_end(graph, node_id):
+                self._attach(node_id, None, 0)
+                queue.append(node_id)
+        while queue:
+            node_id = queue.popleft()
+            for successor in graph.successors(node_id):
+                if successor not in self.depth and self._forwards(graph, node_id, successor):
+                    self._attach(successor, node_id, self.depth[node_id] + 1)
+                    queue.append(successor)
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        """
+        Aktualisiert den Index nach Statusänderungen. Weggefallene Kanten/Knoten lösen nur
+        ihren Teilbaum, neu aktive lösen eine lokale Relaxierung aus; der Rest bleibt unberührt.
+        """
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        detached: Set[str] = set()
+        seeds: Set[str] = set()
+        for record in records:
+            if record.field != 'status':
+                continue
+            if record.kind == 'link':
+                endpoints = link_endpoints.get(record.object_id)
+                if not endpoints:
+                    continue
+                source, target = endpoints
+                was_forwarding = record.old not in NON_FORWARDING_LINK_STATUSES
+                is_forwarding = record.new not in NON_FORWARDING_LINK_STATUSES
+                if was_forwarding and not is_forwarding and self.parent.get(target) == source:
+                    detached |= self._detach_subtree(target)
+                elif is_forwarding and not was_forwarding:
+                    seeds.add(source)
+            elif record.kind == 'device':
+                if not graph.has_node(record.object_id):
+                    continue
+                was_forwarding = record.old not in NON_FORWARDING_DEVICE_STATUSES
+                is_forwarding = record.new not in NON_FORWARDING_DEVICE_STATUSES
+                if was_forwarding and not is_forwarding and record.object_id in self.depth:
+                    detached |= self._detach_subtree(record.object_id)
+                elif is_forwarding and not was_forwarding:
+                    if self._is_head_end(graph, record.object_id):
+                        self._attach(record.object_id, None, 0)
+                        seeds.add(record.object_id)
+                    else:
+                        seeds.update(graph.predecessors(record.object_id))
+
+        # Gelöste Knoten können über andere, noch versorgte Vorgänger wieder angebunden werden
+        for node_id in detached:
+            if graph.has_node(node_id):
+                if self._is_head_end(graph, node_id):
+                    self._attach(node_id, None, 0)
+                    seeds.add(node_id)
+                else:
+                    seeds.update(p for p in graph.predecessors(node_id) if p not in detached)
+        self._relax(graph, seeds)
+
+    # --- Abfragen ---
+    def serving_head_end(self, node_id: str) -> Optional[str]:
+        return self.root.get(node_id)
+
+    def path_to(self, node_id: str) -> Optional[List[str]]:
+        """Pfad vom versorgenden Head-End zum Knoten über die gespeicherte Parent-Kette."""
+        if node_id not in self.depth:
+            return None
+        path = [node_id]
+        while self.parent[path[-1]] is not None:
+            path.append(self.parent[path[-1]])
+        path.reverse()
+        return path
+
+    def subtree(self, node_id: str) -> Set[str]:
+        """Alle Knoten, die über node_id versorgt werden (inkl. node_id)."""
+        if node_id not in self.depth:
+            return set()
+        nodes, stack = set(), [node_id]
+        while stack:
+            current = stack.pop()
+            nodes.add(current)
+            stack.extend(self.children.get(current, ()))
+        return nodes
+
+    def end_devices_below(self, graph: nx.DiGraph, node_id: str, end_device_types: Iterable[str]) -> List[str]:
+        end_device_types = set(end_device_types)
+        return [n for n in self.subtree(node_id) if graph.nodes[n].get('type') in end_device_types]
+
+    def tree(self) -> Dict[str, dict]:
+        """Baum im Format, das optical_budget (BudgetEngine) erwartet."""
+        return {"order": list(self.depth), "parent": self.parent, "root": self.root, "depth": self.depth}
+
+    def diff(self, other: 'PathIndex') -> List[str]:
+        """Vergleicht Erreichbarkeit und Tiefen (Parents dürfen sich bei gleich langen Pfaden unterscheiden)."""
+        differences = []
+        for node_id in sorted(set(self.depth) ^ set(other.depth)):
+            differences.append(f"path index: node '{node_id}' reachable in only one index")
+        for node_id in sorted(set(self.depth) & set(other.depth)):
+            if self.depth[node_id] != other.depth[node_id]:
+                differences.append(f"path index: depth of '{node_id}' differs: {self.depth[node_id]} != {other.depth[node_id]}")
+        return differences
+
+    # --- Interna ---
+    def _is_head_end(self, graph: nx.DiGraph, node_id: str) -> bool:
+        node = graph.nodes[node_id]
+        return node.get('type') in self.head_end_types and node.get('status') not in NON_FORWARDING_DEVICE_STATUSES
+
+    def _forwards(self, graph: nx.DiGraph, source: str, target: str) -> bool:
+        return (
+            graph.edges[source, target].get('status') not in NON_FORWARDING_LINK_STATUSES
+            and graph.nodes[target].get('status') not in NON_FORWARDING_DEVICE_STATUSES
+        )
+
+    def _attach(self, node_id: str, parent_id: Optional[str], depth: int):
+        old_parent = self.parent.get(node_id)
+        if old_parent is not None:
+            self.children[old_parent].discard(node_id)
+        self.parent[node_id] = parent_id
+        self.depth[node_id] = depth
+        self.root[node_id] = node_id if parent_id is None else self.root[parent_id]
+        self.children.setdefault(node_id, set())
+        if parent_id is not None:
+            self.children[parent_id].add(node_id)
+
+    def _detach_subtree(self, node_id: str) -> Set[str]:
+        nodes = self.subtree(node_id)
+        parent_id = self.parent.get(node_id)
+        if parent_id is not None and parent_id not in nodes:
+            self.children[parent_id].discard(node_id)
+        for n in nodes:
+            del self.parent[n], self.root[n], self.depth[n]
+            self.children.pop(n, None)
+        return nodes
+
+    def _relax(self, graph: nx.DiGraph, seeds: Iterable[str]):
+        """BFS-Relaxierung nach Tiefe geordnet, ausgehend von bereits versorgten Knoten."""
+        heap = [(self.depth[s], s) for s in seeds if s in self.depth]
+        heapq.heapify(heap)
+        while heap:
+            depth, node_id = heapq.heappop(heap)
+            if self.depth.get(node_id) != depth:
+                continue  # veralteter Eintrag
+            for successor in graph.successors(node_id):
+                if not self._forwards(graph, node_id, successor):
+                    continue
+                if successor not in self.depth or depth + 1 < self.depth[successor]:
+                    self._attach(successor, node_id, depth + 1)
+                    heapq.heappush(heap, (depth + 1, successor))
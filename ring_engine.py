@@ -0,0 +1,192 @@
+#
+# UNOC - ring_engine.py
+#
+# ERPS-Ringsteuerung (G.8032, vereinfacht) über vorberechnete Indizes Link -> Ringe und
+# Knoten -> Ringe. Ein Ring gilt als gestört, solange einer seiner Links ausgefallen ('down',
+# 'degraded') oder einer seiner Knoten offline ist; dann werden alle blockierten Links des Rings
+# geöffnet. Ist der Ring wieder intakt, blockiert er genau einen Link:
+#   - revertiv:       wieder den RPL (ohne Wait-to-Restore-Timer)
+#   - nicht revertiv: den zuletzt wiederhergestellten Link; der RPL bleibt offen bis zu clear()
+# Ringlinks sind die Links zwischen aufeinanderfolgenden Knoten in ring["nodes"] plus der RPL; der
+# Schluss-Link (letzter -> erster Knoten) nur, wenn er keinem anderen Ring gehört (ein Sub-Ring ist
+# offen, zwischen seinen Interconnection-Knoten liegt ein Link des Major-Rings). Knoten mehrerer Ringe
+# zählen zu jedem dieser Ringe; ein Sub-Ring reagiert nur auf den Ausfall seiner eigenen Links. Die Engine selbst hält keinen
+# Zustand außer den Indizes: maßgeblich ist der Status im Graphen, ergänzt um die geplanten
+# Änderungen eines Commands. Alle RPL-Änderungen einer Anfrage kommen als ein Batch zurück.
+#
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+
+FAILED_LINK_STATUSES = ('down', 'degraded')
+FAILED_DEVICE_STATUSES = ('offline',)
+
+
+class RingEngine:
+    """Indizes über graph.graph['rings'] und Planung der Blockierungen je Ring."""
+
+    def __init__(self, revertive: bool = True):
+        self.revertive = revertive
+        self.rings: Dict[str, dict] = {}
+        self.link_rings: Dict[str, Tuple[str, ...]] = {}
+        self.node_rings: Dict[str, Tuple[str, ...]] = {}
+
+    # --- Aufbau ---
+    def rebuild(self, graph: nx.DiGraph):
+        """Ringlinks je Ring aus der Knotenfolge der Ringdefinition (nur beim Neuaufbau des Graphen)."""
+        self.rings, link_rings, node_rings = {}, {}, {}
+        rings = list((graph.graph.get("rings") or {}).values())
+        chains, closing, chain_owners = {}, {}, {}
+        for ring in rings:
+            nodes = [node_id for node_id in ring["nodes"] if node_id is not None and graph.has_node(node_id)]
+            links = {_link_between(graph, a, b) for a, b in zip(nodes, nodes[1:])}
+            rpl = ring.get("rpl_link_id")
+            if rpl in graph.graph.get("link_endpoints", {}):
+                links.add(rpl)
+            links.discard(None)
+            chains[ring["id"]] = (nodes, links, rpl if rpl in links else None)
+            for link_id in links:
+                chain_owners.setdefault(link_id, set()).add(ring["id"])
+            closing[ring["id"]] = _link_between(graph, nodes[-1], nodes[0]) if len(nodes) > 2 else None
+        for ring in rings:
+            nodes, links, rpl = chains[ring["id"]]
+            link_id = closing[ring["id"]]
+            if link_id is not None and not chain_owners.get(link_id, set()) - {ring["id"]}:
+                links = links | {link_id}
+            self.rings[ring["id"]] = {"id": ring["id"], "name": ring.get("name") or ring["id"], "rpl": rpl, "links": sorted(links), "nodes": sorted(set(nodes))}
+            for link_id in links:
+                link_rings.setdefault(link_id, []).append(ring["id"])
+            for node_id in set(nodes):
+                node_rings.setdefault(node_id, []).append(ring["id"])
+        self.link_rings = {link_id: tuple(ring_ids) for link_id, ring_ids in link_rings.items()}
+        self.node_rings = {node_id: tuple(ring_ids) for node_id, ring_ids in node_rings.items()}
+
+    # --- Abfragen ---
+    def rings_for(self, link_ids: Iterable[str] = (), node_ids: Iterable[str] = ()) -> List[str]:
+        ring_ids: Set[str] = set()
+        for link_id in link_ids:
+            ring_ids.update(self.link_rings.get(link_id, ()))
+        for node_id in node_ids:
+            ring_ids.update(self.node_rings.get(node_id, ()))
+        return sorted(ring_ids)
+
+    def plan(self, graph: nx.DiGraph, link_changes: Optional[Dict[str, str]] = None, device_changes: Optional[Dict[str, str]] = None,
+             ring_ids: Optional[Iterable[str]] = None) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Blockierungsänderungen {link_id: status} und Ereignistexte für die Ringe, die von den geplanten
+        Änderungen berührt werden (oder für ring_ids, z.B. alle Ringe bei der Initialisierung).
+        """
+        link_changes, device_changes = link_changes or {}, device_changes or {}
+        if ring_ids is None:
+            ring_ids = self.rings_for(link_changes, device_changes)
+        view = _StatusView(graph, link_changes, device_changes)
+        changes: Dict[str, str] = {}
+        events: List[str] = []
+        for ring_id in ring_ids:
+            ring = self.rings.get(ring_id)
+            if ring is not None:
+                self._plan_ring(ring, view, changes, events)
+        return changes, events
+
+    def clear(self, graph: nx.DiGraph, ring_id: str) -> Tuple[Dict[str, str], List[str]]:
+        """Manuelles Zurückschalten (nicht revertiver Betrieb): intakter Ring blockiert wieder den RPL."""
+        ring = self.rings[ring_id]
+        view = _StatusView(graph, {}, {})
+        if ring["rpl"] is None or self._failures(ring, view) or view.link(ring["rpl"]) == 'blocking':
+            return {}, []
+        changes = {link_id: 'up' for link_id in ring["links"] if view.link(link_id) == 'blocking'}
+        changes[ring["rpl"]] = 'blocking'
+        return changes, [f"ERPS: Clear in Ring '{ring['name']}'. RPL '{ring['rpl']}' set to BLOCKING."]
+
+    def states(self, graph: nx.DiGraph) -> List[dict]:
+        view = _StatusView(graph, {}, {})
+        result = []
+        for ring in self.rings.values():
+            failed_links, failed_nodes = self._failures(ring, view, split=True)
+            blocking = [link_id for link_id in ring["links"] if view.link(link_id) == 'blocking']
+            if failed_links or failed_nodes:
+                state = 'protection'
+            elif blocking == [ring["rpl"]]:
+                state = 'idle'
+            else:
+                state = 'pending'  # nicht revertiv wiederhergestellt, wartet auf clear
+            result.append({"id": ring["id"], "name": ring["name"], "rpl_link_id": ring["rpl"], "state": state, "revertive": self.revertive,
+                           "failed_links": failed_links, "failed_nodes": failed_nodes, "blocking": blocking,
+                           "links": len(ring["links"]), "nodes": len(ring["nodes"])})
+        return result
+
+    # --- Interna ---
+    def _failures(self, ring: dict, view: '_StatusView', split: bool = False):
+        failed_links = [link_id for link_id in ring["links"] if view.link(link_id) in FAILED_LINK_STATUSES]
+        failed_nodes = [node_id for node_id in ring["nodes"] if view.device(node_id) in FAILED_DEVICE_STATUSES]
+        return (failed_links, failed_nodes) if split else bool(failed_links or failed_nodes)
+
+    def _plan_ring(self, ring: dict, view: '_StatusView', changes: Dict[str, str], events: List[str]):
+        rpl, name = ring["rpl"], ring["name"]
+        blocking = [link_id for link_id in ring["links"] if view.link(link_id, changes) == 'blocking']
+        if self._failures(ring, view):
+            # Gestört: alle Blockierungen öffnen, damit der Ring als Kette weiter versorgt
+            for link_id in blocking:
+                changes[link_id] = 'up'
+            if blocking:
+                events.append(f"ERPS: Failover in Ring '{name}'. Unblocking {', '.join(repr(link_id) for link_id in blocking)}.")
+            return
+        if rpl is None:
+            return
+        if not blocking:
+            # Intakt und ohne Blockierung: die Schleife muss an genau einer Stelle geöffnet werden
+            recovered = [link_id for link_id in ring["links"] if link_id != rpl and view.recovered(link_id)]
+            if self.revertive or not recovered:
+                changes[rpl] = 'blocking'
+                events.append(f"ERPS: Link '{rpl}' in Ring '{name}' set to BLOCKING.")
+            else:
+                changes[recovered[-1]] = 'blocking'
+                events.append(f"ERPS: Ring '{name}' recovered (non-revertive). Link '{recovered[-1]}' set to BLOCKING, RPL '{rpl}' stays open until clear.")
+        elif self.revertive and blocking != [rpl]:
+            for link_id in blocking:
+                if link_id != rpl:
+                    changes[link_id] = 'up'
+            changes[rpl] = 'blocking'
+            events.append(f"ERPS: Ring '{name}' reverted. RPL '{rpl}' set to BLOCKING.")
+        elif len(blocking) > 1:
+            keep = rpl if rpl in blocking else blocking[0]
+            for link_id in blocking:
+                if link_id != keep:
+                    changes[link_id] = 'up'
+
+
+def _link_between(graph: nx.DiGraph, a: str, b: str) -> Optional[str]:
+    data = graph.adj[a].get(b) or graph.adj[b].get(a)
+    return data['link_id_str'] if data else None
+
+
+class _StatusView:
+    """Status aus dem Graphen, überlagert von den geplanten Änderungen."""
+
+    def __init__(self, graph: nx.DiGraph, link_changes: Dict[str, str], device_changes: Dict[str, str]):
+        self.graph = graph
+        self.endpoints = graph.graph.get("link_endpoints", {})
+        self.link_changes = link_changes
+        self.device_changes = device_changes
+
+    def current_link(self, link_id: str) -> Optional[str]:
+        endpoints = self.endpoints.get(link_id)
+        return self.graph.edges[endpoints].get('status') if endpoints else None
+
+    def link(self, link_id: str, planned: Optional[Dict[str, str]] = None) -> Optional[str]:
+        if planned and link_id in planned:
+            return planned[link_id]
+        if link_id in self.link_changes:
+            return self.link_changes[link_id]
+        return self.current_link(link_id)
+
+    def device(self, node_id: str) -> Optional[str]:
+        if node_id in self.device_changes:
+            return self.device_changes[node_id]
+        return self.graph.nodes[node_id].get('status')
+
+    def recovered(self, link_id: str) -> bool:
+        """Link kommt mit diesen Änderungen aus einem Ausfall zurück."""
+        return (link_id in self.link_changes and self.current_link(link_id) in FAILED_LINK_STATUSES
+                and self.link_changes[link_id] not in FAILED_LINK_STATUSES)
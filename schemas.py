@@ -52,10 +52,21 @@ class UpdateLinkStatusPayload(BaseModel):
     """Defines the schema for the request body when updating a link's status."""
     status: LinkStatus
 
+class BulkLinkStatusPayload(BaseModel):
+    """Defines the schema for updating the status of many links at once (e.g. an alarm storm)."""
+    links: Dict[str, LinkStatus]
+
 class UpdateDeviceStatusPayload(BaseModel):
     """Defines the schema for the request body when updating a device's status."""
     status: DeviceStatus
 
+class UpdateLinkPropertiesPayload(BaseModel):
+    """Defines the schema for updating the budget-relevant properties of a link (only the given fields change)."""
+    model_config = ConfigDict(extra='forbid')
+    length_km: Optional[float] = Field(None, ge=0)
+    connector_count: Optional[int] = Field(None, ge=0)
+    splice_count: Optional[int] = Field(None, ge=0)
+
 # Optional: Ein Pydantic-Modell für Events, falls sie später in der DB gespeichert werden sollen
 class Event(BaseModel):
     timestamp: str
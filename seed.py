@@ -3,171 +3,224 @@
 #
 # Lädt die deutschlandweite GeoJSON-Struktur und anschließend die
 # detaillierte Referenz-Topologie für Rees und markiert die Datenquellen.
-# JETZT: Aktualisiert für idempotentes Seeding (fügt nur hinzu, was fehlt).
+# Idempotent und als Bulk-Pipeline: vorhandene IDs werden einmal gelesen, neue Zeilen in Chunks
+# per INSERT ... ON CONFLICT DO NOTHING eingefügt. Eingabedateien werden gestreamt gelesen.
 #
 
-import yaml
-import json
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from database import SessionLocal, init_db, Device, Link
+from stream_parsers import iter_geojson_features, iter_yaml_sections
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_GEOJSON_PATH = "dg_network_data.json"
+DEFAULT_REES_TOPOLOGY_PATH = "topology_dg_rees.yml"
+
+
+def _insert_ignoring_conflicts(db: Session, table):
+    """INSERT, das bereits vorhandene IDs (z.B. durch parallel laufendes Seeding) stillschweigend überspringt."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
 
-def seed_from_geojson(db: Session):
+
+class BulkSeeder:
     """
-    Lädt die deutschlandweiten Geodaten (POPs, Backbone etc.) aus einer JSON-Datei
-    und fügt sie zur bestehenden Datenbank hinzu, falls sie noch nicht existieren.
+    Sammelt Geräte und Links und schreibt nur neue Zeilen in Chunks. Links, deren Endpunkte noch
+    nicht bekannt sind, werden zurückgestellt und am Ende erneut aufgelöst. Ein Commit pro Eingabe.
     """
-    print("Prüfe GeoJSON-Daten für Seeding...")
+
+    def __init__(self, db: Session, data_source: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.data_source = data_source
+        self.chunk_size = chunk_size
+        self.device_pk_by_id_str: Dict[str, int] = dict(db.execute(select(Device.device_id_str, Device.id)).all())
+        self.link_ids = set(db.execute(select(Link.link_id_str)).scalars())
+        self.pending_devices: Dict[str, dict] = {}
+        self.pending_links: List[dict] = []
+        self.deferred_links: List[dict] = []
+        self.rows_read = 0
+        self.new_devices = 0
+        self.new_links = 0
+        self.started = time.perf_counter()
+
+    def add_device(self, device_id_str: str, device_type: str, status: Optional[str], properties: Optional[dict], coordinates):
+        self.rows_read += 1
+        if device_id_str in self.device_pk_by_id_str or device_id_str in self.pending_devices:
+            return
+        properties = dict(properties or {})
+        properties['data_source'] = self.data_source
+        self.pending_devices[device_id_str] = {"device_id_str": device_id_str, "type": device_type, "status": status or 'online', "properties": properties, "coordinates": coordinates}
+        if len(self.pending_devices) >= self.chunk_size:
+            self.flush_devices()
+
+    def add_link(self, link_id_str: str, source: str, target: str, status: Optional[str], properties: Optional[dict]):
+        self.rows_read += 1
+        if link_id_str in self.link_ids:
+            return
+        self.link_ids.add(link_id_str)
+        properties = dict(properties or {})
+        properties['data_source'] = self.data_source
+        link = {"link_id_str": link_id_str, "source": source, "target": target, "status": status or 'up', "properties": properties}
+        if not self._resolve(link):
+            self.deferred_links.append(link)
+            return
+        self.pending_links.append(link)
+        if len(self.pending_links) >= self.chunk_size:
+            self.flush_links()
+
+    def _resolve(self, link: dict) -> bool:
+        if (link["source"] in self.pending_devices or link["target"] in self.pending_devices):
+            self.flush_devices()
+        source_pk = self.device_pk_by_id_str.get(link["source"])
+        target_pk = self.device_pk_by_id_str.get(link["target"])
+        if source_pk is None or target_pk is None:
+            return False
+        link["source_id"], link["target_id"] = source_pk, target_pk
+        return True
+
+    def flush_devices(self):
+        if not self.pending_devices:
+            return
+        rows = list(self.pending_devices.values())
+        self.pending_devices = {}
+        table = Device.__table__
+        returned = dict(self.db.execute(_insert_ignoring_conflicts(self.db, table).returning(table.c.device_id_str, table.c.id), rows).all())
+        # Nur tatsächlich eingefügte Zeilen zählen (Konflikte liefert RETURNING nicht zurück)
+        self.new_devices += len(returned)
+        if len(returned) < len(rows):
+            # Konflikte: die IDs existieren inzwischen, ihre Keys nachladen
+            missing = [row["device_id_str"] for row in rows if row["device_id_str"] not in returned]
+            returned.update(self.db.execute(select(Device.device_id_str, Device.id).where(Device.device_id_str.in_(missing))).all())
+        self.device_pk_by_id_str.update(returned)
+
+    def flush_links(self):
+        if not self.pending_links:
+            return
+        rows = [{key: link[key] for key in ("link_id_str", "source_id", "target_id", "status", "properties")} for link in self.pending_links]
+        self.pending_links = []
+        table = Link.__table__
+        # RETURNING statt rowcount: bei executemany ist rowcount je nach Treiber nicht verlässlich
+        inserted = self.db.execute(_insert_ignoring_conflicts(self.db, table).returning(table.c.link_id_str), rows).all()
+        self.new_links += len(inserted)
+
+    def finish(self) -> dict:
+        """Schreibt die Reste, löst zurückgestellte Links auf und committet."""
+        self.flush_devices()
+        for link in self.deferred_links:
+            if self._resolve(link):
+                self.pending_links.append(link)
+            else:
+                print(f"WARN: Source ('{link['source']}') oder Target ('{link['target']}') für Link '{link['link_id_str']}' nicht gefunden.")
+        self.deferred_links = []
+        self.flush_links()
+        self.db.commit()
+        duration = time.perf_counter() - self.started
+        return {
+            "rows_read": self.rows_read,
+            "new_devices": self.new_devices,
+            "new_links": self.new_links,
+            "duration_s": round(duration, 3),
+            "rows_per_second": round(self.rows_read / duration) if duration > 0 else None,
+        }
+
+
+def _report(label: str, stats: dict):
+    print(f"{stats['new_devices']} neue Geräte und {stats['new_links']} neue Links aus {label} hinzugefügt "
+          f"({stats['rows_read']} Zeilen gelesen, {stats['rows_per_second']} Zeilen/s).")
+
+
+def seed_from_geojson(db: Session, path: str = DEFAULT_GEOJSON_PATH, data_source: str = 'geojson', chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[dict]:
+    """
+    Lädt Geodaten (POPs, Backbone etc.) aus einer GeoJSON-Datei und fügt sie zur bestehenden
+    Datenbank hinzu, falls sie noch nicht existieren. Points werden Geräte, LineStrings Links.
+    """
+    print(f"Prüfe GeoJSON-Daten aus '{path}' für Seeding...")
+    if not os.path.exists(path):
+        print(f"FATAL: {path} nicht gefunden.")
+        return None
+    seeder = BulkSeeder(db, data_source, chunk_size)
     try:
-        with open("dg_network_data.json", 'r', encoding='utf-8') as f:
-            feature_collections = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"FATAL: Fehler beim Laden der dg_network_data.json: {e}")
-        return
-
-    print("Verarbeite Device-Knoten aus GeoJSON...")
-    new_devices_count = 0
-    for collection in feature_collections:
-        for feature in collection['features']:
-            if feature['geometry']['type'] == 'Point':
-                props = feature['properties']
+        for feature in iter_geojson_features(path):
+            geometry = feature.get('geometry') or {}
+            props = feature.get('properties') or {}
+            # properties.status beschreibt in den Geodaten den Ausbaustand, nicht den Betriebszustand
+            if geometry.get('type') == 'Point':
                 node_id = props.get('name')
-                if not node_id: continue
-
-                # IDEMPOTENZ-PRÜFUNG: Nur hinzufügen, wenn noch nicht vorhanden
-                if db.query(Device).filter(Device.device_id_str == node_id).count() == 0:
-                    props['data_source'] = 'geojson'
-                    new_device = Device(
-                        device_id_str=node_id,
-                        type=props.get('typ', 'Unknown'),
-                        properties=props,
-                        coordinates=feature['geometry']['coordinates']
-                    )
-                    db.add(new_device)
-                    new_devices_count += 1
-    
-    if new_devices_count > 0:
-        db.commit()
-        print(f"{new_devices_count} neue Device-Knoten aus GeoJSON hinzugefügt.")
-    else:
-        print("Keine neuen GeoJSON-Geräte hinzuzufügen.")
-
-    all_devices_map = {d.device_id_str: d for d in db.query(Device).all()}
-    
-    print("Verarbeite Links aus GeoJSON...")
-    new_links_count = 0
-    for collection in feature_collections:
-        for feature in collection['features']:
-            if feature['geometry']['type'] == 'LineString':
-                props = feature['properties']
-                source_name = props.get('source')
-                target_name = props.get('target')
-
+                if node_id:
+                    seeder.add_device(node_id, props.get('typ', 'Unknown'), None, props, geometry.get('coordinates'))
+            elif geometry.get('type') == 'LineString':
+                source_name, target_name = props.get('source'), props.get('target')
                 if source_name and target_name:
-                    source_dev = all_devices_map.get(source_name)
-                    target_dev = all_devices_map.get(target_name)
-
-                    if source_dev and target_dev:
-                        link_id = f"link-{source_name}-{target_name}".replace(" ", "_")
-                        
-                        # IDEMPOTENZ-PRÜFUNG: Nur hinzufügen, wenn noch nicht vorhanden
-                        if db.query(Link).filter(Link.link_id_str == link_id).count() == 0:
-                            props['data_source'] = 'geojson'
-                            new_link = Link(
-                                link_id_str=link_id,
-                                source_id=source_dev.id,
-                                target_id=target_dev.id,
-                                properties=props
-                            )
-                            db.add(new_link)
-                            new_links_count += 1
-                    else:
-                        print(f"WARN: Source ('{source_name}') oder Target ('{target_name}') für GeoJSON-Link nicht gefunden.")
-    
-    if new_links_count > 0:
-        db.commit()
-        print(f"{new_links_count} neue Links aus GeoJSON hinzugefügt.")
-    else:
-        print("Keine neuen GeoJSON-Links hinzuzufügen.")
-    print("GeoJSON-Daten erfolgreich verarbeitet.")
-
-
-def seed_from_rees_topology(db: Session):
-    """Lädt die detaillierte Referenz-Topologie für Rees aus topology_dg_rees.yml."""
-    print("Prüfe Rees-Topologie für Seeding...")
+                    link_id = f"link-{source_name}-{target_name}".replace(" ", "_")
+                    seeder.add_link(link_id, source_name, target_name, None, props)
+        stats = seeder.finish()
+    except ValueError as e:  # json.JSONDecodeError ist ein ValueError
+        db.rollback()
+        print(f"FATAL: Fehler beim Laden von {path}: {e}")
+        return None
+    _report("GeoJSON", stats)
+    return stats
+
+
+def seed_from_rees_topology(db: Session, path: str = DEFAULT_REES_TOPOLOGY_PATH, data_source: str = 'rees_topology', chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[dict]:
+    """Lädt eine YAML-Topologie (devices/links, z.B. die Referenz-Topologie für Rees)."""
+    print(f"Prüfe YAML-Topologie '{path}' für Seeding...")
+    if not os.path.exists(path):
+        print(f"WARN: {path} nicht gefunden. Überspringe dieses Seeding.")
+        return None
+    seeder = BulkSeeder(db, data_source, chunk_size)
     try:
-        with open("topology_dg_rees.yml", 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-    except FileNotFoundError:
-        print("WARN: topology_dg_rees.yml nicht gefunden. Überspringe dieses Seeding.")
-        return
-        
-    print("Verarbeite Geräte für Rees-Topologie...")
-    new_devices_count = 0
-    for device_data in data.get('devices', []):
-        # IDEMPOTENZ-PRÜFUNG für jedes Gerät
-        if db.query(Device).filter(Device.device_id_str == device_data['id']).count() == 0:
-            props = device_data.get('properties', {})
-            props['data_source'] = 'rees_topology'
-            new_device = Device(
-                device_id_str=device_data['id'],
-                type=device_data['type'],
-                status=device_data.get('status', 'online'),
-                properties=props,
-                coordinates=device_data.get('coordinates')
-            )
-            db.add(new_device)
-            new_devices_count += 1
-    
-    if new_devices_count > 0:
-        db.commit()
-        print(f"{new_devices_count} neue Geräte für Rees-Topologie hinzugefügt.")
-    else:
-        print("Keine neuen Geräte für Rees-Topologie hinzuzufügen.")
-
-    # Holen aller Geräte, um die Links korrekt zu erstellen
-    all_devices_map = {d.device_id_str: d for d in db.query(Device).all()}
-
-    print("Verarbeite Links für Rees-Topologie...")
-    new_links_count = 0
-    for link_data in data.get('links', []):
-        # IDEMPOTENZ-PRÜFUNG für jeden Link
-        if db.query(Link).filter(Link.link_id_str == link_data['id']).count() == 0:
-            source_dev = all_devices_map.get(link_data['source'])
-            target_dev = all_devices_map.get(link_data['target'])
-            
-            if source_dev and target_dev:
-                props = link_data.get('properties', {})
-                props['data_source'] = 'rees_topology'
-                new_link = Link(
-                    link_id_str=link_data['id'],
-                    source_id=source_dev.id,
-                    target_id=target_dev.id,
-                    status=link_data.get('status', 'up'),
-                    properties=props
-                )
-                db.add(new_link)
-                new_links_count += 1
+        for section, item in iter_yaml_sections(path, ("devices", "links")):
+            if section == 'devices':
+                seeder.add_device(item['id'], item['type'], item.get('status'), item.get('properties'), item.get('coordinates'))
             else:
-                print(f"WARN: Source ('{link_data['source']}') oder Target ('{link_data['target']}') für Rees-Link '{link_data['id']}' nicht gefunden.")
+                seeder.add_link(item['id'], item['source'], item['target'], item.get('status'), item.get('properties'))
+        stats = seeder.finish()
+    except (ValueError, KeyError) as e:
+        db.rollback()
+        print(f"FATAL: Fehler beim Laden von {path}: {e}")
+        return None
+    _report("YAML-Topologie", stats)
+    return stats
 
-    if new_links_count > 0:
-        db.commit()
-        print(f"{new_links_count} neue Links für Rees-Topologie hinzugefügt.")
-    else:
-        print("Keine neuen Links für Rees-Topologie hinzuzufügen.")
-    print("Rees-Referenz-Topologie erfolgreich verarbeitet.")
 
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Befüllt die UNOC-Datenbank idempotent aus GeoJSON- und YAML-Dateien.")
+    parser.add_argument("inputs", nargs="*", help=f"GeoJSON- (.json/.geojson) oder YAML-Dateien (.yml/.yaml); Standard: {DEFAULT_GEOJSON_PATH} und {DEFAULT_REES_TOPOLOGY_PATH}")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Zeilen pro INSERT-Statement")
+    parser.add_argument("--data-source", default=None, help="Wert für properties.data_source (Standard: 'geojson' bzw. 'rees_topology')")
+    args = parser.parse_args(argv)
 
-if __name__ == "__main__":
     print("Initialisiere Datenbank-Schema...")
     init_db()
-    
+
+    inputs = args.inputs or [DEFAULT_GEOJSON_PATH, DEFAULT_REES_TOPOLOGY_PATH]
+    started = time.perf_counter()
+    rows_read = 0
     db_session = SessionLocal()
     try:
-        # Führe beide Seeding-Funktionen aus
-        seed_from_geojson(db_session)
-        seed_from_rees_topology(db_session)
+        for path in inputs:
+            if path.lower().endswith(('.yml', '.yaml')):
+                stats = seed_from_rees_topology(db_session, path, args.data_source or 'rees_topology', args.chunk_size)
+            else:
+                stats = seed_from_geojson(db_session, path, args.data_source or 'geojson', args.chunk_size)
+            rows_read += (stats or {}).get("rows_read", 0)
     finally:
         db_session.close()
-    
-    print("\nSeeding-Prozess abgeschlossen.")
\ No newline at end of file
+
+    duration = time.perf_counter() - started
+    print(f"\nSeeding-Prozess abgeschlossen: {rows_read} Zeilen in {duration:.2f} s ({rows_read / duration:.0f} Zeilen/s).")
+
+
+if __name__ == "__main__":
+    main()
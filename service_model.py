@@ -0,0 +1,484 @@
+#
+# UNOC - service_model.py
+#
+# Versorgungsmodell für Analysen, die den Live-Zustand nicht verändern (Monte-Carlo-Simulation,
+# Was-wäre-wenn-Abfragen). ServiceModel ist eine schreibgeschützte Kopie des Graphen aus reinen
+# NumPy-Arrays und bewertet, welche Teilnehmer bei gleichzeitigem Ausfall beliebiger Geräte und
+# Links offline gehen. Ein Teilnehmer ist versorgt, wenn
+#   - er gerichtet von einem Head-End erreichbar ist (Zugangsnetz, dieselbe Sicht wie PathIndex) und
+#   - dieses Head-End mit dem Backbone verbunden ist (Uplink, ungerichtet ab den Knoten, die im
+#     intakten Netz keinen Vorgänger außer einem RPL haben, z.B. dem Ringknoten hinter dem RPL).
+# Das Zugangsnetz trägt einen Dominatorbaum mit Euler-Intervallen (tin/tout): ein Einzelausfall
+# trennt genau die von ihm dominierten Teilnehmer, die als zusammenhängender Präorder-Abschnitt
+# ausgelesen werden. Im Uplink liefert ein Spannbaum den Teilbaum jedes Ausfalls; Links außerhalb
+# sind Ersatzwege, ein blockierter Ringlink (RPL) nur beim ERPS-Failover seines Rings. Ein RPL, der
+# gerade Verkehr trägt (Failover aktiv), ist ein normaler weiterleitender Link.
+#
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import networkx as nx
+import numpy as np
+
+from commands import ChangeRecord
+from ring_engine import RingEngine
+
+NON_FORWARDING = ('down', 'blocking')
+
+
+def _adjacency(n: int, ends: np.ndarray, others: np.ndarray, elements: np.ndarray):
+    """Nachbarschaft als CSR: für Knoten u liegen Nachbarn und Link-Elemente in [ptr[u], ptr[u+1])."""
+    order = np.argsort(ends, kind='stable')
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum(np.bincount(ends, minlength=n))
+    return ptr, others[order], elements[order]
+
+
+def _bfs_tree(n: int, link_count: int, adjacency, roots: np.ndarray, fallback_roots: Optional[np.ndarray] = None):
+    """
+    Ebenenweise BFS (vektorisiert) ab allen roots gleichzeitig, danach ab den noch nicht erreichten
+    fallback_roots. Liefert parent, den Baumlink je Element (tree_child: Kind oder -1), visited und
+    die Ebenen; Geschwister liegen innerhalb einer Ebene nebeneinander.
+    """
+    ptr, adjacent, adjacent_element = adjacency
+    parent = np.full(n, -1, dtype=np.int64)
+    tree_child = np.full(link_count, -1, dtype=np.int64)
+    visited = np.zeros(n, dtype=bool)
+    levels: List[np.ndarray] = []
+    frontier = roots
+    while len(frontier):
+        visited[frontier] = True
+        levels.append(frontier)
+        while len(frontier):
+            counts = ptr[frontier + 1] - ptr[frontier]
+            slots = np.repeat(ptr[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            origin = np.repeat(frontier, counts)
+            fresh = ~visited[adjacent[slots]]
+            reached, first = np.unique(adjacent[slots][fresh], return_index=True)
+            parent[reached] = origin[fresh][first]
+            tree_child[adjacent_element[slots][fresh][first]] = reached
+            visited[reached] = True
+            frontier = reached[np.argsort(parent[reached], kind='stable')]
+            if len(frontier):
+                levels.append(frontier)
+        if fallback_roots is None:
+            break
+        frontier = fallback_roots[~visited[fallback_roots]]
+    return parent, tree_child, visited, levels
+
+
+def _euler(parent: np.ndarray, visited: np.ndarray, levels: List[np.ndarray], weight: np.ndarray):
+    """
+    Präorder-Nummer tin, tout = tin + Teilbaumgröße - 1 und Summe von weight je Teilbaum. Ein Knoten
+    folgt seinem Parent, verschoben um die Größe der vor ihm liegenden Geschwister.
+    """
+    size = visited.astype(np.int64)
+    total = np.where(visited, weight, 0).astype(np.int64)
+    for level in reversed(levels):
+        below = level[parent[level] >= 0]
+        np.add.at(size, parent[below], size[below])
+        np.add.at(total, parent[below], total[below])
+    tin = np.full(len(parent), -1, dtype=np.int64)
+    roots = np.nonzero(visited & (parent < 0))[0]
+    tin[roots] = np.cumsum(size[roots]) - size[roots]
+    for level in levels:
+        level = level[parent[level] >= 0]
+        if not len(level):
+            continue
+        before = np.cumsum(size[level]) - size[level]
+        group_start = np.ones(len(level), dtype=bool)
+        group_start[1:] = parent[level][1:] != parent[level][:-1]
+        offset = before - before[np.nonzero(group_start)[0]][np.cumsum(group_start) - 1]
+        tin[level] = tin[parent[level]] + 1 + offset
+    tout = np.where(tin >= 0, tin + size - 1, -1)
+    return tin, tout, total
+
+
+def _dominators(parent: np.ndarray, levels: List[np.ndarray], predecessors: Dict[int, List[int]]) -> np.ndarray:
+    """
+    Unmittelbare Dominatoren (Cooper/Harvey/Kennedy) ab einer virtuellen Quelle vor den BFS-Wurzeln
+    (-1). Knoten mit genau einem Vorgänger werden vom BFS-Parent dominiert; iteriert wird nur über
+    die Knoten in predecessors (mehrere erreichbare Vorgänger).
+    """
+    idom = parent.copy()
+    if not predecessors:
+        return idom
+    n = len(parent)
+    number = np.full(n + 1, -1, dtype=np.int64)
+    order = np.concatenate(levels)
+    number[order] = np.arange(len(order))
+    number = number.tolist()
+    dominator = np.where(idom >= 0, idom, n).tolist() + [n]
+
+    def intersect(a: int, b: int) -> int:
+        while a != b:
+            while number[a] > number[b]:
+                a = dominator[a]
+            while number[b] > number[a]:
+                b = dominator[b]
+        return a
+
+    merge_nodes = sorted(predecessors, key=number.__getitem__)
+    changed = True
+    while changed:
+        changed = False
+        for node in merge_nodes:
+            preds = predecessors[node]
+            new = preds[0]
+            for pred in preds[1:]:
+                new = intersect(new, pred)
+            if new != dominator[node]:
+                dominator[node] = new
+                changed = True
+    idom[merge_nodes] = [dominator[node] if dominator[node] != n else -1 for node in merge_nodes]
+    return idom
+
+
+class ServiceModel:
+    """
+    Schreibgeschützte Kopie des Graphen als NumPy-Arrays. Elemente sind Links (0..link_count-1) und
+    Geräte (link_count + Knotenindex). Ausgefallene Elemente werden gegen den heutigen Zustand
+    bewertet: bereits ausgefallene Geräte und Links zählen nicht erneut.
+    """
+
+    def __init__(self, graph: nx.DiGraph, head_end_types: Iterable[str], end_device_types: Iterable[str]):
+        head_end_types, end_device_types = set(head_end_types), set(end_device_types)
+        self.node_ids: List[str] = list(graph.nodes)
+        self.node_index = index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        n = len(self.node_ids)
+        self.node_types = node_types = [data.get('type') for data in graph.nodes.values()]
+        is_head_end = np.array([node_type in head_end_types for node_type in node_types], dtype=bool)
+        is_end_device = np.array([node_type in end_device_types for node_type in node_types], dtype=bool)
+        online = np.array([data.get('status') != 'offline' for data in graph.nodes.values()], dtype=bool)
+        self.is_end_device = is_end_device.tolist()
+
+        # Ein Durchlauf über alle Links: Endpunkte und Status
+        source, target, status, self.link_ids = [], [], [], []
+        for source_id, targets in graph.adj.items():
+            u = index[source_id]
+            for target_id, data in targets.items():
+                source.append(u)
+                target.append(index[target_id])
+                status.append(data.get('status'))
+                self.link_ids.append(data['link_id_str'])
+        self.link_count = link_count = len(self.link_ids)
+        self.link_index = link_index = {link_id: element for element, link_id in enumerate(self.link_ids)}
+        self.link_source = source = np.array(source, dtype=np.int64)
+        self.link_target = target = np.array(target, dtype=np.int64)
+        self.link_down = np.array([s == 'down' for s in status], dtype=bool)
+
+        # Ringlinks wie in der ERPS-Steuerung (Knotenfolge der Ringdefinition, Sub-Ringe offen)
+        ring_engine = RingEngine()
+        ring_engine.rebuild(graph)
+        rings = list(ring_engine.rings.values())
+        self.ring_ids = [ring["id"] for ring in rings]
+        ring_number = {ring["id"]: r for r, ring in enumerate(rings)}
+        is_rpl = np.zeros(link_count, dtype=bool)
+        is_rpl[[link_index[ring["rpl"]] for ring in rings if ring["rpl"] in link_index]] = True
+        ring_of_link = np.full(link_count, -1, dtype=np.int64)
+        for link_id, ring_ids in ring_engine.link_rings.items():
+            if link_id in link_index:
+                ring_of_link[link_index[link_id]] = ring_number[ring_ids[0]]
+        ring_of_node: Dict[int, List[int]] = {}
+        for node_id, ring_ids in ring_engine.node_rings.items():
+            ring_of_node[index[node_id]] = [ring_number[ring_id] for ring_id in ring_ids]
+
+        # Weiterleitende Links (auch ein RPL im Failover); blockierte Ringlinks sind Ersatzwege ihres Rings
+        endpoints_online = online[source] & online[target]
+        blocking = np.array([s == 'blocking' for s in status], dtype=bool)
+        forwarding = endpoints_online & np.array([s not in NON_FORWARDING for s in status], dtype=bool)
+        protection = endpoints_online & blocking & (ring_of_link >= 0)
+        elements = np.nonzero(forwarding)[0]
+        # Backbone-Wurzeln aus dem intakten Netz (alle Links außer den RPLs, unabhängig vom Status), damit
+        # ein Ausfall keine abgeschnittenen Knoten zu Wurzeln macht
+        intact = np.nonzero(~is_rpl)[0]
+        has_intact_in = np.zeros(n, dtype=bool)
+        has_intact_in[target[intact]] = True
+
+        # --- Zugangsnetz: gerichtete Erreichbarkeit ab den Head-Ends, Dominatorbaum ---
+        head_ends = np.nonzero(online & is_head_end)[0]
+        bfs_parent, _, access_visited, bfs_levels = _bfs_tree(n, link_count, _adjacency(n, source[elements], target[elements], elements), head_ends)
+        self.access_links = access_links = elements[access_visited[source[elements]] & access_visited[target[elements]]]
+        # Vorgänger je Knoten; Head-Ends haben zusätzlich die virtuelle Quelle
+        pred_count = np.bincount(target[access_links], minlength=n) + np.isin(np.arange(n), head_ends)
+        merge = np.nonzero(pred_count > 1)[0]
+        self.merge = merge = merge[~np.isin(merge, head_ends)]
+        self.predecessors = predecessors = {int(v): [] for v in merge}
+        for element in access_links[np.isin(target[access_links], merge)].tolist():
+            predecessors[int(target[element])].append(int(source[element]))
+        self.idom = idom = _dominators(bfs_parent, bfs_levels, predecessors)
+        depth = np.zeros(n, dtype=np.int64)
+        for level in bfs_levels:
+            depth[level] = np.where(idom[level] >= 0, depth[np.maximum(idom[level], 0)] + 1, 0)
+        reachable = np.concatenate(bfs_levels) if bfs_levels else np.zeros(0, dtype=np.int64)
+        reachable = reachable[np.lexsort((idom[reachable], depth[reachable]))]
+        dominator_levels = np.split(reachable, np.nonzero(np.diff(depth[reachable]))[0] + 1) if len(reachable) else []
+        access_tin, access_tout, subscribers = _euler(idom, access_visited, dominator_levels, is_end_device)
+        self.total_subscribers = int(subscribers[access_visited & (idom < 0)].sum())
+        # Knoten in Präorder: der dominierte Teilbaum eines Knotens ist access_order[tin:tout + 1]
+        self.access_order = np.empty(int(access_visited.sum()), dtype=np.int64)
+        self.access_order[access_tin[access_visited]] = np.nonzero(access_visited)[0]
+        self.access_subscribers = subscribers
+        self.access_tin, self.access_tout, self.subscribers = access_tin.tolist(), access_tout.tolist(), subscribers.tolist()
+        self.pred_count = pred_count.tolist()
+        self.access_target = np.full(link_count, -1, dtype=np.int64)
+        self.access_target[access_links] = target[access_links]
+        out_ptr, out_node, out_element = _adjacency(n, source[access_links], target[access_links], access_links)
+        self.out_ptr, self.out_node, self.out_element = out_ptr.tolist(), out_node.tolist(), out_element.tolist()
+        self.access_visited = access_visited
+        # Teilbäume mit Links nach außen (nur über Knoten mit mehreren Zugängen möglich)
+        has_escape = np.zeros(n, dtype=bool)
+        for node, preds in predecessors.items():
+            for pred in preds:
+                while pred >= 0 and not (self.access_tin[pred] <= self.access_tin[node] <= self.access_tout[pred]):
+                    has_escape[pred] = True
+                    pred = idom[pred]
+        for element in access_links[np.isin(target[access_links], head_ends)].tolist():
+            pred = int(source[element])
+            while pred >= 0:
+                has_escape[pred] = True
+                pred = idom[pred]
+        self.has_escape = has_escape.tolist()
+
+        # --- Uplink: ungerichtete BFS ab dem Backbone; Head-Ends ohne Backbone speisen sich selbst ---
+        backbone = np.nonzero(online & ~has_intact_in & ~is_end_device & ~is_head_end)[0]
+        undirected = _adjacency(n, np.concatenate([source[elements], target[elements]]), np.concatenate([target[elements], source[elements]]), np.concatenate([elements, elements]))
+        self.uplink_parent, self.uplink_child, self.uplink_visited, uplink_levels = _bfs_tree(n, link_count, undirected, backbone, head_ends)
+        self.uplink_tin, self.uplink_tout, self.head_ends_below = _euler(self.uplink_parent, self.uplink_visited, uplink_levels, np.isin(np.arange(n), head_ends))
+        self.uplink_order = np.empty(int(self.uplink_visited.sum()), dtype=np.int64)
+        self.uplink_order[self.uplink_tin[self.uplink_visited]] = np.nonzero(self.uplink_visited)[0]
+        # In Betrieb sind nur Uplink-Komponenten mit Head-End; abgehängte Reste zählen nicht als Backbone
+        uplink_roots = np.nonzero(self.uplink_visited & (self.uplink_parent < 0))[0]
+        uplink_roots = uplink_roots[np.argsort(self.uplink_tin[uplink_roots])]
+        root_of = uplink_roots[np.maximum(np.searchsorted(self.uplink_tin[uplink_roots], self.uplink_tin, side='right') - 1, 0)] if len(uplink_roots) else np.zeros(n, dtype=np.int64)
+        self.in_service = access_visited | (self.uplink_visited & (self.head_ends_below[root_of] > 0))
+        in_tree = np.nonzero(self.uplink_parent >= 0)[0]
+        self.uplink_children = in_tree[np.argsort(self.uplink_parent[in_tree], kind='stable')]
+        self.uplink_children_ptr = np.zeros(n + 1, dtype=np.int64)
+        self.uplink_children_ptr[1:] = np.cumsum(np.bincount(self.uplink_parent[in_tree], minlength=n))
+        self.head_ends = head_ends[np.argsort(self.uplink_tin[head_ends])]
+        self.head_end_tins = self.uplink_tin[self.head_ends].tolist()
+
+        # Ersatzwege im Uplink: blockierte Ringlinks (nur beim ERPS-Failover ihres Rings) und redundante Links
+        self.spare = spare = np.nonzero((forwarding | protection) & (self.uplink_child < 0) & self.uplink_visited[source] & self.uplink_visited[target])[0]
+        self.alternatives = [(int(source[e]), int(target[e]), int(e), int(ring_of_link[e]) if protection[e] else -1) for e in spare]
+
+        # ERPS: welche Elemente lösen den Failover welches Rings aus
+        self.triggers: Dict[int, tuple] = {}
+        for link_id, ring_ids in ring_engine.link_rings.items():
+            if link_id in link_index:
+                self.triggers[link_index[link_id]] = tuple(ring_number[ring_id] for ring_id in ring_ids)
+        for node, ring_list in ring_of_node.items():
+            self.triggers[link_count + node] = tuple(ring_list)
+
+        # Alle Links je Gerät (beide Richtungen) für die betroffenen Links einer Ausfallmenge
+        all_links = np.arange(link_count)
+        self.incident_ptr, _, self.incident_element = _adjacency(n, np.concatenate([source, target]), np.concatenate([target, source]), np.concatenate([all_links, all_links]))
+
+    def element_id(self, element: int) -> str:
+        return self.link_ids[element] if element < self.link_count else self.node_ids[element - self.link_count]
+
+    def impact(self, failed: Iterable[int]) -> int:
+        """Anzahl der heute versorgten Teilnehmer, die bei gleichzeitigem Ausfall dieser Elemente offline sind."""
+        return int(sum(self.subscribers[node] for node in self._lost_roots(set(failed))))
+
+    def affected(self, failed: Iterable[int]):
+        """
+        Geräte und Links, die bei gleichzeitigem Ausfall dieser Elemente offline gehen: die Wurzeln der
+        verlorenen Teilbäume werden als Präorder-Abschnitte ausgelesen, der Aufwand wächst mit der Antwort.
+        """
+        failed = set(failed)
+        roots = self._lost_roots(failed)
+        parts = [self.access_order[self.access_tin[node]:self.access_tout[node] + 1] for node in roots]
+        # Backbone-Geräte ohne Zugangsnetz (Core, POP, ...) fallen mit ihrem abgeschnittenen Uplink-Teilstück
+        backbone: List[int] = []
+        self._cut_head_ends(failed, backbone)
+        parts.append(np.array(backbone, dtype=np.int64))
+        parts.append(np.array([element - self.link_count for element in failed if element >= self.link_count], dtype=np.int64))
+        nodes = np.unique(np.concatenate(parts))
+        nodes = nodes[self.in_service[nodes]]
+        starts, ends = self.incident_ptr[nodes], self.incident_ptr[nodes + 1]
+        counts = ends - starts
+        slots = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        links = np.unique(np.concatenate([self.incident_element[slots], np.array([e for e in failed if e < self.link_count], dtype=np.int64)]))
+        return nodes, links[~self.link_down[links]]
+
+    def _lost_roots(self, failed: set) -> List[int]:
+        """Wurzeln der verlorenen dominierten Teilbäume (disjunkt, nach tin sortiert)."""
+        removed = self._cut_head_ends(failed)
+        removed += [element - self.link_count for element in failed if element >= self.link_count]
+        lost = self._lost_nodes(removed, {element for element in failed if element < self.link_count})
+        # Verschachtelte Intervalle zählen nur einmal
+        roots, covered_until = [], -1
+        for node in sorted(lost, key=self.access_tin.__getitem__):
+            if self.access_tin[node] > covered_until:
+                roots.append(node)
+                covered_until = self.access_tout[node]
+        return roots
+
+    def _lost_nodes(self, removed: List[int], failed_links: set) -> set:
+        """
+        Verlustausbreitung im Zugangsnetz: ein Knoten fällt, wenn keiner seiner Zugänge mehr versorgt
+        ist. Ein ausgefallener Knoten nimmt seinen ganzen dominierten Teilbaum mit; weiterverfolgt
+        werden nur Teilbäume mit Links nach außen. Aufwand proportional zum betroffenen Bereich.
+        """
+        remaining: Dict[int, int] = {}
+        lost = set()
+        queue = []
+        for node in removed:
+            if self.access_visited[node] and node not in lost:
+                lost.add(node)
+                queue.append(node)
+        for element in failed_links:
+            node = int(self.access_target[element])
+            if node >= 0 and node not in lost:
+                remaining[node] = remaining.get(node, self.pred_count[node]) - 1
+                if remaining[node] == 0:
+                    lost.add(node)
+                    queue.append(node)
+        out_ptr, out_node, out_element = self.out_ptr, self.out_node, self.out_element
+        while queue:
+            node = queue.pop()
+            if not self.has_escape[node]:
+                continue
+            for slot in range(out_ptr[node], out_ptr[node + 1]):
+                child = out_node[slot]
+                if child in lost or out_element[slot] in failed_links:
+                    continue
+                remaining[child] = remaining.get(child, self.pred_count[child]) - 1
+                if remaining[child] == 0:
+                    lost.add(child)
+                    queue.append(child)
+        return lost
+
+    def _cut_head_ends(self, failed: set, backbone: Optional[List[int]] = None) -> List[int]:
+        """
+        Head-Ends, die bei diesen Ausfällen keine Verbindung zum Backbone mehr haben (inkl. ERPS).
+        Optional sammelt backbone die abgeschnittenen Geräte außerhalb des Zugangsnetzes.
+        """
+        tin, tout = self.uplink_tin, self.uplink_tout
+        heads, dead_devices, rings = set(), set(), set()
+        for element in failed:
+            rings.update(self.triggers.get(element, ()))
+            if element < self.link_count:
+                child = self.uplink_child[element]
+                if child >= 0:
+                    heads.add(int(child))
+            else:
+                node = element - self.link_count
+                if tin[node] >= 0:
+                    # Das Gerät selbst bleibt offline, seine Kinder können über Ersatzwege zurückkommen
+                    dead_devices.add(node)
+                    heads.add(node)
+                    heads.update(self.uplink_children[self.uplink_children_ptr[node]:self.uplink_children_ptr[node + 1]].tolist())
+        if not heads:
+            return []
+
+        # Teilstücke: je abgeschnittener Kopf sein Teilbaum ohne die darin liegenden Köpfe
+        order = sorted(heads, key=lambda h: tin[h])
+        starts = [int(tin[h]) for h in order]
+        enclosing = [-1] * len(order)
+        stack: List[int] = []
+        for i, head in enumerate(order):
+            while stack and tout[order[stack[-1]]] < tin[head]:
+                stack.pop()
+            if stack:
+                enclosing[i] = stack[-1]
+            stack.append(i)
+
+        def piece_of(node: int) -> int:
+            i = bisect_right(starts, tin[node]) - 1
+            while i >= 0 and tout[order[i]] < tin[node]:
+                i = enclosing[i]
+            return i  # -1: über den Baum versorgt
+
+        adjacency: Dict[int, List[int]] = {}
+        for u, v, element, ring in self.alternatives:
+            if element in failed or (ring >= 0 and ring not in rings) or u in dead_devices or v in dead_devices:
+                continue
+            a, b = piece_of(u), piece_of(v)
+            if a != b:
+                adjacency.setdefault(a, []).append(b)
+                adjacency.setdefault(b, []).append(a)
+        reached = {-1}
+        queue = deque([-1])
+        while queue:
+            for other in adjacency.get(queue.popleft(), ()):
+                if other not in reached:
+                    reached.add(other)
+                    queue.append(other)
+
+        cut = []
+        for i, head in enumerate(order):
+            if i in reached:
+                continue
+            first = bisect_left(self.head_end_tins, tin[head])
+            last = bisect_right(self.head_end_tins, tout[head])
+            cut.extend(h for h in self.head_ends[first:last].tolist() if piece_of(h) == i)
+            if backbone is not None:
+                # Präorder-Abschnitt des Kopfes ohne die Abschnitte der darin liegenden Köpfe
+                position = int(tin[head])
+                for j in range(i + 1, len(order)):
+                    if starts[j] > tout[head]:
+                        break
+                    if enclosing[j] == i:
+                        backbone.extend(self.uplink_order[position:starts[j]].tolist())
+                        position = int(tout[order[j]]) + 1
+                backbone.extend(self.uplink_order[position:int(tout[head]) + 1].tolist())
+        if backbone:
+            backbone[:] = [node for node in backbone if self.in_service[node] and not self.access_visited[node]]
+        return cut
+
+
+class ImpactIndex:
+    """
+    Hält das ServiceModel des Live-Graphen für Was-wäre-wenn-Abfragen. Statusänderungen markieren
+    es nur als veraltet; neu aufgebaut wird bei der nächsten Abfrage.
+    """
+
+    def __init__(self, head_end_types: Iterable[str], end_device_types: Iterable[str]):
+        self.head_end_types = list(head_end_types)
+        self.end_device_types = list(end_device_types)
+        self.model: Optional[ServiceModel] = None
+        self._graph: Optional[nx.DiGraph] = None
+        self.builds = 0
+
+    def rebuild(self, graph: nx.DiGraph):
+        self._graph = graph
+        self.model = ServiceModel(graph, self.head_end_types, self.end_device_types)
+        self.builds += 1
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        """Nur Statusänderungen verändern Versorgung und Ringe; Properties werden bei der Abfrage gelesen."""
+        if any(record.field == 'status' for record in records):
+            self._graph = graph
+            self.model = None
+
+    def current(self) -> ServiceModel:
+        if self.model is None:
+            if self._graph is None:
+                raise RuntimeError("Impact index has not been built yet.")
+            self.rebuild(self._graph)
+        return self.model
+
+    def query(self, node_ids: Iterable[str] = (), link_ids: Iterable[str] = ()) -> dict:
+        """
+        Betroffene Geräte, Links und Teilnehmer bei gleichzeitigem Ausfall der angegebenen Geräte und
+        Links. Unbekannte IDs lösen einen KeyError aus.
+        """
+        model = self.current()
+        failed = [model.link_count + model.node_index[node_id] for node_id in node_ids]
+        failed += [model.link_index[link_id] for link_id in link_ids]
+        nodes, links = model.affected(failed)
+        end_devices = [node for node in nodes.tolist() if model.is_end_device[node]]
+        by_type: Dict[str, int] = {}
+        for node in end_devices:
+            by_type[model.node_types[node]] = by_type.get(model.node_types[node], 0) + 1
+        return {
+            "devices": [model.node_ids[node] for node in nodes.tolist()],
+            "links": [model.link_ids[element] for element in links.tolist()],
+            "end_devices": [model.node_ids[node] for node in end_devices],
+            "end_devices_by_type": by_type,
+        }
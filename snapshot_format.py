@@ -0,0 +1,320 @@
+#
+# UNOC - snapshot_format.py
+#
+# Kompaktes, versioniertes Snapshot-Format (Version 2):
+#   - komprimierter Datenstrom (gzip, oder zstd falls 'zstandard' installiert ist)
+#   - erste Zeile: JSON-Header (Format, Version, Encoding, Basis-Snapshot, Zeilenzahlen)
+#   - danach spaltenorientierte Chunks je Abschnitt (devices, links, rings), kodiert als
+#     msgpack (falls installiert) oder JSON-Lines; type/status werden dictionary-kodiert
+#   - Delta-Snapshots speichern nur Upserts/Deletes gegenüber einem Basis-Snapshot; der Header
+#     enthält einen Hash des Basis-Inhalts, damit ein später überschriebener Basis-Snapshot auffällt
+# Alte snapshots/*.json (Version 1.0.0) werden weiterhin gelesen.
+#
+
+import gzip
+import hashlib
+import io
+import json
+import os
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+FORMAT_NAME = "unoc-snapshot"
+FORMAT_VERSION = 2
+COMPACT_EXTENSION = ".unoc"
+LEGACY_EXTENSION = ".json"
+DEFAULT_CHUNK_ROWS = 2000
+
+SECTIONS = ("devices", "links", "rings")
+SECTION_COLUMNS = {
+    "devices": ("id", "type", "status", "properties", "coordinates"),
+    "links": ("id", "source", "target", "status", "properties"),
+    "rings": ("id", "name", "rpl_link_id", "nodes"),
+}
+# Spalten mit wenigen unterschiedlichen Werten werden als Wörterbuch + Codes gespeichert
+DICTIONARY_COLUMNS = ("type", "status")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def available_compressions() -> List[str]:
+    return ["gzip"] + (["zstd"] if zstandard else [])
+
+
+def available_encodings() -> List[str]:
+    return ["jsonl"] + (["msgpack"] if msgpack else [])
+
+
+def snapshot_path(snapshot_dir: str, name: str) -> Optional[str]:
+    """Bevorzugt das kompakte Format, fällt auf den Legacy-JSON-Snapshot zurück."""
+    for extension in (COMPACT_EXTENSION, LEGACY_EXTENSION):
+        path = os.path.join(snapshot_dir, f"{name}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# --- Spaltenkodierung ---
+def _encode_columns(section: str, rows: List[dict]) -> Dict[str, object]:
+    columns = {}
+    for column in SECTION_COLUMNS[section]:
+        values = [row.get(column) for row in rows]
+        if column in DICTIONARY_COLUMNS:
+            dictionary, codes = {}, []
+            for value in values:
+                codes.append(dictionary.setdefault(value, len(dictionary)))
+            columns[column] = {"dict": list(dictionary), "codes": codes}
+        else:
+            columns[column] = values
+    return columns
+
+
+def _decode_columns(section: str, columns: Dict[str, object]) -> Iterator[dict]:
+    decoded = {}
+    for column in SECTION_COLUMNS[section]:
+        values = columns.get(column)
+        if isinstance(values, dict) and "codes" in values:
+            dictionary = values["dict"]
+            values = [dictionary[code] for code in values["codes"]]
+        decoded[column] = values
+    row_count = len(decoded["id"])
+    for i in range(row_count):
+        yield {column: (decoded[column][i] if decoded[column] is not None else None) for column in SECTION_COLUMNS[section]}
+
+
+# --- Streams ---
+class _RecordWriter:
+    def __init__(self, raw, encoding: str):
+        self._raw = raw
+        self._encoding = encoding
+        self._packer = msgpack.Packer() if encoding == "msgpack" else None
+
+    def write_header(self, header: dict):
+        # Der Header ist immer eine JSON-Zeile, damit das Encoding vor dem Body bekannt ist
+        self._raw.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def write(self, record: dict):
+        if self._packer:
+            self._raw.write(self._packer.pack(record))
+        else:
+            self._raw.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+
+
+def _open_compressed_writer(path: str, compression: str):
+    if compression == "zstd":
+        if not zstandard:
+            raise ValueError("zstd compression requires the 'zstandard' package.")
+        return zstandard.ZstdCompressor(level=6).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+def _open_compressed_reader(path: str):
+    with open(path, "rb") as probe:
+        magic = probe.read(4)
+    if magic.startswith(_ZSTD_MAGIC):
+        if not zstandard:
+            raise ValueError(f"Snapshot '{path}' is zstd-compressed but 'zstandard' is not installed.")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def topology_digest(topology: Dict[str, List[dict]]) -> str:
+    """Inhaltshash einer Topologie (unabhängig von der Zeilenreihenfolge)."""
+    digest = hashlib.sha256()
+    for section in SECTIONS:
+        digest.update(section.encode())
+        for row in sorted(topology.get(section, []), key=lambda row: row["id"]):
+            digest.update(json.dumps(row, sort_keys=True, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+# --- Schreiben ---
+def write_snapshot(path: str, topology: Dict[str, List[dict]], compression: str = "gzip", encoding: Optional[str] = None,
+                   base_name: Optional[str] = None, base_topology: Optional[Dict[str, List[dict]]] = None,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """
+    Schreibt einen Snapshot im kompakten Format. Mit base_name/base_topology entsteht ein
+    Delta-Snapshot, der nur geänderte bzw. gelöschte Objekte enthält.
+    Rückgabe: Header inkl. Zeilenzahlen.
+    """
+    encoding = encoding or ("msgpack" if msgpack else "jsonl")
+    if encoding == "msgpack" and not msgpack:
+        raise ValueError("msgpack encoding requires the 'msgpack' package.")
+
+    if base_topology is not None:
+        sections = {section: _diff_section(base_topology.get(section, []), topology.get(section, [])) for section in SECTIONS}
+    else:
+        sections = {section: (topology.get(section, []), []) for section in SECTIONS}
+
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "topology_version": topology.get("version", "1.0.0"),
+        "encoding": encoding,
+        "compression": compression,
+        "kind": "delta" if base_topology is not None else "full",
+        "base": base_name,
+        "base_digest": topology_digest(base_topology) if base_topology is not None else None,
+        "counts": {section: len(upserts) for section, (upserts, _) in sections.items()},
+        "deleted": {section: len(deletes) for section, (_, deletes) in sections.items()},
+    }
+    tmp_path = f"{path}.tmp"
+    with _open_compressed_writer(tmp_path, compression) as raw:
+        writer = _RecordWriter(raw, encoding)
+        writer.write_header(header)
+        for section in SECTIONS:
+            upserts, deletes = sections[section]
+            for chunk in _chunks(upserts, chunk_rows):
+                writer.write({"section": section, "op": "upsert", "columns": _encode_columns(section, chunk)})
+            if deletes:
+                writer.write({"section": section, "op": "delete", "ids": deletes})
+    os.replace(tmp_path, path)
+    return header
+
+
+def _diff_section(base_rows: List[dict], rows: List[dict]):
+    base_by_id = {row["id"]: row for row in base_rows}
+    current_ids = set()
+    upserts = []
+    for row in rows:
+        current_ids.add(row["id"])
+        if base_by_id.get(row["id"]) != row:
+            upserts.append(row)
+    deletes = [row_id for row_id in base_by_id if row_id not in current_ids]
+    return upserts, deletes
+
+
+# --- Lesen ---
+class SnapshotReader:
+    """
+    Liest einen kompakten Snapshot streamend. devices(), links() und rings() müssen in dieser
+    Reihenfolge konsumiert werden, da sie denselben Datenstrom teilen.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._raw = _open_compressed_reader(path)
+        self.header = json.loads(self._raw.readline())
+        if self.header.get("format") != FORMAT_NAME:
+            self._raw.close()
+            raise ValueError(f"'{path}' is not a {FORMAT_NAME} file.")
+        if self.header["version"] > FORMAT_VERSION:
+            self._raw.close()
+            raise ValueError(f"Snapshot format version {self.header['version']} is not supported.")
+        self._records = self._iter_records()
+        self._pending = None
+        self.deleted: Dict[str, List[str]] = {section: [] for section in SECTIONS}
+
+    def _iter_records(self) -> Iterator[dict]:
+        if self.header["encoding"] == "msgpack":
+            if not msgpack:
+                raise ValueError("Snapshot uses msgpack encoding but 'msgpack' is not installed.")
+            yield from msgpack.Unpacker(self._raw, raw=False)
+        else:
+            for line in self._raw:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _rows(self, section: str) -> Iterator[dict]:
+        while True:
+            record = self._pending if self._pending is not None else next(self._records, None)
+            self._pending = None
+            if record is None:
+                return
+            if record["section"] != section:
+                self._pending = record
+                return
+            if record["op"] == "delete":
+                self.deleted[section].extend(record["ids"])
+            else:
+                yield from _decode_columns(section, record["columns"])
+
+    def devices(self) -> Iterator[dict]:
+        return self._rows("devices")
+
+    def links(self) -> Iterator[dict]:
+        return self._rows("links")
+
+    def rings(self) -> Iterator[dict]:
+        return self._rows("rings")
+
+    def close(self):
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_snapshot(path: str, snapshot_dir: Optional[str] = None, _seen: Optional[set] = None) -> Dict[str, List[dict]]:
+    """
+    Liest einen Snapshot vollständig (Legacy-JSON oder kompakt). Delta-Snapshots werden
+    rekursiv auf ihren Basis-Snapshot angewendet.
+    """
+    if path.endswith(LEGACY_EXTENSION):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    snapshot_dir = snapshot_dir or os.path.dirname(path)
+    with SnapshotReader(path) as reader:
+        sections = {"devices": list(reader.devices()), "links": list(reader.links()), "rings": list(reader.rings())}
+        header, deleted = reader.header, reader.deleted
+    if header["kind"] != "delta":
+        return {"version": header.get("topology_version", "1.0.0"), **sections}
+
+    seen = (_seen or set()) | {os.path.abspath(path)}
+    base_path = snapshot_path(snapshot_dir, header["base"])
+    if not base_path or os.path.abspath(base_path) in seen:
+        raise ValueError(f"Base snapshot '{header['base']}' of delta '{path}' not found.")
+    topology = read_snapshot(base_path, snapshot_dir, seen)
+    # Ältere Deltas ohne Hash werden wie bisher angewendet
+    if header.get("base_digest") and topology_digest(topology) != header["base_digest"]:
+        raise ValueError(f"Base snapshot '{header['base']}' of delta '{path}' has changed since the delta was written.")
+    for section in SECTIONS:
+        rows_by_id = {row["id"]: row for row in topology.get(section, [])}
+        for row_id in deleted[section]:
+            rows_by_id.pop(row_id, None)
+        for row in sections[section]:
+            rows_by_id[row["id"]] = row
+        topology[section] = list(rows_by_id.values())
+    topology["version"] = header.get("topology_version", topology.get("version", "1.0.0"))
+    return topology
+
+
+def open_snapshot_for_loading(path: str, snapshot_dir: Optional[str] = None):
+    """
+    Liefert (snapshot_data, reader). Volle kompakte Snapshots werden als Streams übergeben,
+    damit der Bulk-Loader sie chunkweise verarbeiten kann; Legacy- und Delta-Snapshots
+    werden vollständig gelesen. reader muss (falls nicht None) nach dem Laden geschlossen werden.
+    """
+    if not path.endswith(LEGACY_EXTENSION):
+        reader = SnapshotReader(path)
+        if reader.header["kind"] == "full":
+            # Die drei Streams teilen sich den Reader und werden vom Loader nacheinander konsumiert
+            return {"devices": reader.devices(), "links": reader.links(), "rings": reader.rings(), "counts": reader.header["counts"]}, reader
+        reader.close()
+    return read_snapshot(path, snapshot_dir), None
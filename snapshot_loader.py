@@ -0,0 +1,156 @@
+#
+# UNOC - snapshot_loader.py
+#
+# Bulk-Loader für Snapshots: set-basierte Inserts in Chunks statt db.add()/flush() pro Gerät.
+# Unter PostgreSQL werden Geräte und Links per COPY geladen, sonst (z.B. SQLite) per
+# insert().returning() in Chunks. String-IDs werden im Speicher auf Integer-Keys aufgelöst.
+#
+
+import csv
+import io
+import json
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session as DBSessionType
+
+from database import Device, Link, Ring, ring_device_association
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# progress(stage, done, total) – z.B. für Fortschritts-Events über Socket.IO
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _noop_progress(stage: str, done: int, total: int):
+    pass
+
+
+def _supports_copy(db_session: DBSessionType) -> bool:
+    return db_session.get_bind().dialect.name == 'postgresql'
+
+
+def _copy_rows(db_session: DBSessionType, table_name: str, columns: list, rows: Iterable[tuple]):
+    """Schreibt Zeilen per PostgreSQL COPY ... FROM STDIN (CSV) über die psycopg2-Verbindung der Session."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+    cursor = db_session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _json_or_none(value) -> Optional[str]:
+    return None if value is None else json.dumps(value)
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_load_snapshot(db_session: DBSessionType, snapshot_data: dict, progress: ProgressCallback = _noop_progress, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Ersetzt die komplette Topologie durch den Snapshot-Inhalt in einer Transaktion mit einem Commit.
+    devices/links/rings dürfen beliebige Iterables sein (z.B. Streams eines SnapshotReaders) und
+    werden in dieser Reihenfolge chunkweise konsumiert; 'counts' liefert optional die Gesamtzahlen
+    für die Fortschrittsmeldungen. Gibt die Anzahl geladener Geräte, Links und Ringe zurück.
+    """
+    counts = snapshot_data.get('counts') or {}
+    devices = snapshot_data.get('devices', [])
+    links = snapshot_data.get('links', [])
+    use_copy = _supports_copy(db_session)
+    device_total = counts.get('devices', len(devices) if isinstance(devices, list) else 0)
+    link_total = counts.get('links', len(links) if isinstance(links, list) else 0)
+
+    try:
+        db_session.execute(delete(ring_device_association))
+        db_session.execute(delete(Link))
+        db_session.execute(delete(Ring))
+        db_session.execute(delete(Device))
+
+        # --- Geräte ---
+        device_pk_by_id_str: Dict[str, int] = {}
+        device_count = 0
+        for chunk in _chunks(devices, chunk_size):
+            device_rows = [
+                {"device_id_str": d['id'], "type": d['type'], "status": d['status'], "properties": d.get('properties') or {}, "coordinates": d.get('coordinates')}
+                for d in chunk
+            ]
+            if use_copy:
+                _copy_rows(db_session, Device.__tablename__, ["device_id_str", "type", "status", "properties", "coordinates"], (
+                    (r["device_id_str"], r["type"], r["status"], _json_or_none(r["properties"]), _json_or_none(r["coordinates"])) for r in device_rows
+                ))
+            else:
+                returned = db_session.execute(insert(Device.__table__).returning(Device.__table__.c.device_id_str, Device.__table__.c.id), device_rows)
+                device_pk_by_id_str.update(returned.all())
+            device_count += len(device_rows)
+            progress("devices", device_count, max(device_total, device_count))
+        if use_copy:
+            # COPY liefert keine Keys zurück: einmalig alle Zuordnungen lesen
+            device_pk_by_id_str.update(db_session.execute(select(Device.device_id_str, Device.id)).all())
+
+        # --- Links ---
+        link_count = 0
+        for chunk in _chunks(links, chunk_size):
+            link_rows = []
+            for link_data in chunk:
+                source_pk = device_pk_by_id_str.get(link_data['source'])
+                target_pk = device_pk_by_id_str.get(link_data['target'])
+                if source_pk is None or target_pk is None:
+                    raise ValueError(f"Device for link '{link_data['id']}' not found in snapshot.")
+                link_rows.append({"link_id_str": link_data['id'], "source_id": source_pk, "target_id": target_pk, "status": link_data['status'], "properties": link_data.get('properties') or {}})
+            if use_copy:
+                _copy_rows(db_session, Link.__tablename__, ["link_id_str", "source_id", "target_id", "status", "properties"], (
+                    (r["link_id_str"], r["source_id"], r["target_id"], r["status"], _json_or_none(r["properties"])) for r in link_rows
+                ))
+            else:
+                db_session.execute(insert(Link.__table__), link_rows)
+            link_count += len(link_rows)
+            progress("links", link_count, max(link_total, link_count))
+
+        rings = list(snapshot_data.get('rings', []))
+
+        # --- Ringe und Ring-Mitglieder (ein Statement für die gesamte Assoziationstabelle) ---
+        association_rows = []
+        if rings:
+            ring_rows = [{"ring_id_str": r['id'], "name": r['name'], "rpl_link_id_str": r['rpl_link_id']} for r in rings]
+            ring_pk_by_id_str = dict(db_session.execute(insert(Ring.__table__).returning(Ring.__table__.c.ring_id_str, Ring.__table__.c.id), ring_rows).all())
+            for ring_data in rings:
+                for node_id in ring_data['nodes']:
+                    if node_id not in device_pk_by_id_str:
+                        raise ValueError(f"Device '{node_id}' of ring '{ring_data['id']}' not found in snapshot.")
+                    association_rows.append({"ring_id": ring_pk_by_id_str[ring_data['id']], "device_id": device_pk_by_id_str[node_id]})
+            if association_rows:
+                db_session.execute(insert(ring_device_association), association_rows)
+        progress("rings", len(rings), len(rings))
+
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+    return {"devices": device_count, "links": link_count, "rings": len(rings)}
+
+
+def dump_topology(db_session: DBSessionType) -> Dict[str, list]:
+    """Liest die komplette Topologie im Snapshot-Format (devices, links, rings) mit vier Abfragen."""
+    devices = db_session.query(Device.id, Device.device_id_str, Device.type, Device.status, Device.properties, Device.coordinates).all()
+    links = db_session.query(Link.link_id_str, Link.source_id, Link.target_id, Link.status, Link.properties).all()
+    device_id_map = {d.id: d.device_id_str for d in devices}
+    # Ring-Mitglieder mit einer Abfrage der Assoziationstabelle statt N+1 über r.nodes
+    ring_members = {}
+    for ring_id, device_id in db_session.query(ring_device_association.c.ring_id, ring_device_association.c.device_id).all():
+        ring_members.setdefault(ring_id, []).append(device_id_map.get(device_id))
+    serialized_devices = [{"id": d.device_id_str, "type": d.type, "status": d.status, "properties": d.properties, "coordinates": d.coordinates} for d in devices]
+    serialized_links = [{"id": l.link_id_str, "source": device_id_map.get(l.source_id), "target": device_id_map.get(l.target_id), "status": l.status, "properties": l.properties} for l in links]
+    serialized_rings = [{"id": r.ring_id_str, "name": r.name, "rpl_link_id": r.rpl_link_id_str, "nodes": ring_members.get(r.id, [])} for r in db_session.query(Ring).all()]
+    return {"devices": serialized_devices, "links": serialized_links, "rings": serialized_rings}
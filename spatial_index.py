@@ -0,0 +1,152 @@
+#
+# UNOC - spatial_index.py
+#
+# Uniformes Gitter über Device.coordinates ([lon, lat]) für Viewport-Abfragen der Kartenansicht.
+# Eine Bounding-Box-Abfrage liest nur die überlappenden Zellen statt aller Geräte.
+# Das Gitter wird beim Graph-Aufbau gefüllt und über Change-Records aktuell gehalten.
+#
+
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+
+from commands import ChangeRecord
+
+DEFAULT_CELL_SIZE_DEG = 0.25  # ca. 28 km x 17 km in Deutschland
+
+# Wie im Frontend (ZOOM_THRESHOLD): bis zu dieser Zoomstufe zeigt die Karte nur das Backbone
+MAP_ZOOM_THRESHOLD = 7
+LOW_ZOOM_DEVICE_TYPES = ('Core Node',)
+LOW_ZOOM_LINK_TYPES = ('Backbone',)
+
+BBox = Tuple[float, float, float, float]  # min_lon, min_lat, max_lon, max_lat
+
+
+def _position(coordinates) -> Optional[Tuple[float, float]]:
+    if isinstance(coordinates, (list, tuple)) and len(coordinates) == 2:
+        try:
+            lon, lat = float(coordinates[0]), float(coordinates[1])
+        except (TypeError, ValueError):
+            return None
+        if math.isfinite(lon) and math.isfinite(lat):
+            return lon, lat
+    return None
+
+
+def parse_bbox(value: str) -> BBox:
+    """'min_lon,min_lat,max_lon,max_lat' -> Tupel; ValueError bei ungültigen Angaben."""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4 or not all(math.isfinite(p) for p in parts):
+        raise ValueError("bbox must be 'min_lon,min_lat,max_lon,max_lat'.")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox minimum must not exceed maximum.")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+class SpatialGrid:
+    """Zellen-Index device_id -> Position; Geräte ohne gültige Koordinaten werden nicht indiziert."""
+
+    def __init__(self, cell_size_deg: float = DEFAULT_CELL_SIZE_DEG):
+        self.cell_size = cell_size_deg
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self.cells: Dict[Tuple[int, int], Set[str]] = {}
+
+    def rebuild(self, graph: nx.DiGraph):
+        self.positions, self.cells = {}, {}
+        for node_id, node in graph.nodes(data=True):
+            self._insert(node_id, node.get('coordinates'))
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        for record in records:
+            if record.kind == 'device' and record.field == 'coordinates':
+                self._remove(record.object_id)
+                if graph.has_node(record.object_id):
+                    self._insert(record.object_id, graph.nodes[record.object_id].get('coordinates'))
+
+    def query(self, bbox: BBox) -> List[str]:
+        """Alle Geräte innerhalb der Bounding-Box (Ränder inklusive), unsortiert."""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        x0, y0 = self._cell(min_lon, min_lat)
+        x1, y1 = self._cell(max_lon, max_lat)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # Sehr große Box: über die belegten Zellen statt über den Zellbereich iterieren
+            candidate_cells = [ids for (x, y), ids in self.cells.items() if x0 <= x <= x1 and y0 <= y <= y1]
+        else:
+            candidate_cells = [self.cells[(x, y)] for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in self.cells]
+        result = []
+        for ids in candidate_cells:
+            for device_id in ids:
+                lon, lat = self.positions[device_id]
+                if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
+                    result.append(device_id)
+        return result
+
+    def diff(self, other: 'SpatialGrid') -> List[str]:
+        differences = []
+        for device_id in sorted(set(self.positions) ^ set(other.positions)):
+            differences.append(f"spatial index: device '{device_id}' indexed in only one grid")
+        for device_id in sorted(set(self.positions) & set(other.positions)):
+            if self.positions[device_id] != other.positions[device_id]:
+                differences.append(f"spatial index: position of '{device_id}' differs")
+        return differences
+
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def _insert(self, device_id: str, coordinates):
+        position = _position(coordinates)
+        if position is None:
+            return
+        self.positions[device_id] = position
+        self.cells.setdefault(self._cell(*position), set()).add(device_id)
+
+    def _remove(self, device_id: str):
+        position = self.positions.pop(device_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        self.cells[cell].discard(device_id)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+
+def query_viewport(graph: nx.DiGraph, grid: SpatialGrid, bbox: BBox, zoom: Optional[float] = None,
+                   cursor: Optional[str] = None, limit: int = 5000) -> dict:
+    """
+    Geräte in der Box (bei niedrigem Zoom nur das Backbone), nach ID sortiert und ab cursor
+    seitenweise. Links erscheinen auf der Seite ihres Quellgeräts (bzw. des Zielgeräts, wenn die
+    Quelle außerhalb liegt); Endpunkte außerhalb der Box kommen als boundary_devices mit.
+    """
+    low_zoom = zoom is not None and zoom <= MAP_ZOOM_THRESHOLD
+    in_box = grid.query(bbox)
+    if low_zoom:
+        in_box = [n for n in in_box if graph.nodes[n].get('type') in LOW_ZOOM_DEVICE_TYPES]
+    in_box.sort()
+    in_box_set = set(in_box)
+    start = bisect.bisect_right(in_box, cursor) if cursor is not None else 0
+    page = in_box[start:start + limit]
+    next_cursor = page[-1] if start + limit < len(in_box) else None
+
+    devices, links, boundary = [], [], {}
+    for device_id in page:
+        node = graph.nodes[device_id]
+        devices.append({"id": device_id, "type": node["type"], "status": node["status"], "properties": node["properties"], "coordinates": node["coordinates"]})
+        incident = [(device_id, t) for t in graph.successors(device_id)] + [(s, device_id) for s in graph.predecessors(device_id) if s not in in_box_set]
+        for source, target in incident:
+            edge = graph.edges[source, target]
+            if low_zoom and (edge.get('properties') or {}).get('typ') not in LOW_ZOOM_LINK_TYPES:
+                continue
+            links.append({"id": edge["link_id_str"], "source": source, "target": target, "status": edge["status"], "properties": edge["properties"]})
+            other = target if source == device_id else source
+            if other not in in_box_set and other not in boundary:
+                boundary[other] = {"id": other, "type": graph.nodes[other]["type"], "coordinates": graph.nodes[other]["coordinates"]}
+    return {
+        "devices": devices,
+        "links": links,
+        "boundary_devices": list(boundary.values()),
+        "total_devices": len(in_box),
+        "next_cursor": next_cursor,
+    }
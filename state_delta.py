@@ -0,0 +1,41 @@
+#
+# UNOC - state_delta.py
+#
+# Versionierte Delta-Updates für die WebSocket-Clients. Jede Änderung bekommt eine
+# fortlaufende Versionsnummer; die letzten Deltas werden für Resyncs vorgehalten.
+#
+
+import threading
+from collections import deque
+from typing import List, Optional
+
+
+class DeltaLog:
+    """Vergibt Versionsnummern für State-Deltas und hält die letzten N Deltas für Resyncs vor."""
+
+    def __init__(self, max_history: int = 500):
+        self.version = 0
+        self._history = deque(maxlen=max_history)
+        self._lock = threading.Lock()
+
+    def record(self, delta: dict) -> dict:
+        """Versieht ein Delta mit base_version/version und merkt es sich für spätere Resyncs."""
+        with self._lock:
+            delta["base_version"] = self.version
+            self.version += 1
+            delta["version"] = self.version
+            self._history.append(delta)
+            return delta
+
+    def since(self, version: int) -> Optional[List[dict]]:
+        """
+        Liefert alle Deltas nach der angegebenen Version in Reihenfolge.
+        None bedeutet, dass die Version nicht mehr (oder noch nie) abgedeckt ist und
+        der Client den vollständigen Zustand braucht.
+        """
+        with self._lock:
+            if version == self.version:
+                return []
+            if version > self.version or not self._history or self._history[0]["base_version"] > version:
+                return None
+            return [delta for delta in self._history if delta["version"] > version]
@@ -0,0 +1,155 @@
+#
+# UNOC - storage.py
+#
+# Austauschbares Storage-Backend hinter SessionLocal:
+#   - sql:    SQLAlchemy-Datenbank aus DATABASE_URL (PostgreSQL, dauerhaft)
+#   - memory: In-Memory-Store ohne externen Dienst (SQLite im Prozess). Optional wird der Zustand
+#             periodisch und beim Beenden als kompakter Snapshot gesichert und beim Start geladen.
+# Commands, Alarme, Serialisierung und Snapshot-Loader arbeiten unverändert gegen beide Backends,
+# da beide dieselben ORM-Sessions liefern. Der Memory-Store ist für Schulungen, Simulationen und
+# Tests gedacht und gehört immer genau einem Prozess (nicht mit mehreren Workern kombinieren).
+#
+
+import atexit
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+DEFAULT_PERSIST_INTERVAL_S = 30.0
+
+
+class SqlStorage:
+    """Dauerhafte Datenbank (PostgreSQL oder jede andere SQLAlchemy-URL)."""
+    name = "sql"
+
+    def __init__(self, database_url: str):
+        self.engine = create_engine(database_url)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        # Lock für den In-Memory-Zustand des Backends (STATE_LOCK); unabhängig von den Verbindungen
+        self.state_lock = threading.RLock()
+
+    def restore(self):
+        """Die Datenbank ist selbst dauerhaft; nichts zu laden."""
+
+    def persist(self) -> bool:
+        return False
+
+    def status(self) -> dict:
+        return {"backend": self.name, "dialect": self.engine.dialect.name}
+
+
+class MemoryStorage:
+    """
+    Eine einzige In-Memory-SQLite-Verbindung für alle Threads (StaticPool). Sessions verschiedener
+    Threads teilen sich diese Verbindung, daher hält jede Session state_lock vom Beginn bis zum Ende
+    ihrer Transaktion (Commit, Rollback oder Close). Der Lock wird vor dem Checkout genommen; Pool-Events
+    kämen zu spät und gingen bei geschachtelten Sessions eines Threads verloren (StaticPool meldet nur
+    einen Checkin). Das Backend nutzt state_lock auch als STATE_LOCK: mit zwei Locks würden sich
+    "erst Datenbank, dann Zustand" (z.B. Signalabfrage) und "erst Zustand, dann Datenbank"
+    (z.B. Verkehrs-Tick, Konsistenzprüfung) gegenseitig blockieren.
+    snapshot_path (leer = ohne Persistenz) wird nach Commits spätestens alle persist_interval_s
+    Sekunden und beim Beenden des Prozesses geschrieben; persist_interval_s=0 sichert nur beim Beenden.
+    """
+    name = "memory"
+
+    def __init__(self, snapshot_path: Optional[str] = None, persist_interval_s: float = DEFAULT_PERSIST_INTERVAL_S):
+        self.snapshot_path = snapshot_path or None
+        self.persist_interval_s = persist_interval_s
+        self.state_lock = threading.RLock()
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.dirty = False
+        self.last_persisted: Optional[float] = None
+        self._persist_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        event.listen(self.session_factory, "after_transaction_create", self._begin_transaction)
+        event.listen(self.session_factory, "after_transaction_end", self._end_transaction)
+        event.listen(self.session_factory, "after_commit", self._mark_dirty)
+
+    def _begin_transaction(self, session, transaction):
+        if transaction.parent is None:  # Savepoints laufen innerhalb der äußeren Transaktion
+            self.state_lock.acquire()
+
+    def _end_transaction(self, session, transaction):
+        if transaction.parent is None:
+            self.state_lock.release()
+
+    def _mark_dirty(self, session):
+        self.dirty = True
+
+    def restore(self):
+        """Lädt den gesicherten Snapshot in den leeren Store und startet die periodische Sicherung."""
+        from database import Device
+        from snapshot_format import open_snapshot_for_loading
+        from snapshot_loader import bulk_load_snapshot
+
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            with self.session_factory() as db:
+                if db.query(Device.id).first() is None:
+                    snapshot_data, reader = open_snapshot_for_loading(self.snapshot_path)
+                    try:
+                        counts = bulk_load_snapshot(db, snapshot_data)
+                    finally:
+                        if reader:
+                            reader.close()
+                    print(f"In-Memory-Store aus '{self.snapshot_path}' geladen ({counts['devices']} Geräte, {counts['links']} Links).")
+            self.dirty = False
+        if self.snapshot_path and self._thread is None:
+            atexit.register(self.close)
+            if self.persist_interval_s > 0:
+                self._thread = threading.Thread(target=self._persist_periodically, name="unoc-storage", daemon=True)
+                self._thread.start()
+
+    def persist(self) -> bool:
+        """Schreibt den aktuellen Stand als Snapshot, falls seit der letzten Sicherung committet wurde."""
+        if not self.snapshot_path or not self.dirty:
+            return False
+        from snapshot_format import write_snapshot
+        from snapshot_loader import dump_topology
+
+        with self._persist_lock:
+            self.dirty = False
+            with self.session_factory() as db:
+                topology = dump_topology(db)
+            os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+            write_snapshot(self.snapshot_path, topology)
+            self.last_persisted = time.time()
+        return True
+
+    def _persist_periodically(self):
+        while not self._stop.wait(self.persist_interval_s):
+            try:
+                self.persist()
+            except Exception as e:  # die Simulation läuft weiter, der nächste Versuch folgt im nächsten Intervall
+                self.dirty = True
+                print(f"WARN: In-Memory-Store konnte nicht nach '{self.snapshot_path}' gesichert werden: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.persist()
+
+    def status(self) -> dict:
+        return {
+            "backend": self.name,
+            "snapshot": self.snapshot_path,
+            "persist_interval_s": self.persist_interval_s,
+            "dirty": self.dirty,
+            "last_persisted": self.last_persisted,
+        }
+
+
+def create_storage(backend: str, database_url: Optional[str] = None, snapshot_path: Optional[str] = None,
+                   persist_interval_s: float = DEFAULT_PERSIST_INTERVAL_S):
+    if backend == "sql":
+        if not database_url:
+            raise ValueError("Keine DATABASE_URL in der .env-Datei gefunden (STORAGE_BACKEND=sql)!")
+        return SqlStorage(database_url)
+    if backend == "memory":
+        return MemoryStorage(snapshot_path, persist_interval_s)
+    raise ValueError(f"Unbekanntes STORAGE_BACKEND '{backend}' (erlaubt: sql, memory).")
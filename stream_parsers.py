@@ -0,0 +1,171 @@
+#
+# UNOC - stream_parsers.py
+#
+# Inkrementelles Einlesen großer Eingabedateien, ohne sie komplett in den Speicher zu laden:
+#   - GeoJSON: Features werden einzeln aus allen "features"-Arrays dekodiert
+#     (FeatureCollection oder Liste von FeatureCollections wie dg_network_data.json)
+#   - YAML-Topologien: Einträge der Top-Level-Listen (devices, links, ...) werden einzeln aus
+#     dem PyYAML-Eventstrom konstruiert
+#
+
+import json
+from typing import Dict, Iterable, Iterator, Tuple
+
+import yaml
+from yaml.events import (
+    AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent, SequenceEndEvent, SequenceStartEvent
+)
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+READ_CHUNK_SIZE = 1 << 16
+# libyaml-Parser, falls PyYAML mit C-Erweiterung installiert ist (um ein Vielfaches schneller)
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_WHITESPACE = " \t\r\n"
+
+
+# --- GeoJSON ---
+def iter_geojson_features(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[dict]:
+    """Liefert alle Features aus den "features"-Arrays der Datei nacheinander."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos = "", 0
+
+        def fill() -> bool:
+            nonlocal buffer, pos
+            data = f.read(chunk_size)
+            if not data:
+                return False
+            # Bereits verarbeiteten Teil verwerfen, damit der Puffer klein bleibt
+            buffer, pos = buffer[pos:] + data, 0
+            return True
+
+        def skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return
+
+        while True:
+            # Nächstes "features": [ suchen
+            index = buffer.find('"features"', pos)
+            if index < 0:
+                # Das Schlüsselwort kann über die Chunkgrenze gehen: ein Stück Puffer behalten
+                pos = max(pos, len(buffer) - len('"features"'))
+                if not fill():
+                    return
+                continue
+            pos = index + len('"features"')
+            skip(_WHITESPACE)
+            if buffer[pos:pos + 1] != ":":
+                continue
+            pos += 1
+            skip(_WHITESPACE)
+            if buffer[pos:pos + 1] != "[":
+                continue
+            pos += 1
+            while True:
+                skip(_WHITESPACE + ",")
+                if pos >= len(buffer):
+                    raise ValueError(f"Unexpected end of file in features array of '{path}'.")
+                if buffer[pos] == "]":
+                    pos += 1
+                    break
+                while True:
+                    try:
+                        feature, end = decoder.raw_decode(buffer, pos)
+                        break
+                    except json.JSONDecodeError:
+                        # Unvollständiges Objekt am Pufferende: nachladen und erneut versuchen
+                        if not fill():
+                            raise
+                pos = end
+                yield feature
+
+
+# --- YAML ---
+def _construct_item(events: Iterable, anchors: Dict[str, Node]) -> object:
+    """
+    Baut aus den Events eines einzelnen Eintrags einen YAML-Knoten und konstruiert ihn sicher.
+    anchors wird über die ganze Datei geteilt, damit Aliase auf frühere Einträge auflösbar bleiben.
+    """
+    resolver = yaml.resolver.Resolver()
+    stack = []
+    root = None
+    for event in events:
+        if isinstance(event, AliasEvent):
+            if event.anchor not in anchors:
+                raise ValueError(f"Unknown YAML alias '*{event.anchor}'.")
+            node = anchors[event.anchor]
+        elif isinstance(event, ScalarEvent):
+            tag = event.tag if event.tag not in (None, "!") else resolver.resolve(ScalarNode, event.value, event.implicit)
+            node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            node = SequenceNode(event.tag or resolver.DEFAULT_SEQUENCE_TAG, [], event.start_mark, None, flow_style=event.flow_style)
+        elif isinstance(event, MappingStartEvent):
+            node = MappingNode(event.tag or resolver.DEFAULT_MAPPING_TAG, [], event.start_mark, None, flow_style=event.flow_style)
+        else:  # SequenceEndEvent / MappingEndEvent
+            node = stack.pop()
+            if not stack:
+                root = node
+            continue
+        if getattr(event, "anchor", None) and not isinstance(event, AliasEvent):
+            anchors[event.anchor] = node
+
+        if stack:
+            parent = stack[-1]
+            if isinstance(parent, SequenceNode):
+                parent.value.append(node)
+            elif parent.value and len(parent.value[-1]) == 1:
+                parent.value[-1] = (parent.value[-1][0], node)
+            else:
+                parent.value.append((node,))
+        if isinstance(node, ScalarNode) or isinstance(event, AliasEvent):
+            if not stack:
+                root = node
+        else:
+            stack.append(node)
+    return yaml.constructor.SafeConstructor().construct_object(root, deep=True)
+
+
+def _collect_item(first_event, events: Iterator) -> list:
+    """Sammelt die Events eines vollständigen Knotens, beginnend mit first_event."""
+    collected = [first_event]
+    depth = 1 if isinstance(first_event, (MappingStartEvent, SequenceStartEvent)) else 0
+    while depth:
+        event = next(events)
+        collected.append(event)
+        if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+            depth -= 1
+    return collected
+
+
+def iter_yaml_sections(path: str, sections: Tuple[str, ...] = ("devices", "links")) -> Iterator[Tuple[str, object]]:
+    """
+    Liefert (section, item) für jeden Eintrag der Top-Level-Listen 'sections' in Dateireihenfolge.
+    Andere Top-Level-Schlüssel werden überlesen, ohne sie zu konstruieren.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        events = iter(yaml.parse(f, Loader=_YAML_LOADER))
+        anchors: Dict[str, Node] = {}
+        for event in events:
+            if isinstance(event, MappingStartEvent):
+                break
+        else:
+            return
+        for key_event in events:
+            if isinstance(key_event, MappingEndEvent):
+                return
+            key = key_event.value if isinstance(key_event, ScalarEvent) else None
+            _collect_item(key_event, events)  # komplexe Schlüssel vollständig überlesen
+            value_event = next(events)
+            if key in sections and isinstance(value_event, SequenceStartEvent):
+                for item_event in events:
+                    if isinstance(item_event, SequenceEndEvent):
+                        break
+                    yield key, _construct_item(_collect_item(item_event, events), anchors)
+            else:
+                _collect_item(value_event, events)
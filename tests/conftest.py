@@ -0,0 +1,53 @@
+#
+# UNOC - tests/conftest.py
+#
+# Gemeinsame Hilfen für die Tests: Modulpfad, SQLite statt PostgreSQL beim Import von database.py
+# und kleine In-Memory-Graphen im Format von graph_state.build_graph.
+#
+
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import networkx as nx
+import pytest
+
+
+def build_test_graph(devices, links, rings=()):
+    """
+    devices: (id, type) oder (id, type, properties); links: (id, source, target) oder
+    (id, source, target, status, properties); rings: (id, rpl_link_id, nodes).
+    """
+    graph = nx.DiGraph()
+    for device in devices:
+        device_id, device_type, properties = (tuple(device) + ({},))[:3]
+        graph.add_node(device_id, type=device_type, status='online', properties=dict(properties), coordinates=None)
+    link_endpoints = {}
+    for link in links:
+        link_id, source, target, status, properties = tuple(link) + ('up', {})[len(link) - 3:]
+        graph.add_edge(source, target, link_id_str=link_id, status=status, properties=dict(properties))
+        link_endpoints[link_id] = (source, target)
+    graph.graph["link_endpoints"] = link_endpoints
+    graph.graph["rings"] = {ring_id: {"id": ring_id, "name": ring_id, "rpl_link_id": rpl, "nodes": list(nodes)} for ring_id, rpl, nodes in rings}
+    return graph
+
+
+def build_graph_from_topology(topology: dict) -> nx.DiGraph:
+    """Graph aus einer Topologie im Snapshot-Format (z.B. topology_generator.generate_topology)."""
+    return build_test_graph(
+        [(d["id"], d["type"], d.get("properties") or {}) for d in topology["devices"]],
+        [(l["id"], l["source"], l["target"], l.get("status") or 'up', l.get("properties") or {}) for l in topology["links"]],
+        [(r["id"], r["rpl_link_id"], r["nodes"]) for r in topology["rings"]],
+    )
+
+
+@pytest.fixture
+def make_graph():
+    return build_test_graph
+
+
+@pytest.fixture
+def graph_from_topology():
+    return build_graph_from_topology
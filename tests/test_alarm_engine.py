@@ -0,0 +1,85 @@
+#
+# UNOC - tests/test_alarm_engine.py
+#
+# AlarmEngine: parallele Raise/Clear-Auswertungen für dieselben Alarme gegen eine SQLite-Datei
+# (eine Session pro Thread wie bei Requests und Verkehrs-Ticks).
+#
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from alarm_engine import LOSS_OF_SIGNAL, AlarmCheck, AlarmEngine
+from database import Alarm, Base
+
+THREADS = 8
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'alarms.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _check(device_id: str, raised: bool) -> AlarmCheck:
+    return AlarmCheck('device', device_id, LOSS_OF_SIGNAL, "CRITICAL", raised)
+
+
+def _run_concurrently(session_factory, engine: AlarmEngine, checks_for_thread) -> list:
+    """Startet THREADS Auswertungen gleichzeitig; liefert die geänderten Alarme bzw. Fehler pro Thread."""
+    barrier = threading.Barrier(THREADS)
+    outcomes = [None] * THREADS
+
+    def work(i):
+        with session_factory() as db:
+            barrier.wait()
+            try:
+                outcomes[i] = engine.evaluate(db, checks_for_thread(i))
+            except Exception as e:
+                outcomes[i] = e
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    return outcomes
+
+
+def _active_rows(session_factory) -> list:
+    with session_factory() as db:
+        return sorted((a.affected_object_id, a.description) for a in db.execute(select(Alarm).where(Alarm.status == 'ACTIVE')).scalars())
+
+
+def test_concurrent_raise_and_clear_of_same_alarm(session_factory):
+    engine = AlarmEngine()
+
+    raised = _run_concurrently(session_factory, engine, lambda i: [_check("ONT-1", True)])
+    assert not any(isinstance(outcome, Exception) for outcome in raised), raised
+    assert sum(len(outcome) for outcome in raised) == 1
+    assert _active_rows(session_factory) == [("ONT-1", LOSS_OF_SIGNAL)]
+
+    cleared = _run_concurrently(session_factory, engine, lambda i: [_check("ONT-1", False)])
+    assert not any(isinstance(outcome, Exception) for outcome in cleared), cleared
+    assert [alarm["status"] for outcome in cleared for alarm in outcome] == ["CLEARED"]
+    assert _active_rows(session_factory) == [] and engine.active == {}
+
+
+def test_interleaved_raise_and_clear_keep_index_and_database_in_sync(session_factory):
+    engine = AlarmEngine()
+    devices = [f"ONT-{n}" for n in range(4)]
+
+    for round_number in range(5):
+        # Gerade Threads heben, ungerade clearen dieselben Alarme
+        outcomes = _run_concurrently(session_factory, engine, lambda i: [_check(device_id, (i + round_number) % 2 == 0) for device_id in devices])
+        assert not any(isinstance(outcome, Exception) for outcome in outcomes), outcomes
+        assert _active_rows(session_factory) == sorted(engine.active)
+
+    fresh = AlarmEngine()
+    with session_factory() as db:
+        fresh.rebuild(db)
+    assert engine.diff(fresh) == []
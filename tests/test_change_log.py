@@ -0,0 +1,111 @@
+#
+# UNOC - tests/test_change_log.py
+#
+# ChangeLog: Replay nach Sequenznummer und Zeitpunkt auf beiden Seiten eines reset-Checkpoints,
+# Events ab einer Sequenznummer und Wiederaufnahme eines bestehenden Verzeichnisses.
+#
+
+import datetime
+
+import pytest
+
+import change_log
+from change_log import ChangeLog, alarm_events, record_events
+from commands import ChangeRecord
+
+START = datetime.datetime(2026, 10, 18, 14, 0, tzinfo=datetime.timezone.utc)
+
+
+def _minute(n: int) -> datetime.datetime:
+    return START + datetime.timedelta(minutes=n)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Jeder neue Zeitstempel liegt eine Minute nach dem vorigen (t0 = START)."""
+    real = change_log.utc_timestamp
+    ticks = iter(range(10_000))
+    monkeypatch.setattr(change_log, "utc_timestamp", lambda moment=None: real(moment if moment is not None else _minute(next(ticks))))
+
+
+def _state(devices, links, alarms=(), config=None) -> dict:
+    return {"devices": [dict(d) for d in devices], "links": [dict(l) for l in links], "rings": [], "alarms": list(alarms), "config": config or {}}
+
+
+ALARM = {"id": 1, "status": "ACTIVE", "affected_object_id": "ONT-1", "description": "Loss of Signal"}
+
+
+@pytest.fixture
+def populated(tmp_path, clock):
+    """
+    t0 Checkpoint (seq 0), t1-t3 Events 1-3, t4 reset-Event 4 und t5 reset-Checkpoint (Snapshot geladen,
+    mit ONT-2), t6 Event 5.
+    """
+    log = ChangeLog(str(tmp_path / "changelog"))
+    log.checkpoint(_state([{"id": "ONT-1", "status": "online"}], [{"id": "l1", "status": "up"}]))
+    log.append(record_events([ChangeRecord('link', 'l1', 'status', 'up', 'down')]))
+    log.append(alarm_events([ALARM]))
+    log.append([{"type": "config", "name": "virtual_router", "old": {}, "new": {"vlan_tag": 7}}])
+    log.checkpoint(_state([{"id": "ONT-1", "status": "online"}, {"id": "ONT-2", "status": "online"}], [{"id": "l1", "status": "up"}]), reason="reset")
+    log.append(record_events([ChangeRecord('device', 'ONT-2', 'status', 'online', 'offline')]))
+    return log
+
+
+def _statuses(state: dict) -> dict:
+    return {**{d["id"]: d["status"] for d in state["devices"]}, **{l["id"]: l["status"] for l in state["links"]}}
+
+
+def test_replay_by_seq_before_reset(populated):
+    state = populated.replay(seq=2)
+    assert (state["seq"], state["checkpoint_seq"], state["replayed_events"]) == (2, 0, 2)
+    assert _statuses(state) == {"ONT-1": "online", "l1": "down"}
+    assert state["alarms"] == [ALARM] and state["config"] == {}
+    assert populated.replay(seq=3)["config"] == {"virtual_router": {"vlan_tag": 7}}
+
+
+def test_replay_by_seq_after_reset(populated):
+    at_reset = populated.replay(seq=4)
+    assert (at_reset["seq"], at_reset["checkpoint_seq"], at_reset["replayed_events"]) == (4, 4, 0)
+    assert _statuses(at_reset) == {"ONT-1": "online", "ONT-2": "online", "l1": "up"}
+    latest = populated.replay()
+    assert (latest["seq"], latest["checkpoint_seq"]) == (5, 4)
+    assert _statuses(latest)["ONT-2"] == "offline" and latest["alarms"] == []
+
+
+def test_replay_by_time_on_both_sides_of_reset(populated):
+    assert populated.replay(at=_minute(-1)) is None
+    before = populated.replay(at=_minute(3) + datetime.timedelta(seconds=30))
+    assert before["seq"] == 3 and _statuses(before)["l1"] == "down"
+    # Zwischen reset-Event und reset-Checkpoint: Replay stoppt am reset, neuere Events gehören zum neuen Stand
+    between = populated.replay(at=_minute(4) + datetime.timedelta(seconds=30))
+    assert between["seq"] == 3 and between["checkpoint_seq"] == 0
+    after = populated.replay(at=_minute(6).replace(tzinfo=None))  # ohne Zeitzone = UTC
+    assert (after["seq"], after["checkpoint_seq"]) == (5, 4)
+    assert _statuses(after)["ONT-2"] == "offline"
+
+
+def test_events_since_start_at_nearest_checkpoint(populated):
+    assert [event["seq"] for event in populated.events(since=2)] == [3, 4, 5]
+    assert [event["type"] for event in populated.events(since=3)] == ["reset", "status"]
+    assert [event["seq"] for event in populated.events(since=4)] == [5]
+    assert [event["seq"] for event in populated.events(since=0, limit=2)] == [1, 2]
+
+
+def test_reload_recovers_seq_and_checkpoints(populated):
+    reloaded = ChangeLog(populated.directory)
+    assert reloaded.status()["seq"] == 5 and reloaded.status()["checkpoints"] == 2
+    assert reloaded.last_ts == populated.last_ts
+    assert reloaded.append([{"type": "config", "name": "virtual_router", "old": {}, "new": {}}]) == 6
+    assert _statuses(ChangeLog(populated.directory).replay()) == _statuses(populated.replay(seq=5))
+
+
+def test_reload_drops_truncated_last_event(populated):
+    with open(populated.events_path, 'ab') as f:
+        f.write(b'{"seq":6,"ts":"2026-10-18T14:0')  # Absturz beim Schreiben
+    reloaded = ChangeLog(populated.directory)
+    assert reloaded.seq == 5
+    reloaded.append(record_events([ChangeRecord('link', 'l1', 'status', 'up', 'down')]))
+    again = ChangeLog(populated.directory)
+    assert again.seq == 6
+    assert [event["seq"] for event in again.events(since=4)] == [5, 6]
+    assert _statuses(again.replay())["l1"] == "down"
@@ -0,0 +1,41 @@
+#
+# UNOC - tests/test_emission_scheduler.py
+#
+# Drosselung im Emission-Scheduler: nur bestätigende Clients führen eine Liste unbestätigter Frames.
+#
+
+from emission_scheduler import EmissionScheduler
+
+
+def _scheduler(sent):
+    return EmissionScheduler(lambda event, payload, to=None, skip_sid=None: sent.append((event, payload, to, skip_sid)),
+                             lambda version: [], window_ms=0, max_in_flight=4)
+
+
+def _delta(version):
+    return {"base_version": version - 1, "version": version, "devices": {}, "links": {}}
+
+
+def test_non_acking_client_does_not_accumulate_in_flight():
+    sent = []
+    scheduler = _scheduler(sent)
+    scheduler.register("a", 0)
+    for version in range(1, 101):
+        scheduler.delta(_delta(version))
+    state = scheduler.clients["a"]
+    assert state.sent_version == 100
+    assert state.in_flight == []
+    assert len([frame for frame in sent if frame[0] == 'state_delta']) == 100
+
+
+def test_acking_client_is_throttled_and_caught_up():
+    sent = []
+    scheduler = _scheduler(sent)
+    scheduler.register("a", 0)
+    scheduler.ack("a", 0)
+    for version in range(1, 11):
+        scheduler.delta(_delta(version))
+    state = scheduler.clients["a"]
+    assert len(state.in_flight) == 4
+    assert state.stale
+    assert scheduler.counters["dropped"] == 6
@@ -0,0 +1,125 @@
+#
+# UNOC - tests/test_history.py
+#
+# UndoHistory: Tiefenbegrenzung, Auslagern ins Journal mit Nachladen über den Offset, Wiederaufbau
+# beider Stacks nach einem Neustart, Kompaktierung und abgebrochene letzte Journalzeilen.
+#
+
+import pytest
+
+import history
+from commands import ChangeRecord
+from history import UndoHistory
+
+
+def _records(n: int):
+    """Records einer Aktion; die Beschreibung macht sie groß genug für das Speicherlimit."""
+    return (ChangeRecord('link', f"link-{n}", 'status', 'up', 'down'),
+            ChangeRecord('device', f"ONT-{n}", 'properties', {}, {"description": "x" * 200, "n": n}))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "undo_journal.jsonl")
+
+
+def _undo_all(undo_history: UndoHistory) -> list:
+    """Macht alle Aktionen rückgängig und liefert ihre Nummern (neueste zuerst)."""
+    undone = []
+    while undo_history.peek_undo() is not None:
+        undone.append(int(undo_history.peek_undo()[0].object_id.split("-")[1]))
+        undo_history.commit_undo()
+    return undone
+
+
+def test_push_beyond_max_depth_drops_oldest(journal):
+    undo_history = UndoHistory(journal, max_depth=3)
+    for n in range(1, 6):
+        undo_history.push(_records(n), f"action {n}")
+    assert undo_history.stats()["undo_depth"] == 3
+    assert _undo_all(undo_history) == [5, 4, 3]
+    assert undo_history.peek_redo() == _records(3)
+
+
+def test_push_clears_redo_stack(journal):
+    undo_history = UndoHistory(journal)
+    undo_history.push(_records(1))
+    undo_history.push(_records(2))
+    undo_history.commit_undo()
+    undo_history.push(_records(3))
+    assert undo_history.peek_redo() is None
+    assert _undo_all(undo_history) == [3, 1]
+
+
+def test_spill_under_memory_cap_reloads_records_by_offset(journal):
+    undo_history = UndoHistory(journal, max_memory_bytes=1000)
+    for n in range(1, 11):
+        undo_history.push(_records(n))
+    stats = undo_history.stats()
+    assert stats["spilled_entries"] > 0
+    assert stats["memory_bytes"] <= 1000
+    # Ausgelagerte Einträge kommen beim Undo unverändert aus dem Journal zurück
+    for n in range(10, 0, -1):
+        assert undo_history.peek_undo() == _records(n)
+        undo_history.commit_undo()
+    assert undo_history.stats()["memory_bytes"] <= 1000
+
+
+def test_spill_without_journal_drops_oldest_entries():
+    undo_history = UndoHistory(None, max_memory_bytes=1000)
+    for n in range(1, 11):
+        undo_history.push(_records(n))
+    assert 0 < undo_history.stats()["undo_depth"] < 10
+    assert undo_history.peek_undo() == _records(10)
+
+
+def test_restart_rebuilds_undo_and_redo_stacks(journal):
+    undo_history = UndoHistory(journal)
+    for n in range(1, 5):
+        undo_history.push(_records(n), f"action {n}")
+    undo_history.commit_undo()  # 4
+    undo_history.commit_undo()  # 3
+    undo_history.commit_redo()  # 3
+
+    restarted = UndoHistory(journal)
+    assert restarted.stats()["undo_depth"] == 3 and restarted.stats()["redo_depth"] == 1
+    assert restarted.peek_undo() == _records(3)
+    assert restarted.peek_redo() == _records(4)
+    restarted.commit_redo()
+    restarted.push(_records(5))
+    assert _undo_all(UndoHistory(journal)) == [5, 4, 3, 2, 1]
+
+
+def test_compaction_keeps_offsets_valid(journal, monkeypatch):
+    monkeypatch.setattr(history, "COMPACT_SLACK_LINES", 5)
+    undo_history = UndoHistory(journal, max_depth=4, max_memory_bytes=1000)
+    for n in range(1, 13):
+        undo_history.push(_records(n))
+        if n % 3 == 0:
+            undo_history.commit_undo()
+            undo_history.commit_redo()
+    undo_history.commit_undo()  # 12 liegt danach auf dem Redo-Stack
+    with open(journal, encoding="utf-8") as f:
+        assert sum(1 for _ in f) <= undo_history.stats()["undo_depth"] + 2 * undo_history.stats()["redo_depth"] + 5
+    assert undo_history.stats()["spilled_entries"] > 0
+
+    # Nachladen über die neu geschriebenen Offsets, im laufenden Prozess und nach einem Neustart
+    assert undo_history.peek_redo() == _records(12)
+    assert _undo_all(undo_history) == [11, 10, 9]
+    restarted = UndoHistory(journal, max_depth=4, max_memory_bytes=1000)
+    assert restarted.peek_redo() == _records(9)
+    assert _undo_all(restarted) == []
+
+
+def test_truncated_last_line_is_skipped(journal):
+    undo_history = UndoHistory(journal)
+    undo_history.push(_records(1))
+    undo_history.push(_records(2))
+    with open(journal, 'ab') as f:
+        f.write(b'{"op":"do","seq":3,"label":"abgebro')  # Absturz beim Schreiben
+
+    restarted = UndoHistory(journal)
+    assert restarted.peek_undo() == _records(2)
+    # Die nächste Aktion darf nicht an den abgebrochenen Rest angehängt werden
+    restarted.push(_records(3))
+    assert _undo_all(UndoHistory(journal)) == [3, 2, 1]
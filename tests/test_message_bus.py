@@ -0,0 +1,226 @@
+#
+# UNOC - tests/test_message_bus.py
+#
+# RedisBus gegen den Stand-in-Server auf einem freien Port: Zustellung zwischen zwei Clients, erneutes
+# Abonnieren nach einem Verbindungsabbruch, rediss:// über TLS und handle_bus_message im Backend.
+#
+
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import message_bus
+from message_bus import RedisBus, StandInServer, create_bus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def _serve(server: StandInServer):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def server():
+    server = _serve(StandInServer("127.0.0.1", 0))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def buses(server, monkeypatch):
+    monkeypatch.setattr(message_bus, "RECONNECT_DELAY_S", 0.05)
+    url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+    created = [RedisBus(url), RedisBus(url)]
+    yield created
+    for bus in created:
+        bus.close()
+
+
+def _subscribed(server, channel: str) -> bool:
+    with server.lock:
+        return any(channel in channels for channels in server.subscribers.values())
+
+
+def test_publish_reaches_subscriber_of_other_client(server, buses):
+    first, second = buses
+    received, other = [], []
+    first.subscribe("unoc", received.append)
+    first.subscribe("unoc", other.append)
+    assert _wait_for(lambda: _subscribed(server, "unoc"))
+
+    second.publish("unoc", {"origin": "worker-b", "type": "event", "message": "hello"})
+    second.publish("elsewhere", {"origin": "worker-b", "type": "event", "message": "ignored"})
+    assert _wait_for(lambda: len(received) == 1)
+    assert received == other == [{"origin": "worker-b", "type": "event", "message": "hello"}]
+
+    # Ein später abonnierter Kanal läuft über die bestehende Verbindung
+    late = []
+    first.subscribe("late", late.append)
+    assert _wait_for(lambda: _subscribed(server, "late"))
+    second.publish("late", {"type": "event"})
+    assert _wait_for(lambda: late == [{"type": "event"}])
+
+
+def test_reconnect_resubscribes_all_channels(server, buses):
+    first, second = buses
+    received = []
+    first.subscribe("unoc", received.append)
+    first.subscribe("other", received.append)
+    assert _wait_for(lambda: _subscribed(server, "unoc") and _subscribed(server, "other"))
+
+    # Serverseitig abbrechen: der Listener verbindet neu und abonniert beide Kanäle erneut
+    with server.lock:
+        handlers = list(server.subscribers)
+    for handler in handlers:
+        handler.connection.shutdown(socket.SHUT_RDWR)
+    assert _wait_for(lambda: not any(handler in server.subscribers for handler in handlers))
+    assert _wait_for(lambda: _subscribed(server, "unoc") and _subscribed(server, "other"))
+
+    second.publish("unoc", {"n": 1})
+    second.publish("other", {"n": 2})
+    assert _wait_for(lambda: received == [{"n": 1}, {"n": 2}])
+
+
+class _TlsStandInServer(StandInServer):
+    """Stand-in-Server, der jede Verbindung serverseitig in TLS einpackt."""
+
+    def __init__(self, context: ssl.SSLContext):
+        super().__init__("127.0.0.1", 0)
+        self.context = context
+
+    def get_request(self):
+        sock, address = super().get_request()
+        return self.context.wrap_socket(sock, server_side=True), address
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl wird für das Testzertifikat benötigt")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost", "-keyout", str(key), "-out", str(cert)],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def test_rediss_connects_over_tls(certificate, monkeypatch):
+    cert, key = certificate
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    server = _serve(_TlsStandInServer(context))
+    monkeypatch.setenv("SSL_CERT_FILE", str(cert))  # der Standard-Kontext vertraut dem Testzertifikat
+    bus = create_bus(f"rediss://localhost:{server.server_address[1]}/0")
+    try:
+        assert isinstance(bus, RedisBus) and bus.ssl_context is not None
+        received = []
+        bus.subscribe("unoc", received.append)
+        assert _wait_for(lambda: server.subscribers)
+        bus.publish("unoc", {"type": "event", "message": "tls"})
+        assert _wait_for(lambda: received == [{"type": "event", "message": "tls"}])
+        assert isinstance(bus._publish_conn[0], ssl.SSLSocket)
+    finally:
+        bus.close()
+        server.shutdown()
+        server.server_close()
+
+
+
+# Ein Worker (worker-a) mit RedisBus gegen einen Stand-in-Server im selben Prozess; ein zweiter RedisBus
+# spielt den anderen Worker. Dessen Records sind hier nicht in die Datenbank geschrieben, daher ohne
+# Konsistenzprüfung.
+WORKER_SCRIPT = r"""
+import os, sys, threading, time, traceback
+from message_bus import RedisBus, StandInServer
+
+server = StandInServer("127.0.0.1", 0)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+os.environ["UNOC_BUS_URL"] = f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+import backend
+from commands import ChangeRecord
+from database import SessionLocal, init_db
+from snapshot_loader import bulk_load_snapshot
+from topology_generator import generate_topology
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not predicate():
+        time.sleep(0.02)
+    assert predicate()
+
+try:
+    topology = generate_topology(100, seed=7, onts_per_splitter=8, splitters_per_nvt=2, nvts_per_olt=2, olts_per_pop=1, pops_per_ring=1)
+    types = {d["id"]: d["type"] for d in topology["devices"]}
+    drops = [l for l in topology["links"] if types[l["target"]] == "ONT"]
+    init_db()
+    with SessionLocal() as db:
+        bulk_load_snapshot(db, topology)
+        backend.build_graph_from_db(db, publish=False)
+
+    other = RedisBus(backend.BUS_URL)
+    received = []
+    other.subscribe(backend.BUS_CHANNEL, received.append)
+    wait_for(lambda: sum(1 for channels in server.subscribers.values() if backend.BUS_CHANNEL in channels) == 2)
+    graph = backend.app_state["graph"]
+    link, ont = drops[0]["id"], drops[0]["target"]
+    edge = graph.edges[drops[0]["source"], ont]
+    rows = [["link", link, "status", "up", "down"]]
+
+    # Eigene Nachrichten (gleiche origin) werden ignoriert; die folgende fremde Nachricht dient als Marke
+    other.publish(backend.BUS_CHANNEL, {"origin": backend.WORKER_ID, "type": "records", "records": rows})
+    other.publish(backend.BUS_CHANNEL, {"origin": "worker-b", "type": "event", "message": "marker"})
+    wait_for(lambda: any(m.get("message") == "marker" for m in received))
+    time.sleep(0.2)
+    assert edge["status"] == "up", "eigene Nachricht wurde angewendet"
+
+    # Records eines anderen Workers patchen Graph und Indizes
+    other.publish(backend.BUS_CHANNEL, {"origin": "worker-b", "type": "records", "records": rows})
+    wait_for(lambda: edge["status"] == "down")
+    assert backend.app_state["path_index"].serving_head_end(ont) is None
+
+    # Historie des anderen Workers: push, dann undo
+    other.publish(backend.BUS_CHANNEL, {"origin": "worker-b", "type": "history", "op": "push", "label": "remote", "records": rows})
+    history = backend.app_state["history"]
+    wait_for(lambda: history.peek_undo() == (ChangeRecord("link", link, "status", "up", "down"),))
+    other.publish(backend.BUS_CHANNEL, {"origin": "worker-b", "type": "history", "op": "undo"})
+    wait_for(lambda: history.peek_undo() is None and history.peek_redo() is not None)
+
+    # Lokale Änderungen gehen mit eigener origin an die anderen Worker
+    client = backend.app.test_client()
+    other_link = drops[1]["id"]
+    assert client.post(f"/api/links/{other_link}/status", json={"status": "down"}).status_code == 200
+    wait_for(lambda: any(m["origin"] == backend.WORKER_ID and m["type"] == "records" and m["records"][0][1] == other_link for m in received))
+    print("OK")
+except BaseException:
+    traceback.print_exc()
+sys.stdout.flush()
+sys.stderr.flush()
+os._exit(0)
+"""
+
+
+def test_worker_applies_remote_messages_and_ignores_own(tmp_path):
+    env = dict(os.environ, STORAGE_BACKEND="sql", DATABASE_URL=f"sqlite:///{tmp_path / 'unoc.db'}", GRAPH_CONSISTENCY_CHECK="0",
+               WORKER_ID="worker-a", HISTORY_JOURNAL=str(tmp_path / "undo_journal.jsonl"), CHANGE_LOG_DIR=str(tmp_path / "changelog"))
+    result = subprocess.run([sys.executable, "-c", WORKER_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert result.stdout.strip().endswith("OK"), result.stdout[-2000:] + result.stderr[-2000:]
@@ -0,0 +1,107 @@
+#
+# UNOC - tests/test_optical_budget.py
+#
+# BudgetEngine: inkrementell verschobene Präfixsummen nach Property-Änderungen und deren Undo
+# gegen eine frische Berechnung mit compute_bulk_budget.
+#
+
+import pytest
+
+from commands import ChangeRecord
+from optical_budget import BudgetEngine, budget_changed, compute_bulk_budget
+from path_index import PathIndex
+from topology_generator import generate_topology
+
+HEAD_END_TYPES = ('OLT', 'AON Switch')
+END_DEVICE_TYPES = ('ONT', 'Business NT')
+SMALL = {"onts_per_splitter": 8, "splitters_per_nvt": 2, "nvts_per_olt": 2, "olts_per_pop": 1, "pops_per_ring": 1, "business_per_pop": 1}
+
+
+@pytest.fixture
+def network(graph_from_topology):
+    graph = graph_from_topology(generate_topology(200, seed=3, **SMALL))
+    path_index = PathIndex(HEAD_END_TYPES)
+    path_index.rebuild(graph)
+    engine = BudgetEngine(END_DEVICE_TYPES)
+    engine.rebuild(graph)
+    engine.results(graph, path_index.tree())  # Präfixsummen aufbauen
+    return graph, path_index, engine
+
+
+def _set_properties(graph, kind, object_id, **changes):
+    """Ändert Properties im Graphen wie ein Command und liefert den ChangeRecord."""
+    if kind == 'link':
+        data = graph.edges[graph.graph["link_endpoints"][object_id]]
+    else:
+        data = graph.nodes[object_id]
+    old = dict(data['properties'])
+    data['properties'] = {**old, **changes}
+    return ChangeRecord(kind, object_id, 'properties', old, dict(data['properties']))
+
+
+def _undo(graph, record):
+    inverse = record.inverted()
+    if inverse.kind == 'link':
+        graph.edges[graph.graph["link_endpoints"][inverse.object_id]]['properties'] = dict(inverse.new)
+    else:
+        graph.nodes[inverse.object_id]['properties'] = dict(inverse.new)
+    return inverse
+
+
+def _fresh(graph, path_index, device_ids=None):
+    return compute_bulk_budget(graph, path_index.tree(), END_DEVICE_TYPES, device_ids)
+
+
+def _feeder_and_splitter(graph, path_index):
+    """Ein Link im Baum mit mehreren Endgeräten darunter und ein Splitter im Baum."""
+    splitter = next(node for node, data in graph.nodes(data=True) if data['type'] == 'Splitter' and node in path_index.depth)
+    parent = path_index.parent[splitter]
+    link_id = graph.edges[parent, splitter]['link_id_str']
+    return link_id, splitter
+
+
+def test_budget_changed_ignores_non_budget_properties():
+    assert not budget_changed(ChangeRecord('link', 'l1', 'properties', {'utilization': 1}, {'utilization': 2}))
+    assert not budget_changed(ChangeRecord('link', 'l1', 'status', 'up', 'down'))
+    assert budget_changed(ChangeRecord('link', 'l1', 'properties', {'length_km': 1}, {'length_km': 20}))
+    assert budget_changed(ChangeRecord('device', 's1', 'properties', {}, {'insertion_loss_db': 30}))
+
+
+def test_link_property_change_and_undo_match_fresh_budget(network):
+    graph, path_index, engine = network
+    link_id, splitter = _feeder_and_splitter(graph, path_index)
+    before = _fresh(graph, path_index)
+
+    record = _set_properties(graph, 'link', link_id, length_km=80.0, connector_count=20)
+    engine.apply_changes(graph, [record])
+    changed = engine.results(graph, path_index.tree())
+    assert changed == _fresh(graph, path_index)
+    below = path_index.end_devices_below(graph, splitter, END_DEVICE_TYPES)
+    assert below and all(changed[device_id]["status"] == "LOS" for device_id in below)
+
+    engine.apply_changes(graph, [_undo(graph, record)])
+    assert engine.results(graph, path_index.tree()) == before
+
+
+def test_splitter_change_and_undo_match_fresh_budget(network):
+    graph, path_index, engine = network
+    _, splitter = _feeder_and_splitter(graph, path_index)
+    before = _fresh(graph, path_index)
+
+    record = _set_properties(graph, 'device', splitter, insertion_loss_db=35.0)
+    engine.apply_changes(graph, [record])
+    assert engine.results(graph, path_index.tree()) == _fresh(graph, path_index)
+
+    engine.apply_changes(graph, [_undo(graph, record)])
+    assert engine.results(graph, path_index.tree()) == before
+
+
+def test_single_query_after_status_change_uses_current_properties(network):
+    graph, path_index, engine = network
+    link_id, splitter = _feeder_and_splitter(graph, path_index)
+    device_id = path_index.end_devices_below(graph, splitter, END_DEVICE_TYPES)[0]
+
+    # Statusänderung verwirft die Präfixsummen; die Einzelabfrage geht dann über die Parent-Kette
+    engine.apply_changes(graph, [ChangeRecord('link', 'unrelated', 'status', 'up', 'down'), _set_properties(graph, 'link', link_id, splice_count=12)])
+    assert engine.cumulative is None
+    assert engine.result(graph, path_index.tree(), device_id) == _fresh(graph, path_index, [device_id])[device_id]
@@ -0,0 +1,69 @@
+#
+# UNOC - tests/test_ring_engine.py
+#
+# ERPS-Planung: Ringlinks aus der Knotenfolge, Failover/Rückschaltung und Sub-Ringe, die sich zwei
+# Knoten mit dem Major-Ring teilen.
+#
+
+import pytest
+
+from ring_engine import RingEngine
+
+# Major-Ring A-B-C-D (RPL D-A) und Sub-Ring B-X-Y-C (RPL X-Y); B-C gehört nur zum Major-Ring
+DEVICES = [(node_id, 'Aggregation Switch') for node_id in ("A", "B", "C", "D", "X", "Y")]
+LINKS = [("ab", "A", "B"), ("bc", "B", "C"), ("cd", "C", "D"), ("da", "D", "A", 'blocking'),
+         ("bx", "B", "X"), ("xy", "X", "Y", 'blocking'), ("yc", "Y", "C")]
+RINGS = [("major", "da", ["A", "B", "C", "D"]), ("sub", "xy", ["B", "X", "Y", "C"])]
+
+
+@pytest.fixture
+def rings(make_graph):
+    def build(revertive=True):
+        graph = make_graph(DEVICES, LINKS, RINGS)
+        engine = RingEngine(revertive=revertive)
+        engine.rebuild(graph)
+        return graph, engine
+    return build
+
+
+def _apply(graph, changes):
+    for link_id, status in changes.items():
+        graph.edges[graph.graph["link_endpoints"][link_id]]['status'] = status
+
+
+def test_ring_links_follow_node_sequence(rings):
+    _, engine = rings()
+    assert engine.rings["major"]["links"] == ["ab", "bc", "cd", "da"]
+    assert engine.rings["sub"]["links"] == ["bx", "xy", "yc"]
+    assert engine.link_rings["bc"] == ("major",)
+
+
+def test_major_ring_failure_does_not_trip_sub_ring(rings):
+    graph, engine = rings()
+    changes, events = engine.plan(graph, {"bc": 'down'})
+    assert changes == {"da": 'up'}
+    assert len(events) == 1
+
+
+def test_sub_ring_failover_and_revert(rings):
+    graph, engine = rings()
+    changes, _ = engine.plan(graph, {"bx": 'down'})
+    assert changes == {"xy": 'up'}
+    _apply(graph, {"bx": 'down', **changes})
+    changes, _ = engine.plan(graph, {"bx": 'up'})
+    assert changes == {"xy": 'blocking'}
+    _apply(graph, {"bx": 'up', **changes})
+    assert [ring["state"] for ring in engine.states(graph)] == ['idle', 'idle']
+
+
+def test_non_revertive_blocks_recovered_link(rings):
+    graph, engine = rings(revertive=False)
+    changes, _ = engine.plan(graph, {"ab": 'down'})
+    _apply(graph, {"ab": 'down', **changes})
+    changes, _ = engine.plan(graph, {"ab": 'up'})
+    assert changes == {"ab": 'blocking'}
+    _apply(graph, {"ab": 'up'})
+    _apply(graph, changes)
+    assert {ring["id"]: ring["state"] for ring in engine.states(graph)}["major"] == 'pending'
+    changes, _ = engine.clear(graph, "major")
+    assert changes == {"ab": 'up', "da": 'blocking'}
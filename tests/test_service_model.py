@@ -0,0 +1,146 @@
+#
+# UNOC - tests/test_service_model.py
+#
+# Was-wäre-wenn-Analyse (Dominator-/Euler-Index) und Monte-Carlo-Modell gegen eine direkte
+# Neuberechnung mit networkx: intakter Zustand, aktiver ERPS-Failover und Sub-Ringe.
+#
+
+import random
+
+import networkx as nx
+import pytest
+
+from commands import ChangeRecord
+from failure_simulation import FailureModel
+from ring_engine import RingEngine
+from service_model import ImpactIndex
+from topology_generator import generate_topology
+
+HEAD_END_TYPES = ('OLT', 'AON Switch')
+END_DEVICE_TYPES = ('ONT', 'Business NT')
+SMALL = {"onts_per_splitter": 8, "splitters_per_nvt": 2, "nvts_per_olt": 2, "olts_per_pop": 1, "pops_per_ring": 1, "business_per_pop": 1}
+
+
+def _served(graph, failed_links=(), failed_nodes=()):
+    """Versorgte Endgeräte bei diesen Ausfällen, direkt aus dem Graphen (Referenz)."""
+    engine = RingEngine()
+    engine.rebuild(graph)
+    protection = {link_id for ring_id in engine.rings_for(failed_links, failed_nodes) for link_id in engine.rings[ring_id]["links"]}
+    types = nx.get_node_attributes(graph, 'type')
+    alive = {node for node, data in graph.nodes(data=True) if data['status'] != 'offline' and node not in failed_nodes}
+    usable = nx.DiGraph()
+    usable.add_nodes_from(alive)
+    for source, target, data in graph.edges(data=True):
+        if source not in alive or target not in alive or data['link_id_str'] in failed_links:
+            continue
+        if data['status'] not in ('down', 'blocking') or (data['status'] == 'blocking' and data['link_id_str'] in protection):
+            usable.add_edge(source, target)
+    rpls = {ring["rpl"] for ring in engine.rings.values()}
+    intact_in = {target for _, target, data in graph.edges(data=True) if data['link_id_str'] not in rpls}
+    roots = {node for node in alive if node not in intact_in and types[node] not in HEAD_END_TYPES + END_DEVICE_TYPES}
+    connected = set()
+    for component in nx.connected_components(usable.to_undirected()):
+        if component & roots:
+            connected |= component
+    served = set()
+    for head_end in (node for node in alive & connected if types[node] in HEAD_END_TYPES):
+        served |= nx.descendants(usable, head_end)
+    return {node for node in served if types[node] in END_DEVICE_TYPES}
+
+
+def _set_status(graph, changes):
+    for link_id, status in changes.items():
+        graph.edges[graph.graph["link_endpoints"][link_id]]['status'] = status
+
+
+def _failover(graph, ring):
+    """Fällt den ersten Ringlink aus und lässt die ERPS-Steuerung den RPL öffnen."""
+    engine = RingEngine()
+    engine.rebuild(graph)
+    link_id = next(link_id for link_id in engine.rings[ring["id"]]["links"] if link_id != ring["rpl_link_id"])
+    changes, _ = engine.plan(graph, {link_id: 'down'})
+    _set_status(graph, {link_id: 'down', **changes})
+    assert graph.edges[graph.graph["link_endpoints"][ring["rpl_link_id"]]]['status'] == 'up'
+    return link_id
+
+
+def _assert_matches_reference(graph, failure_sets):
+    index = ImpactIndex(HEAD_END_TYPES, END_DEVICE_TYPES)
+    index.rebuild(graph)
+    model = FailureModel(graph, HEAD_END_TYPES, END_DEVICE_TYPES)
+    before = _served(graph)
+    for links, nodes in failure_sets:
+        lost = before - _served(graph, set(links), set(nodes))
+        assert set(index.query(nodes, links)["end_devices"]) == lost, (links, nodes)
+        failed = [model.link_index[link_id] for link_id in links] + [model.link_count + model.node_index[node_id] for node_id in nodes]
+        assert model.impact(failed) == len(lost), (links, nodes)
+        if len(failed) == 1:
+            assert model.single_impact[failed[0]] == len(lost), (links, nodes)
+
+
+@pytest.fixture
+def topology():
+    return generate_topology(200, seed=7, **SMALL)
+
+
+def _uplink_failure_sets(graph, topology, extra=()):
+    ring = topology["rings"][0]
+    ring_links = [link_id for link_id, (source, target) in graph.graph["link_endpoints"].items() if source in ring["nodes"] and target in ring["nodes"]]
+    core_links = [link_id for link_id, (source, _) in graph.graph["link_endpoints"].items() if source.startswith("CORE") and link_id not in ring_links]
+    rng = random.Random(3)
+    sets = [([link_id], []) for link_id in ring_links + core_links[:4]]
+    sets += [([], [node_id]) for node_id in ring["nodes"]]
+    sets += [([ring_links[0], ring["rpl_link_id"]], []), ([ring_links[1], ring_links[2]], [])]
+    sets += [(rng.sample(ring_links + core_links, 2), rng.sample(ring["nodes"], 1)) for _ in range(10)]
+    return sets + list(extra)
+
+
+def test_impact_matches_reference_in_intact_state(topology, graph_from_topology):
+    graph = graph_from_topology(topology)
+    _assert_matches_reference(graph, _uplink_failure_sets(graph, topology))
+
+
+def test_impact_matches_reference_during_erps_failover(topology, graph_from_topology):
+    graph = graph_from_topology(topology)
+    ring = topology["rings"][0]
+    failed_link = _failover(graph, ring)
+    # Der RPL trägt jetzt den Verkehr: sein Ausfall trennt denselben Teil wie vorher der Doppelausfall
+    intact = graph_from_topology(topology)
+    index = ImpactIndex(HEAD_END_TYPES, END_DEVICE_TYPES)
+    index.rebuild(intact)
+    expected = index.query(link_ids=[failed_link, ring["rpl_link_id"]])["end_devices"]
+    assert expected
+    index.rebuild(graph)
+    assert sorted(index.query(link_ids=[ring["rpl_link_id"]])["end_devices"]) == sorted(expected)
+    _assert_matches_reference(graph, _uplink_failure_sets(graph, topology))
+
+
+def test_impact_index_rebuilds_after_status_change(topology, graph_from_topology):
+    graph = graph_from_topology(topology)
+    index = ImpactIndex(HEAD_END_TYPES, END_DEVICE_TYPES)
+    index.rebuild(graph)
+    ring = topology["rings"][0]
+    failed_link = _failover(graph, ring)
+    index.apply_changes(graph, [ChangeRecord('link', failed_link, 'status', 'up', 'down')])
+    fresh = ImpactIndex(HEAD_END_TYPES, END_DEVICE_TYPES)
+    fresh.rebuild(graph)
+    assert index.query(link_ids=[ring["rpl_link_id"]]) == fresh.query(link_ids=[ring["rpl_link_id"]])
+
+
+def test_sub_ring_protects_its_own_links_only(make_graph):
+    devices = [(node_id, 'Core Node') for node_id in ("A", "B", "C", "D", "X", "Y")]
+    devices += [("OLT-X", 'OLT'), ("ONT-X", 'ONT'), ("OLT-Y", 'OLT'), ("ONT-Y", 'ONT')]
+    links = [("ab", "A", "B"), ("bc", "B", "C"), ("cd", "C", "D"), ("da", "D", "A", 'blocking'),
+             ("bx", "B", "X"), ("xy", "X", "Y", 'blocking'), ("cy", "C", "Y"),
+             ("x-olt", "X", "OLT-X"), ("olt-ont-x", "OLT-X", "ONT-X"), ("y-olt", "Y", "OLT-Y"), ("olt-ont-y", "OLT-Y", "ONT-Y")]
+    rings = [("major", "da", ["A", "B", "C", "D"]), ("sub", "xy", ["B", "X", "Y", "C"])]
+    graph = make_graph(devices, links, rings)
+    _assert_matches_reference(graph, [(["bx"], []), (["cy"], []), (["bc"], []), (["bx", "xy"], []), (["bx", "cy"], []),
+                                      (["ab", "bc"], []), ([], ["B"]), ([], ["C"]), (["da", "bc"], [])])
+    failover = make_graph(devices, links, rings)
+    engine = RingEngine()
+    engine.rebuild(failover)
+    changes, _ = engine.plan(failover, {"bx": 'down'})
+    assert changes == {"xy": 'up'}
+    _set_status(failover, {"bx": 'down', **changes})
+    _assert_matches_reference(failover, [(["xy"], []), (["cy"], []), (["bc"], []), ([], ["Y"]), (["ab", "cd"], [])])
@@ -0,0 +1,43 @@
+#
+# UNOC - tests/test_snapshot_format.py
+#
+# Delta-Snapshots: Rekonstruktion über den Basis-Snapshot und Schutz vor einer geänderten Basis.
+#
+
+import pytest
+
+from snapshot_format import COMPACT_EXTENSION, read_snapshot, write_snapshot
+
+
+def _topology(status: str) -> dict:
+    return {
+        "version": "1.0.0",
+        "devices": [
+            {"id": "OLT-1", "type": "OLT", "status": "online", "properties": {}, "coordinates": None},
+            {"id": "ONT-1", "type": "ONT", "status": status, "properties": {}, "coordinates": None},
+        ],
+        "links": [{"id": "L-1", "source": "OLT-1", "target": "ONT-1", "status": "up", "properties": {}}],
+        "rings": [],
+    }
+
+
+def _write(tmp_path, name: str, topology: dict, base: str = None):
+    base_topology = read_snapshot(str(tmp_path / f"{base}{COMPACT_EXTENSION}")) if base else None
+    write_snapshot(str(tmp_path / f"{name}{COMPACT_EXTENSION}"), topology, encoding="jsonl", base_name=base, base_topology=base_topology)
+
+
+def test_delta_reconstructs_topology(tmp_path):
+    _write(tmp_path, "base", _topology("online"))
+    _write(tmp_path, "delta", _topology("offline"), base="base")
+    restored = read_snapshot(str(tmp_path / f"delta{COMPACT_EXTENSION}"))
+    assert {row["id"]: row["status"] for row in restored["devices"]} == {"OLT-1": "online", "ONT-1": "offline"}
+
+
+def test_delta_rejects_overwritten_base(tmp_path):
+    _write(tmp_path, "base", _topology("online"))
+    _write(tmp_path, "delta", _topology("offline"), base="base")
+    changed = _topology("online")
+    changed["links"] = []
+    _write(tmp_path, "base", changed)
+    with pytest.raises(ValueError, match="has changed"):
+        read_snapshot(str(tmp_path / f"delta{COMPACT_EXTENSION}"))
@@ -0,0 +1,69 @@
+#
+# UNOC - tests/test_storage_locking.py
+#
+# In-Memory-Store: Signalabfragen (erst Datenbank, dann STATE_LOCK) parallel zu Verkehrs-Ticks und
+# Link-Flaps (erst STATE_LOCK, dann Datenbank) dürfen sich nicht gegenseitig blockieren. Läuft in einem
+# eigenen Prozess, da STORAGE_BACKEND vor dem ersten Import von database/backend feststehen muss.
+#
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = r"""
+import sys, threading
+import backend
+from database import SessionLocal, init_db
+from snapshot_loader import bulk_load_snapshot
+from topology_generator import generate_topology
+
+topology = generate_topology(200, seed=5, onts_per_splitter=8, splitters_per_nvt=2, nvts_per_olt=2, olts_per_pop=1, pops_per_ring=1)
+onts = [d["id"] for d in topology["devices"] if d["type"] == "ONT"][:20]
+types = {d["id"]: d["type"] for d in topology["devices"]}
+link_ids = [l["id"] for l in topology["links"] if types[l["source"]] == "Splitter"][:10]
+init_db()
+with SessionLocal() as db:
+    bulk_load_snapshot(db, topology)
+    backend.build_graph_from_db(db)
+    backend.initialize_rings(db)
+errors = []
+
+# Ein Test-Client pro Thread (der Client selbst ist nicht threadsicher)
+def poll_signals():
+    client = backend.app.test_client()
+    for _ in range(5):
+        for device_id in onts:
+            if client.get(f"/api/devices/{device_id}/signal").status_code != 200:
+                errors.append(device_id)
+
+def tick_and_flap():
+    client = backend.app.test_client()
+    for link_id in link_ids:
+        for status in ("down", "up"):
+            if client.post(f"/api/links/{link_id}/status", json={"status": status}).status_code != 200:
+                errors.append(link_id)
+        client.post("/api/traffic/tick", json={"sim_seconds": 60})
+
+threads = [threading.Thread(target=target, daemon=True) for target in (poll_signals, tick_and_flap, poll_signals)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join(timeout=30)
+if any(thread.is_alive() for thread in threads):
+    print("DEADLOCK")
+    sys.stdout.flush()
+    import os; os._exit(2)
+print("errors", errors)
+sys.stdout.flush()
+import os; os._exit(1 if errors else 0)
+"""
+
+
+def test_memory_storage_concurrent_requests_do_not_deadlock(tmp_path):
+    env = dict(os.environ, STORAGE_BACKEND="memory", STORAGE_SNAPSHOT="", GRAPH_CONSISTENCY_CHECK="1",
+               HISTORY_JOURNAL=str(tmp_path / "undo_journal.jsonl"), CHANGE_LOG_DIR=str(tmp_path / "changelog"))
+    env.pop("DATABASE_URL", None)
+    result = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout[-2000:] + result.stderr[-2000:]
@@ -0,0 +1,79 @@
+#
+# UNOC - topology_cache.py
+#
+# Cache der serialisierten Topologie, versioniert über eine Generation, die jede Mutation
+# erhöht. Pro Generation wird die Topologie genau einmal aus dem Graphen serialisiert und
+# als fertig kodierte JSON-Bytes (gzip bei Bedarf, ebenfalls gecacht) vorgehalten.
+#
+
+import gzip
+import json
+import threading
+import uuid
+from typing import Callable, Dict, Hashable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, schneller JSON-Encoder
+    orjson = None
+
+
+def encode_json(payload) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass  # z.B. Nicht-String-Keys: auf das Standardmodul zurückfallen
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+class EncodedPayload:
+    """Fertig kodierter Response-Body mit ETag; die gzip-Variante wird beim ersten Bedarf erzeugt."""
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        self._gzip_body: Optional[bytes] = None
+
+    @property
+    def gzip_body(self) -> bytes:
+        if self._gzip_body is None:
+            self._gzip_body = gzip.compress(self.body, compresslevel=6)
+        return self._gzip_body
+
+
+class TopologyCache:
+    def __init__(self):
+        # Boot-ID im ETag, damit ETags aus einem früheren Prozess nach einem Neustart nicht greifen
+        self.boot_id = uuid.uuid4().hex[:8]
+        self.generation = 0
+        self._topology: Optional[Dict[str, list]] = None
+        self._payloads: Dict[Hashable, EncodedPayload] = {}
+        # RLock: build_payload ruft topology() auf; gleichzeitige Anfragen warten auf eine Serialisierung
+        self._lock = threading.RLock()
+
+    def invalidate(self):
+        """Nach jeder Änderung an Graph, Ringen oder KPIs aufrufen."""
+        with self._lock:
+            self.generation += 1
+            self._topology = None
+            self._payloads = {}
+
+    def topology(self, build: Callable[[], Dict[str, list]]) -> Dict[str, list]:
+        """Serialisierte Topologie der aktuellen Generation (build wird nur einmal pro Generation aufgerufen)."""
+        with self._lock:
+            if self._topology is None:
+                self._topology = build()
+            return self._topology
+
+    def encoded(self, variant: Hashable, build_payload: Callable[[], dict]) -> EncodedPayload:
+        """
+        Kodierter Body für eine Variante (z.B. Undo/Redo-Status), gültig bis zur nächsten Invalidierung.
+        build_payload darf topology() verwenden.
+        """
+        with self._lock:
+            cached = self._payloads.get(variant)
+            if cached is None:
+                cached = EncodedPayload(f"{self.boot_id}-{self.generation}-{abs(hash(variant)):x}", encode_json(build_payload()))
+                self._payloads[variant] = cached
+            return cached
@@ -0,0 +1,183 @@
+#
+# UNOC - topology_generator.py
+#
+# Erzeugt synthetische FTTH-Topologien beliebiger Größe im Snapshot-Format (devices/links/rings):
+#   Core-Ring (ERPS, je Region) -> POP -> ODF -> OLT -> NVt -> Splitter -> HÜP -> ONT
+#   sowie je POP ein AON-Switch mit PtP-Geschäftskunden (Business NT).
+# Fan-out, Dämpfungswerte und Längenbereiche sind konfigurierbar; die Ausgabe ist per Seed reproduzierbar.
+#
+
+import argparse
+import json
+import math
+import random
+from typing import Dict, List, Optional
+
+# Regionen mit ungefährem Mittelpunkt [lon, lat] (Koordinaten wie in den Quelldaten)
+REGIONS = [
+    ("Nordrhein-Westfalen", (7.20, 51.45)),
+    ("Niedersachsen", (9.40, 52.70)),
+    ("Hessen", (8.90, 50.60)),
+    ("Bayern", (11.50, 48.80)),
+    ("Baden-Württemberg", (9.00, 48.60)),
+    ("Rheinland-Pfalz", (7.40, 49.90)),
+    ("Schleswig-Holstein", (9.80, 54.20)),
+    ("Sachsen", (13.30, 51.00)),
+]
+
+# Einfügedämpfung typischer PLC-Splitter in dB
+SPLITTER_LOSS_DB = {8: 10.5, 16: 13.8, 32: 17.8, 64: 21.0}
+
+DEFAULT_PARAMS = {
+    "onts_per_splitter": 32,      # Splitverhältnis 1:n (8, 16, 32 oder 64)
+    "splitters_per_nvt": 8,
+    "nvts_per_olt": 16,
+    "olts_per_pop": 2,
+    "pops_per_ring": 4,           # POPs je Core-Knoten
+    "ring_size": 4,               # Core-Knoten je ERPS-Ring (ein Ring pro Region)
+    "business_per_pop": 4,        # PtP-Geschäftskunden je POP (AON-Zweig)
+    "xgs_pon_share": 0.3,         # Anteil der ONTs mit XGS-PON statt GPON
+    "feeder_km": (0.5, 8.0),      # ODF -> NVt
+    "distribution_km": (0.05, 1.2),  # Splitter -> HÜP
+    "drop_km": (0.01, 0.05),      # HÜP -> ONT
+    "ptp_km": (0.3, 6.0),         # AON-Switch -> Business NT
+    "ring_km": (10.0, 60.0),
+}
+
+
+class _Builder:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.devices: List[dict] = []
+        self.links: List[dict] = []
+        self.rings: List[dict] = []
+
+    def device(self, device_id: str, device_type: str, coordinates, **properties) -> str:
+        self.devices.append({"id": device_id, "type": device_type, "status": "online", "properties": properties, "coordinates": coordinates})
+        return device_id
+
+    def link(self, source: str, target: str, link_technology: str = "PON", **properties) -> str:
+        link_id = f"link-{source}-{target}"
+        properties = {"link_technology": link_technology, **properties}
+        self.links.append({"id": link_id, "source": source, "target": target, "status": "up", "properties": properties})
+        return link_id
+
+    def length(self, bounds) -> float:
+        return round(self.rng.uniform(*bounds), 3)
+
+    def near(self, center, spread_km: float):
+        # ca. 111 km pro Breitengrad, Längengrad mit cos(lat) skaliert
+        lon, lat = center
+        d_lat = self.rng.gauss(0, spread_km / 111.0)
+        d_lon = self.rng.gauss(0, spread_km / (111.0 * math.cos(math.radians(lat))))
+        return [round(lon + d_lon, 5), round(lat + d_lat, 5)]
+
+
+def generate_topology(ont_count: int, seed: int = 42, **params) -> Dict[str, object]:
+    """
+    Baut eine Topologie mit (mindestens) ont_count ONTs. Die Hierarchie wird mit den Fan-outs aus
+    DEFAULT_PARAMS (überschreibbar per Keyword) so lange aufgefüllt, bis genug ONTs existieren.
+    """
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown generator parameters: {', '.join(sorted(unknown))}")
+    p = {**DEFAULT_PARAMS, **params}
+    if p["onts_per_splitter"] not in SPLITTER_LOSS_DB:
+        raise ValueError(f"onts_per_splitter must be one of {sorted(SPLITTER_LOSS_DB)}")
+
+    b = _Builder(seed)
+    onts_per_olt = p["onts_per_splitter"] * p["splitters_per_nvt"] * p["nvts_per_olt"]
+    olt_count = max(1, math.ceil(ont_count / onts_per_olt))
+    pop_count = math.ceil(olt_count / p["olts_per_pop"])
+    core_count = max(p["ring_size"], math.ceil(pop_count / p["pops_per_ring"]))
+    ring_count = math.ceil(core_count / p["ring_size"])
+
+    # --- Core-Ringe (ERPS): Ringlinks im Kreis, der schließende Link ist der RPL ---
+    core_nodes = []  # (id, region, coordinates)
+    for r in range(ring_count):
+        region, center = REGIONS[r % len(REGIONS)]
+        members = []
+        for c in range(p["ring_size"]):
+            coordinates = b.near(center, 60)
+            members.append(b.device(f"CORE-R{r + 1:02d}-{c + 1:02d}", "Core Node", coordinates, name=f"Core {region} {c + 1}", bundesland=region))
+            core_nodes.append((members[-1], region, coordinates))
+        ring_links = [b.link(members[i], members[(i + 1) % len(members)], "PtP", type="Backbone", length_km=b.length(p["ring_km"]), connector_count=2) for i in range(len(members))]
+        b.rings.append({"id": f"ring-r{r + 1:02d}", "name": f"ERPS Ring {region} {r // len(REGIONS) + 1}", "rpl_link_id": ring_links[-1], "nodes": members})
+
+    onts_left = ont_count
+    olt_index = 0
+    for pop_index in range(pop_count):
+        core_id, region, core_center = core_nodes[pop_index % len(core_nodes)]
+        pop_center = b.near(core_center, 25)
+        pop = b.device(f"POP-{pop_index + 1:05d}", "POP", pop_center, name=f"POP {pop_index + 1}", bundesland=region)
+        b.link(core_id, pop, "PtP", type="Regional", length_km=b.length(p["ring_km"]), connector_count=2)
+        odf = b.device(f"ODF-{pop_index + 1:05d}", "ODF", pop_center, capacity=5760, bundesland=region)
+        b.link(pop, odf, type="PoP Internal", length_km=0.005, connector_count=2)
+
+        # --- AON/PtP-Zweig ---
+        if p["business_per_pop"]:
+            aon = b.device(f"AON-{pop_index + 1:05d}", "AON Switch", pop_center, transmit_power_dbm=4.0, bundesland=region)
+            b.link(odf, aon, "PtP", type="Patchkabel", length_km=0.01, connector_count=2)
+            for n in range(p["business_per_pop"]):
+                nt = b.device(f"NT-{pop_index + 1:05d}-{n + 1:03d}", "Business NT", b.near(pop_center, 3), sensitivity_min_dbm=-30.0, bundesland=region)
+                b.link(aon, nt, "PtP", type="PtP-DEDICATED", length_km=b.length(p["ptp_km"]), splice_count=1, connector_count=2, guaranteed_bandwidth_gbps=1.0, utilization_percent=round(b.rng.uniform(5, 70), 1))
+
+        # --- PON-Baum ---
+        for _ in range(p["olts_per_pop"]):
+            if onts_left <= 0:
+                break
+            olt_index += 1
+            olt = b.device(f"OLT-{olt_index:05d}", "OLT", pop_center, power_class="C+", transmit_power_dbm=5.0, supported_technologies=["GPON", "XGS-PON"], bundesland=region)
+            b.link(olt, odf, type="Patchkabel", length_km=0.01, connector_count=2)
+            for v in range(p["nvts_per_olt"]):
+                if onts_left <= 0:
+                    break
+                nvt_id = f"{olt_index:05d}-{v + 1:02d}"
+                nvt_center = b.near(pop_center, 4)
+                nvt = b.device(f"NVT-{nvt_id}", "NVt", nvt_center, model="CCM NVt 80", bundesland=region)
+                b.link(odf, nvt, type="Feeder-Kabel", length_km=b.length(p["feeder_km"]), splice_count=1, connector_count=2)
+                for s in range(p["splitters_per_nvt"]):
+                    if onts_left <= 0:
+                        break
+                    splitter = b.device(f"SPL-{nvt_id}-{s + 1:02d}", "Splitter", nvt_center, split_ratio=f"1:{p['onts_per_splitter']}", insertion_loss_db=SPLITTER_LOSS_DB[p["onts_per_splitter"]], bundesland=region)
+                    b.link(nvt, splitter, type="Patchkabel", length_km=0.005, connector_count=2)
+                    for o in range(min(p["onts_per_splitter"], onts_left)):
+                        home_id = f"{nvt_id}-{s + 1:02d}-{o + 1:02d}"
+                        home = b.near(nvt_center, 0.8)
+                        hup = b.device(f"HUP-{home_id}", "HÜP", home, bundesland=region)
+                        b.link(splitter, hup, type="Verteilkabel", length_km=b.length(p["distribution_km"]), splice_count=1, connector_count=2)
+                        technology = "XGS-PON" if b.rng.random() < p["xgs_pon_share"] else "GPON"
+                        ont = b.device(f"ONT-{home_id}", "ONT", home, technology=technology, sensitivity_min_dbm=-28.0 if technology == "XGS-PON" else -30.0, bundesland=region)
+                        b.link(hup, ont, type="Inhouse-Kabel", length_km=b.length(p["drop_km"]), connector_count=2)
+                        onts_left -= 1
+
+    return {"version": "1.0.0", "devices": b.devices, "links": b.links, "rings": b.rings}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Erzeugt eine synthetische FTTH-Topologie als Snapshot.")
+    parser.add_argument("onts", type=int, help="Anzahl der ONTs")
+    parser.add_argument("output", help="Zieldatei (.json oder .unoc)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--onts-per-splitter", type=int, default=DEFAULT_PARAMS["onts_per_splitter"])
+    parser.add_argument("--splitters-per-nvt", type=int, default=DEFAULT_PARAMS["splitters_per_nvt"])
+    parser.add_argument("--nvts-per-olt", type=int, default=DEFAULT_PARAMS["nvts_per_olt"])
+    parser.add_argument("--olts-per-pop", type=int, default=DEFAULT_PARAMS["olts_per_pop"])
+    parser.add_argument("--business-per-pop", type=int, default=DEFAULT_PARAMS["business_per_pop"])
+    args = parser.parse_args(argv)
+
+    topology = generate_topology(
+        args.onts, seed=args.seed, onts_per_splitter=args.onts_per_splitter, splitters_per_nvt=args.splitters_per_nvt,
+        nvts_per_olt=args.nvts_per_olt, olts_per_pop=args.olts_per_pop, business_per_pop=args.business_per_pop
+    )
+    if args.output.endswith(".json"):
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(topology, f)
+    else:
+        from snapshot_format import write_snapshot
+        write_snapshot(args.output, topology)
+    print(f"{len(topology['devices'])} Geräte, {len(topology['links'])} Links, {len(topology['rings'])} Ringe nach '{args.output}' geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#
+# UNOC - traffic_engine.py
+#
+# Zeitreihen-Verkehrssimulation. Jeder Tick erzeugt die Last aller Endgeräte vektorisiert aus
+# Tagesprofilen (Privatkunden abends, Geschäftskunden tagsüber, pro Gerät mit eigener Skalierung,
+# Phasenversatz und Rauschen) und summiert sie ebenenweise entlang des Head-End-Baums aus
+# PathIndex auf die Links (eine bincount-Operation pro Tiefe). Links außerhalb der
+# Zugangsnetze (Backbone, Regional, POP-intern) tragen eine Grundlast nach dem Transitprofil.
+# Die Auslastung landet in einem Ringpuffer fester Größe (Ticks x Links, float16), nicht in der
+# Datenbank; die SLA-Prüfung der PtP-Links läuft über das ganze Array und liefert nur Übergänge.
+#
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import networkx as nx
+
+from alarm_engine import AlarmCheck, SLA_VIOLATION_RISK, SLA_UTILIZATION_THRESHOLD
+from commands import ChangeRecord
+from path_index import NON_FORWARDING_LINK_STATUSES, PathIndex
+
+DEFAULT_HISTORY_LENGTH = 300
+DEFAULT_SEED = 42
+
+# Tagesprofile: (Spitzenstunde, Breite der Spitze in Stunden, Grundlast als Anteil der Spitze)
+TRAFFIC_PROFILES = {
+    "residential": (21.0, 3.0, 0.15),
+    "business": (11.0, 3.5, 0.1),
+    "transit": (20.0, 5.0, 0.3),
+}
+# Mittlere Last eines Endgeräts zur Spitzenstunde (Property peak_demand_gbps überschreibt)
+PEAK_DEMAND_GBPS = {"ONT": 0.004, "Business NT": 0.6}
+TECHNOLOGY_DEMAND_FACTOR = {"XGS-PON": 2.5}
+# Kapazität nach Linktyp, sonst nach Technologie (Property capacity_gbps bzw. guaranteed_bandwidth_gbps überschreibt)
+LINK_CAPACITY_GBPS = {"Backbone": 100.0, "Regional": 100.0, "PoP Internal": 100.0, "Patchkabel": 100.0, "Feeder-Kabel": 10.0}
+TECHNOLOGY_CAPACITY_GBPS = {"PON": 2.5, "PtP": 10.0}
+# Anteil der Kapazität, den Transitlinks zur Spitzenstunde tragen
+TRANSIT_SHARE = 0.3
+# Standardabweichung des multiplikativen Rauschens pro Tick und Gerät
+NOISE = 0.1
+# Streuung der Gerätelast (Lognormal-Sigma) und des Phasenversatzes (Stunden)
+DEMAND_SIGMA = 0.35
+PHASE_JITTER_H = 1.0
+
+
+def diurnal_profile(profile: str, hours: np.ndarray) -> np.ndarray:
+    """Lastfaktor (0..1) für Tageszeiten in Stunden; die Spitze liegt zirkulär um Mitternacht herum richtig."""
+    peak, width, base = TRAFFIC_PROFILES[profile]
+    distance = np.abs((hours - peak + 12.0) % 24.0 - 12.0)
+    return base + (1.0 - base) * np.exp(-0.5 * (distance / width) ** 2)
+
+
+class TrafficEngine:
+    """Lastmodell, Ringpuffer der Auslastung und vektorisierte SLA-Auswertung über alle Links."""
+
+    def __init__(self, head_end_types: Iterable[str], end_device_types: Iterable[str], history_length: int = DEFAULT_HISTORY_LENGTH,
+                 seed: int = DEFAULT_SEED):
+        self.head_end_types = set(head_end_types)
+        self.end_device_types = set(end_device_types)
+        self.history_length = history_length
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.sim_time: Optional[float] = None
+        self._reset(nx.DiGraph())
+
+    # --- Aufbau ---
+    def rebuild(self, graph: nx.DiGraph):
+        """Arrays für Links und Endgeräte neu aufbauen; die Historie beginnt von vorn."""
+        self._reset(graph)
+
+    def apply_changes(self, graph: nx.DiGraph, records: Iterable[ChangeRecord]):
+        """Statusänderungen verwerfen die Baum-Zuordnung (Neuaufbau beim nächsten Tick), Properties nur ihr Element."""
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        for record in records:
+            if record.kind == 'link' and record.object_id in self.link_index:
+                i = self.link_index[record.object_id]
+                if record.field == 'status':
+                    self.link_forwarding[i] = record.new not in NON_FORWARDING_LINK_STATUSES
+                    self.routing = None
+                elif record.field == 'properties':
+                    self._set_link(i, graph.edges[link_endpoints[record.object_id]])
+                    self.sla_violated = None  # z.B. manuell gesetzte Auslastung: beim nächsten Tick alle SLA-Links neu melden
+            elif record.kind == 'device':
+                if record.field == 'status':
+                    self.routing = None
+                elif record.field == 'properties' and record.object_id in self.device_index:
+                    self._set_device(self.device_index[record.object_id], graph.nodes[record.object_id])
+
+    # --- Simulation ---
+    def tick(self, graph: nx.DiGraph, path_index: PathIndex, now: float, sim_seconds: float) -> List[AlarmCheck]:
+        """
+        Ein Simulationsschritt: rückt die Simulationszeit um sim_seconds vor (der erste Tick beginnt bei now),
+        schreibt die Auslastung aller Links in den Ringpuffer und gibt die SLA-Übergänge zurück.
+        """
+        self.sim_time = now if self.sim_time is None else self.sim_time + sim_seconds
+        if self.routing is None:
+            self.routing = self._build_routing(graph, path_index)
+        hour = (self.sim_time / 3600.0) % 24.0
+
+        demand = self.peak * diurnal_profile("residential", hour + self.phase)
+        business = self.business
+        demand[business] = self.peak[business] * diurnal_profile("business", hour + self.phase[business])
+        demand *= np.maximum(self.rng.normal(1.0, NOISE, len(demand)), 0.0)
+
+        node_load = np.zeros(len(self.node_ids))
+        node_load[self.device_nodes] = demand
+        link_load = np.where(self.link_forwarding & self.transit, self.capacity * TRANSIT_SHARE * diurnal_profile("transit", hour), 0.0)
+        node_count = len(self.node_ids)
+        for children, parents, links in self.routing:
+            link_load[links] = node_load[children]
+            node_load += np.bincount(parents, weights=node_load[children], minlength=node_count)
+        utilization = np.minimum(link_load / self.capacity * 100.0, 100.0)
+
+        self.history[self.head] = utilization
+        self.ticks[self.head] = self.tick_count
+        self.times[self.head] = self.sim_time
+        self.head = (self.head + 1) % self.history_length
+        self.tick_count += 1
+        self.samples = min(self.samples + 1, self.history_length)
+        self.utilization = utilization
+        return self._sla_transitions(utilization)
+
+    # --- Abfragen ---
+    def history_for(self, link_ids: Iterable[str], window: Optional[int] = None) -> Dict[str, object]:
+        """Die letzten window Ticks (Standard: der ganze Puffer) für die Links, älteste zuerst."""
+        count = self.samples if window is None else max(0, min(window, self.samples))
+        slots = (self.head - count + np.arange(count)) % self.history_length
+        result = {
+            "ticks": self.ticks[slots].tolist(),
+            "timestamps": self.times[slots].tolist(),
+            "links": {},
+        }
+        for link_id in link_ids:
+            i = self.link_index[link_id]
+            values = self.history[slots, i].astype(np.float64)
+            result["links"][link_id] = {
+                "capacity_gbps": float(self.capacity[i]),
+                "utilization_percent": np.round(values, 2).tolist(),
+                "min": round(float(values.min()), 2) if count else None,
+                "avg": round(float(values.mean()), 2) if count else None,
+                "max": round(float(values.max()), 2) if count else None,
+                "p95": round(float(np.percentile(values, 95)), 2) if count else None,
+            }
+        return result
+
+    def status(self, top: int = 10) -> Dict[str, object]:
+        hottest = []
+        if self.utilization is not None and top > 0 and len(self.utilization):
+            order = np.argpartition(self.utilization, -top)[-top:] if top < len(self.utilization) else np.arange(len(self.utilization))
+            order = order[np.argsort(self.utilization[order])[::-1]]
+            hottest = [{"id": self.link_ids[i], "utilization_percent": round(float(self.utilization[i]), 2),
+                        "capacity_gbps": float(self.capacity[i])} for i in order]
+        return {
+            "tick": self.tick_count,
+            "sim_time": self.sim_time,
+            "sim_hour": round((self.sim_time / 3600.0) % 24.0, 3) if self.sim_time is not None else None,
+            "links": len(self.link_ids),
+            "end_devices": len(self.device_ids),
+            "history_length": self.history_length,
+            "samples": self.samples,
+            "history_bytes": int(self.history.nbytes),
+            "sla_violations": int(self.sla_violated.sum()) if self.sla_violated is not None else 0,
+            "hottest_links": hottest,
+        }
+
+    # --- Interna ---
+    def _reset(self, graph: nx.DiGraph):
+        link_endpoints = graph.graph.get("link_endpoints", {})
+        self.node_ids = list(graph.nodes)
+        self.node_index = node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.link_ids = list(link_endpoints)
+        self.link_index = {link_id: i for i, link_id in enumerate(self.link_ids)}
+        self.edge_links = {endpoints: i for i, endpoints in enumerate(link_endpoints.values())}
+        n_links = len(self.link_ids)
+        self.capacity = np.ones(n_links)
+        self.sla_links = np.zeros(n_links, dtype=bool)
+        self.ptp_links = np.zeros(n_links, dtype=bool)
+        self.link_forwarding = np.zeros(n_links, dtype=bool)
+        self.transit = np.zeros(n_links, dtype=bool)
+        access = self._access_nodes(graph)
+        for i, link_id in enumerate(self.link_ids):
+            edge = graph.edges[link_endpoints[link_id]]
+            self._set_link(i, edge)
+            self.link_forwarding[i] = edge.get('status') not in NON_FORWARDING_LINK_STATUSES
+            self.transit[i] = link_endpoints[link_id][1] not in access
+
+        self.device_ids = [node_id for node_id in self.node_ids if graph.nodes[node_id].get('type') in self.end_device_types]
+        self.device_index = {device_id: i for i, device_id in enumerate(self.device_ids)}
+        self.device_nodes = np.array([node_index[device_id] for device_id in self.device_ids], dtype=np.int64)
+        n_devices = len(self.device_ids)
+        # Gerätestreuung deterministisch pro Aufbau, das Rauschen läuft über self.rng weiter
+        rng = np.random.default_rng(self.seed)
+        self.scale = rng.lognormal(0.0, DEMAND_SIGMA, n_devices)
+        self.phase = rng.uniform(-PHASE_JITTER_H, PHASE_JITTER_H, n_devices)
+        self.peak = np.zeros(n_devices)
+        self.business = np.zeros(n_devices, dtype=bool)
+        for i, device_id in enumerate(self.device_ids):
+            self._set_device(i, graph.nodes[device_id])
+
+        self.routing = None
+        self.history = np.zeros((self.history_length, n_links), dtype=np.float16)
+        self.ticks = np.zeros(self.history_length, dtype=np.int64)
+        self.times = np.zeros(self.history_length)
+        self.head = 0
+        self.samples = 0
+        self.tick_count = 0
+        self.utilization: Optional[np.ndarray] = None
+        self.sla_violated: Optional[np.ndarray] = None
+
+    def _set_link(self, i: int, edge: dict):
+        props = edge.get('properties') or {}
+        technology = props.get("link_technology")
+        guaranteed = props.get('guaranteed_bandwidth_gbps') or 0
+        capacity = (props.get("capacity_gbps") or guaranteed or LINK_CAPACITY_GBPS.get(props.get("type"))
+                    or TECHNOLOGY_CAPACITY_GBPS.get(technology) or TECHNOLOGY_CAPACITY_GBPS["PON"])
+        self.capacity[i] = float(capacity)
+        self.ptp_links[i] = technology == "PtP"
+        self.sla_links[i] = technology == "PtP" and guaranteed > 0
+
+    def _set_device(self, i: int, node: dict):
+        props = node.get('properties') or {}
+        peak = props.get("peak_demand_gbps")
+        if peak is None:
+            peak = PEAK_DEMAND_GBPS.get(node.get('type'), 0.0) * TECHNOLOGY_DEMAND_FACTOR.get(props.get("technology"), 1.0) * self.scale[i]
+        self.peak[i] = float(peak)
+        self.business[i] = props.get("traffic_profile", "business" if node.get('type') == "Business NT" else "residential") == "business"
+
+    def _access_nodes(self, graph: nx.DiGraph) -> set:
+        """Knoten unterhalb der Head-Ends unabhängig vom Status; Links in sie hinein gehören zum Zugangsnetz."""
+        head_ends = [node_id for node_id, node in graph.nodes(data=True) if node.get('type') in self.head_end_types]
+        access, queue = set(), deque(head_ends)
+        while queue:
+            node_id = queue.popleft()
+            for successor in graph.successors(node_id):
+                if successor not in access and graph.nodes[successor].get('type') not in self.head_end_types:
+                    access.add(successor)
+                    queue.append(successor)
+        return access
+
+    def _build_routing(self, graph: nx.DiGraph, path_index: PathIndex) -> List[tuple]:
+        """Kanten des Head-End-Baums als (Kind, Parent, Link)-Arrays pro Tiefe, tiefste Ebene zuerst."""
+        node_index, edge_links, depth = self.node_index, self.edge_links, path_index.depth
+        rows = [(depth[node_id], node_index[node_id], node_index[parent_id], edge_links[parent_id, node_id])
+                for node_id, parent_id in path_index.parent.items() if parent_id is not None]
+        if not rows:
+            return []
+        rows = np.array(rows, dtype=np.int64)
+        rows = rows[np.argsort(-rows[:, 0], kind='stable')]
+        starts = np.flatnonzero(np.diff(rows[:, 0], prepend=rows[0, 0] + 1))
+        return [(level[:, 1].copy(), level[:, 2].copy(), level[:, 3].copy()) for level in np.split(rows, starts[1:])]
+
+    def _sla_transitions(self, utilization: np.ndarray) -> List[AlarmCheck]:
+        """Wie sla_checks: Alarm bei garantierter Bandbreite über der Schwelle, Clear für PtP-Links darunter."""
+        violated = self.sla_links & (utilization > SLA_UTILIZATION_THRESHOLD)
+        cleared = self.ptp_links & (utilization <= SLA_UTILIZATION_THRESHOLD)
+        if self.sla_violated is None:
+            raise_idx, clear_idx = np.flatnonzero(violated), np.flatnonzero(cleared)
+        else:
+            raise_idx = np.flatnonzero(violated & ~self.sla_violated)
+            clear_idx = np.flatnonzero(cleared & self.sla_violated)
+        self.sla_violated = violated
+        return ([AlarmCheck('link', self.link_ids[i], SLA_VIOLATION_RISK, "MAJOR", True) for i in raise_idx]
+                + [AlarmCheck('link', self.link_ids[i], SLA_VIOLATION_RISK, "MAJOR", False) for i in clear_idx])